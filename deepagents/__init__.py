@@ -16,7 +16,28 @@ from deepagents.graph import create_deep_agent
 from deepagents.state import DeepAgentState, Todo
 from deepagents.sub_agent import SubAgent
 from deepagents.model import get_default_model
-from deepagents.interrupt import ToolInterruptConfig, create_interrupt_hook
+from deepagents.interrupt import ToolInterruptConfig, ApprovalRule, create_interrupt_hook, clear_pending_approvals
+from deepagents.cache import get_cache_stats
+from deepagents.usage import UsageBudget, get_usage, aget_usage
+from deepagents.routing import get_routing_stats
+from deepagents.rate_limit import configure_rate_limits, get_rate_limit_metrics
+from deepagents.tool_exposure import ToolExposure, default_tool_exposure_policy
+from deepagents.events import StreamEvent, StreamEventProducer
+from deepagents.event_bus import EventBus, ConsoleSink
+from deepagents.sse import SSERunRegistry
+from deepagents.event_codec import EventCodec
+from deepagents.tool_journal import ToolJournal, InMemoryToolJournal, SQLiteToolJournal, MongoToolJournal
+from deepagents.serde import CompactDeepAgentSerializer
+from deepagents.retention import (
+    RetentionPolicy,
+    RetentionWorker,
+    SQLiteCheckpointPruner,
+    MongoCheckpointPruner,
+    apply_retention,
+)
+from deepagents.tiered_saver import TieredCheckpointSaver
+from deepagents.state_access import ThreadStateReader
+from deepagents.thread_store import ThreadStore
 
 # Built-in tools
 from deepagents.tools import (
@@ -38,7 +59,37 @@ __all__ = [
     # Configuration and utilities
     "get_default_model",
     "ToolInterruptConfig",
+    "ApprovalRule",
     "create_interrupt_hook",
+    "clear_pending_approvals",
+    "get_cache_stats",
+    "UsageBudget",
+    "get_usage",
+    "aget_usage",
+    "get_routing_stats",
+    "configure_rate_limits",
+    "get_rate_limit_metrics",
+    "ToolExposure",
+    "default_tool_exposure_policy",
+    "StreamEvent",
+    "StreamEventProducer",
+    "EventBus",
+    "ConsoleSink",
+    "SSERunRegistry",
+    "EventCodec",
+    "ToolJournal",
+    "InMemoryToolJournal",
+    "SQLiteToolJournal",
+    "MongoToolJournal",
+    "CompactDeepAgentSerializer",
+    "RetentionPolicy",
+    "RetentionWorker",
+    "SQLiteCheckpointPruner",
+    "MongoCheckpointPruner",
+    "apply_retention",
+    "TieredCheckpointSaver",
+    "ThreadStateReader",
+    "ThreadStore",
     
     # Built-in tools
     "write_todos",
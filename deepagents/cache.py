@@ -0,0 +1,420 @@
+"""Exact-match response cache for deterministic chat models.
+
+Enable it per model through the `cache` key of the settings passed to
+`create_node_llm`::
+
+    {
+        "model": "qwen-max",
+        "model_provider": "openai",
+        "temperature": 0,
+        "cache": {"backend": "sqlite", "path": "llm_cache.db", "ttl": 86400},
+    }
+
+The cache key is a hash of the normalized messages, the bound tool schemas and
+the model settings. Hits are replayed as a sequence of chunks when the caller
+streams, so `stream_mode="messages"` consumers see the same shape as a live
+response.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    message_chunk_to_message,
+    message_to_dict,
+    messages_from_dict,
+)
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from deepagents.model_wrappers import (
+    DelegatingChatModel,
+    innermost_model,
+    merge_generation_chunks,
+)
+
+
+# ==============================================================================
+# Backends
+# ==============================================================================
+
+class ResponseCache(abc.ABC):
+    """Key/value store with TTL and hit-rate counters."""
+
+    # backends doing disk or network I/O are called from a worker thread in async code
+    blocking = False
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._set(key, value)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await asyncio.to_thread(self.get, key) if self.blocking else self.get(key)
+
+    async def aset(self, key: str, value: Any) -> None:
+        if self.blocking:
+            await asyncio.to_thread(self.set, key, value)
+        else:
+            self.set(key, value)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl is not None and time.time() - created_at > self.ttl
+
+    @abc.abstractmethod
+    def _get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abc.abstractmethod
+    def _set(self, key: str, value: Any) -> None:
+        ...
+
+    @abc.abstractmethod
+    def clear(self) -> None:
+        ...
+
+
+class InMemoryResponseCache(ResponseCache):
+    """Process-local LRU cache."""
+
+    def __init__(self, max_entries: int = 1024, ttl: Optional[float] = None):
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if self._expired(created_at):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteResponseCache(ResponseCache):
+    """Disk-backed cache shared across processes and restarts."""
+
+    blocking = True
+
+    def __init__(self, path: str = "llm_cache.db", ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        super().__init__(ttl=ttl)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS response_cache_created_at ON response_cache (created_at)"
+        )
+        self._conn.commit()
+
+    def _get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if self._expired(created_at):
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            return json.loads(value)
+
+    def _set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), time.time()),
+            )
+            if self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    "SELECT key FROM response_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+            self._conn.commit()
+
+
+_CACHES: Dict[tuple, ResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_response_cache(cache_settings: dict) -> ResponseCache:
+    """Return the shared cache backend described by `cache_settings`.
+
+    Models configured with the same backend/path share one cache instance, so
+    hit-rate counters aggregate across subagents.
+    """
+    backend = cache_settings.get("backend", "memory")
+    if backend == "memory":
+        key = (backend, cache_settings.get("name", "default"))
+    elif backend == "sqlite":
+        key = (backend, cache_settings.get("path", "llm_cache.db"))
+    else:
+        raise ValueError(f"Unknown response cache backend: {backend}")
+
+    with _CACHES_LOCK:
+        if key not in _CACHES:
+            if backend == "memory":
+                _CACHES[key] = InMemoryResponseCache(
+                    max_entries=cache_settings.get("max_entries", 1024),
+                    ttl=cache_settings.get("ttl"),
+                )
+            else:
+                _CACHES[key] = SQLiteResponseCache(
+                    path=key[1],
+                    ttl=cache_settings.get("ttl"),
+                    max_entries=cache_settings.get("max_entries"),
+                )
+        return _CACHES[key]
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Hit/miss counters for every cache created in this process."""
+    with _CACHES_LOCK:
+        return {f"{backend}:{name}": cache.stats() for (backend, name), cache in _CACHES.items()}
+
+
+# ==============================================================================
+# Cache key
+# ==============================================================================
+
+def _normalize_messages(messages: List[BaseMessage]) -> List[dict]:
+    """Strip volatile fields (message ids, provider tool-call ids) from the prompt."""
+    tool_call_ids: Dict[str, str] = {}
+
+    def alias(tool_call_id: Optional[str]) -> Optional[str]:
+        if tool_call_id is None:
+            return None
+        return tool_call_ids.setdefault(tool_call_id, f"call_{len(tool_call_ids)}")
+
+    normalized = []
+    for message in messages:
+        item = {"type": message.type, "content": message.content}
+        if getattr(message, "name", None):
+            item["name"] = message.name
+        for tool_call in getattr(message, "tool_calls", None) or []:
+            item.setdefault("tool_calls", []).append({
+                "name": tool_call["name"],
+                "args": tool_call["args"],
+                "id": alias(tool_call.get("id")),
+            })
+        if getattr(message, "tool_call_id", None):
+            item["tool_call_id"] = alias(message.tool_call_id)
+        normalized.append(item)
+    return normalized
+
+
+def make_cache_key(messages: List[BaseMessage], model_params: dict, stop: Optional[List[str]], call_kwargs: dict) -> str:
+    payload = {
+        "messages": _normalize_messages(messages),
+        "model": model_params,
+        "stop": stop,
+        "kwargs": call_kwargs,
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ==============================================================================
+# Chat model wrapper
+# ==============================================================================
+
+def _revive(entry: dict) -> AIMessage:
+    message = messages_from_dict([entry["message"]])[0]
+    # A fresh id lets add_messages append the replayed answer instead of
+    # replacing the original message that produced the cache entry.
+    message.id = None
+    message.usage_metadata = None
+    message.response_metadata = {**message.response_metadata, "from_cache": True}
+    return message
+
+
+def _replay_chunks(message: AIMessage, chunk_size: int) -> Iterator[ChatGenerationChunk]:
+    content = message.content
+    if isinstance(content, str) and content:
+        for start in range(0, len(content), chunk_size):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=content[start:start + chunk_size]))
+        final_content: Any = ""
+    else:
+        final_content = content
+
+    tool_call_chunks = [
+        {
+            "name": tool_call["name"],
+            "args": json.dumps(tool_call["args"], ensure_ascii=False),
+            "id": tool_call.get("id"),
+            "index": index,
+        }
+        for index, tool_call in enumerate(message.tool_calls)
+    ]
+    yield ChatGenerationChunk(
+        message=AIMessageChunk(
+            content=final_content,
+            additional_kwargs=message.additional_kwargs,
+            response_metadata=message.response_metadata,
+            tool_call_chunks=tool_call_chunks,
+        )
+    )
+
+
+class CachedChatModel(DelegatingChatModel):
+    """Serve repeated prompts from a `ResponseCache` instead of the provider."""
+
+    response_cache: Any
+    only_deterministic: bool = True
+    replay_chunk_size: int = 32
+
+    @property
+    def _wrapper_name(self) -> str:
+        return "cached"
+
+    def _cache_key(self, messages, stop, kwargs) -> Optional[str]:
+        if self.only_deterministic and getattr(innermost_model(self.inner), "temperature", None) != 0:
+            return None
+        return make_cache_key(messages, self.inner._identifying_params, stop, kwargs)
+
+    def _lookup(self, key: Optional[str]) -> Optional[AIMessage]:
+        if key is None:
+            return None
+        entry = self.response_cache.get(key)
+        return _revive(entry) if entry is not None else None
+
+    def _store(self, key: Optional[str], message: BaseMessage) -> None:
+        if key is not None and isinstance(message, AIMessage):
+            self.response_cache.set(key, {"message": message_to_dict(message)})
+
+    async def _alookup(self, key: Optional[str]) -> Optional[AIMessage]:
+        if key is None:
+            return None
+        entry = await self.response_cache.aget(key)
+        return _revive(entry) if entry is not None else None
+
+    async def _astore(self, key: Optional[str], message: BaseMessage) -> None:
+        if key is not None and isinstance(message, AIMessage):
+            await self.response_cache.aset(key, {"message": message_to_dict(message)})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._cache_key(messages, stop, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+        result = self._inner_generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        if len(result.generations) == 1:
+            self._store(key, result.generations[0].message)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        key = self._cache_key(messages, stop, kwargs)
+        cached = await self._alookup(key)
+        if cached is not None:
+            return ChatResult(generations=[ChatGeneration(message=cached)])
+        result = await self._inner_agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        if len(result.generations) == 1:
+            await self._astore(key, result.generations[0].message)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, kwargs)
+        cached = self._lookup(key)
+        if cached is not None:
+            for chunk in _replay_chunks(cached, self.replay_chunk_size):
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+
+        chunks = []
+        for chunk in self._inner_stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        merged = merge_generation_chunks(chunks)
+        if merged is not None:
+            self._store(key, message_chunk_to_message(merged.message))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        key = self._cache_key(messages, stop, kwargs)
+        cached = await self._alookup(key)
+        if cached is not None:
+            for chunk in _replay_chunks(cached, self.replay_chunk_size):
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+            return
+
+        chunks = []
+        async for chunk in self._inner_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            chunks.append(chunk)
+            yield chunk
+        merged = merge_generation_chunks(chunks)
+        if merged is not None:
+            await self._astore(key, message_chunk_to_message(merged.message))
+
+
+def create_cached_model(model, cache_settings: dict) -> CachedChatModel:
+    """Wrap `model` with the response cache described by `cache_settings`."""
+    return CachedChatModel(
+        inner=model,
+        response_cache=get_response_cache(cache_settings),
+        only_deterministic=cache_settings.get("only_deterministic", True),
+        replay_chunk_size=cache_settings.get("replay_chunk_size", 32),
+    )
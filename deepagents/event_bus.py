@@ -0,0 +1,256 @@
+"""Fan-out of typed stream events to several async sinks.
+
+    bus = EventBus()
+    bus.add_sink(ConsoleSink(print))
+    bus.add_sink(sse_sink, maxsize=500, policy="coalesce")
+    await bus.run(agent.astream(inputs, config, stream_mode=["messages", "updates", "custom"]))
+
+The raw stream is converted once by `StreamEventProducer`; each sink gets its
+own bounded queue and worker task, so a slow consumer never blocks the others
+(unless its policy is "block"). When a queue is full the sink's policy decides:
+
+- "block": the publisher waits for space (lossless backpressure)
+- "drop_oldest" / "drop_newest": discard an event and count it
+- "coalesce": merge the new event into a queued one of the same kind
+  (text and tool-argument deltas are concatenated, file paths unioned, usage
+  deltas summed, todo updates replaced),
+  falling back to dropping the oldest event
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+from deepagents.events import StreamEvent, StreamEventProducer
+from deepagents.stream_utils import UI_VISIBILITY
+
+
+Sink = Callable[[StreamEvent], Union[Awaitable[None], None]]
+
+POLICIES = ("block", "drop_oldest", "drop_newest", "coalesce")
+
+
+def coalesce_events(previous: StreamEvent, event: StreamEvent) -> Optional[StreamEvent]:
+    """Merge `event` into `previous` if both describe the same stream, else None."""
+    if previous["type"] != event["type"] or previous.get("agent") != event.get("agent"):
+        return None
+    if event["type"] == "text_delta" and previous["message_id"] == event["message_id"]:
+        return {**previous, "text": previous["text"] + event["text"]}
+    if event["type"] == "tool_call_args" and previous["index"] == event["index"]:
+        return {**previous, "args_delta": previous["args_delta"] + event["args_delta"]}
+    if (
+        event["type"] == "tool_call_field_delta"
+        and previous["index"] == event["index"]
+        and previous["key"] == event["key"]
+    ):
+        return {**previous, "text": previous["text"] + event["text"]}
+    if (
+        event["type"] == "tool_progress"
+        and not event["reset"]
+        and (previous["tool_call_id"], previous["label"], previous["phase"])
+        == (event["tool_call_id"], event["label"], event["phase"])
+    ):
+        return {**previous, "text": previous["text"] + event["text"]}
+    if event["type"] == "todo_update":
+        return event
+    if event["type"] == "file_delta":
+        added = previous["added"] + [path for path in event["added"] if path not in previous["added"]]
+        updated = [
+            path for path in dict.fromkeys(previous["updated"] + event["updated"]) if path not in added
+        ]
+        return {**event, "added": added, "updated": updated}
+    if event["type"] == "usage":
+        return _merge_usage(previous, event)
+    return None
+
+
+def _merge_usage(previous: StreamEvent, event: StreamEvent) -> Optional[StreamEvent]:
+    """Sum the deltas of two usage events of the same scope; totals come from the newer one."""
+    old, new = previous["usage"], event["usage"]
+    if any(old.get(key) != new.get(key) for key in ("scope", "name", "tool_call_id")):
+        return None
+    merged = {**old, **new}
+    if old.get("delta") or new.get("delta"):
+        delta = dict(old.get("delta") or {})
+        for key, value in (new.get("delta") or {}).items():
+            delta[key] = delta.get(key, 0) + value
+        merged["delta"] = delta
+    return {**event, "usage": merged}
+
+
+class _SinkWorker:
+    def __init__(self, sink: Sink, name: str, maxsize: int, policy: str):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown sink policy: {policy}, expected one of {POLICIES}")
+        self.sink = sink
+        self.name = name
+        self.maxsize = maxsize
+        self.policy = policy
+        self.queue: deque = deque()  # (enqueued_at, event)
+        self.not_empty = asyncio.Event()
+        self.not_full = asyncio.Event()
+        self.not_full.set()
+        self.closed = False
+        self.task: Optional[asyncio.Task] = None
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.max_depth = 0
+        self.max_lag = 0.0
+
+    async def put(self, event: StreamEvent) -> None:
+        if len(self.queue) >= self.maxsize:
+            if self.policy == "block":
+                while len(self.queue) >= self.maxsize and not self.closed:
+                    self.not_full.clear()
+                    await self.not_full.wait()
+            elif self.policy == "drop_newest":
+                self.dropped += 1
+                return
+            elif self.policy == "coalesce" and self.queue:
+                enqueued_at, previous = self.queue[-1]
+                merged = coalesce_events(previous, event)
+                if merged is not None:
+                    self.queue[-1] = (enqueued_at, merged)
+                    self.coalesced += 1
+                    return
+                self.queue.popleft()
+                self.dropped += 1
+            else:
+                self.queue.popleft()
+                self.dropped += 1
+        self.queue.append((time.monotonic(), event))
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.not_empty.set()
+
+    async def run(self) -> None:
+        while True:
+            if not self.queue:
+                if self.closed:
+                    return
+                self.not_empty.clear()
+                await self.not_empty.wait()
+                continue
+            enqueued_at, event = self.queue.popleft()
+            self.not_full.set()
+            self.max_lag = max(self.max_lag, time.monotonic() - enqueued_at)
+            try:
+                result = self.sink(event)
+                if asyncio.iscoroutine(result):
+                    await result
+                self.delivered += 1
+            except Exception:
+                # a failing sink must not take the run down with it
+                self.errors += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        lag = time.monotonic() - self.queue[0][0] if self.queue else 0.0
+        return {
+            "policy": self.policy,
+            "depth": len(self.queue),
+            "max_depth": self.max_depth,
+            "lag": lag,
+            "max_lag": self.max_lag,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+        }
+
+
+class EventBus:
+    """Produce typed events once and fan them out to every registered sink."""
+
+    def __init__(self, producer: Optional[StreamEventProducer] = None):
+        self.producer = producer or StreamEventProducer()
+        self._workers: List[_SinkWorker] = []
+
+    def add_sink(self, sink: Sink, name: Optional[str] = None, maxsize: int = 1000, policy: str = "block") -> str:
+        worker = _SinkWorker(sink, name or f"sink-{len(self._workers)}", maxsize, policy)
+        self._workers.append(worker)
+        worker.task = asyncio.ensure_future(worker.run())
+        return worker.name
+
+    async def publish(self, event: StreamEvent) -> None:
+        for worker in self._workers:
+            await worker.put(event)
+
+    async def publish_chunk(self, stream_type: str, data: Any) -> None:
+        for event in self.producer.events(stream_type, data):
+            await self.publish(event)
+
+    async def run(self, stream: AsyncIterator) -> None:
+        """Publish every `(stream_type, data)` chunk of `stream`, then close."""
+        try:
+            async for stream_type, data in stream:
+                await self.publish_chunk(stream_type, data)
+        finally:
+            await self.close()
+
+    async def close(self) -> None:
+        """Let every sink drain its queue, then stop the workers."""
+        for worker in self._workers:
+            worker.closed = True
+            worker.not_empty.set()
+            worker.not_full.set()
+        await asyncio.gather(*(w.task for w in self._workers if w.task), return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Per-sink queue depth, lag and delivery counters."""
+        return {worker.name: worker.metrics() for worker in self._workers}
+
+
+class ConsoleSink:
+    """Render events to a terminal, same output as `process_stream_chunk`."""
+
+    def __init__(self, print_fn: Callable[..., None] = print, ui: Optional[Dict[str, Any]] = None):
+        self.print_fn = print_fn
+        self.ui = ui or UI_VISIBILITY
+
+    def __call__(self, event: StreamEvent) -> None:
+        p = self.print_fn
+        event_type = event["type"]
+        prefix = "  " if event.get("agent") else ""
+        if event_type == "text_delta":
+            p(event["text"], end="", flush=True)
+        elif event_type == "tool_call_end":
+            if event["name"] not in self.ui["hide_tool_calls_for"]:
+                label = "子智能体调用工具" if event.get("agent") else "调用工具"
+                p(f"\n{prefix}🔧 {label}: {event['name']}")
+                p(f"{prefix}   参数: {event['args']}")
+        elif event_type == "message_end" and event["finish_reason"] == "stop":
+            p("\n" + "-" * 32)
+        elif event_type == "todo_update" and self.ui.get("show_todos_updates"):
+            p("\n📋 待办事项已更新：")
+            for i, td in enumerate(event["todos"], 1):
+                title = td.get("content") if isinstance(td, dict) else str(td)
+                status = td.get("status") if isinstance(td, dict) else None
+                p(f"  {i}. [{status}] {title}" if status else f"  {i}. {title}")
+        elif event_type == "file_delta" and self.ui.get("show_file_updates"):
+            p("\n🗂️ 工作区文件已更新：")
+            for f in event["added"]:
+                p(f"  新增: {f}")
+            for f in event["updated"]:
+                p(f"  修改: {f}")
+        elif event_type == "subagent_start":
+            p(f"\n=== 启动子智能体: {event['name']} ===")
+            if event.get("description"):
+                p(f"任务描述: {event['description']}")
+        elif event_type == "subagent_end":
+            p("\n=== 子智能体任务完成 ===")
+        elif event_type == "usage":
+            usage = event["usage"]
+            if usage.get("budget_exceeded"):
+                p(f"\n⛔ 预算已用尽: {usage['budget_exceeded']}")
+            elif self.ui.get("show_usage"):
+                delta = usage.get("delta") or {}
+                p(f"\n💰 [{event.get('agent') or usage.get('name') or 'main'}] tokens +{delta.get('total_tokens', 0)}")
+        elif event_type == "tool_progress" and self.ui.get("show_tool_progress"):
+            if event["phase"] == "answer":
+                p(event["text"], end="", flush=True)
+        elif event_type == "custom":
+            p(str(event["data"]))
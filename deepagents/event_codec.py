@@ -0,0 +1,273 @@
+"""Compact serialization for streaming events.
+
+`json.dumps(..., default=str)` on a message chunk walks (or stringifies) the
+whole LangChain object including every provider field in `additional_kwargs`
+and `response_metadata`. The stream only needs a handful of fields, so the
+codec projects each event onto a precomputed field list and encodes the result
+with orjson when it is installed (stdlib json otherwise).
+
+Two framings are supported:
+
+- "json": SSE text frames (`id:/event:/data:`), what the v2 frontend reads
+- "msgpack": length-prefixed binary frames `[id, event, data]` for websocket
+  or internal transports; requires the optional `msgpack` package
+
+Run `python -m deepagents.event_codec` for a events/sec microbenchmark.
+"""
+
+from __future__ import annotations
+
+import json
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Tuple, get_args, get_type_hints
+
+from deepagents.events import (
+    CustomEvent,
+    FileDelta,
+    MessageEnd,
+    SubagentEnd,
+    SubagentStart,
+    TextDelta,
+    TodoUpdate,
+    ToolCallArgs,
+    ToolCallEnd,
+    ToolCallField,
+    ToolCallFieldDelta,
+    ToolCallStart,
+    ToolProgress,
+    ToolResult,
+    UsageUpdate,
+)
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+
+# ==============================================================================
+# Field projections
+# ==============================================================================
+
+# Fields of a message chunk the frontends read; everything else stays behind.
+MESSAGE_ADDITIONAL_KWARGS_FIELDS = ("tool_calls", "tool_call_chunks", "tool_call_id")
+MESSAGE_RESPONSE_METADATA_FIELDS = ("finish_reason", "model_name")
+TOOL_CALL_CHUNK_FIELDS = ("index", "id", "name", "args")
+
+# Typed events (deepagents/events.py): projected on their declared keys.
+EVENT_FIELDS: Dict[str, Tuple[str, ...]] = {
+    get_args(get_type_hints(cls)["type"])[0]: tuple(get_type_hints(cls))
+    for cls in (
+        TextDelta,
+        MessageEnd,
+        ToolCallStart,
+        ToolCallArgs,
+        ToolCallField,
+        ToolCallFieldDelta,
+        ToolCallEnd,
+        ToolResult,
+        FileDelta,
+        TodoUpdate,
+        SubagentStart,
+        SubagentEnd,
+        UsageUpdate,
+        ToolProgress,
+        CustomEvent,
+    )
+}
+
+# chunk classes report e.g. "AIMessageChunk"; the frontend expects "ai"
+_MESSAGE_TYPES = {"AIMessageChunk": "ai", "ToolMessageChunk": "tool", "HumanMessageChunk": "human"}
+
+
+def _pick(source: Dict[str, Any], fields: Tuple[str, ...]) -> Dict[str, Any]:
+    return {field: source[field] for field in fields if source.get(field) is not None}
+
+
+def project_message(message: Any) -> Dict[str, Any]:
+    """The v2 `message` payload of a LangChain message or message chunk."""
+    additional_kwargs = _pick(getattr(message, "additional_kwargs", None) or {}, MESSAGE_ADDITIONAL_KWARGS_FIELDS)
+    tool_call_chunks = getattr(message, "tool_call_chunks", None)
+    if tool_call_chunks and "tool_call_chunks" not in additional_kwargs:
+        additional_kwargs["tool_call_chunks"] = [_pick(tc, TOOL_CALL_CHUNK_FIELDS) for tc in tool_call_chunks]
+    tool_call_id = getattr(message, "tool_call_id", None)
+    if tool_call_id:
+        additional_kwargs.setdefault("tool_call_id", tool_call_id)
+    message_type = getattr(message, "type", "ai")
+    return {
+        "id": getattr(message, "id", None),
+        "content": message.content,
+        "type": _MESSAGE_TYPES.get(message_type, message_type),
+        "additional_kwargs": additional_kwargs,
+        "response_metadata": _pick(getattr(message, "response_metadata", None) or {}, MESSAGE_RESPONSE_METADATA_FIELDS),
+    }
+
+
+def project_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Project a typed `StreamEvent` onto the fields declared for its type."""
+    fields = EVENT_FIELDS.get(event.get("type"))
+    if fields is None:
+        return event
+    return {field: event.get(field) for field in fields}
+
+
+def _default(value: Any) -> Any:
+    # objects that slipped into a payload: project messages, stringify the rest
+    if hasattr(value, "content") and hasattr(value, "type"):
+        return project_message(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    return str(value)
+
+
+# ==============================================================================
+# JSON backend
+# ==============================================================================
+
+if orjson is not None:
+    # datetimes and dataclasses go through `_default` like with stdlib json,
+    # so both backends produce the same payload
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+    loads = json.loads
+
+
+# ==============================================================================
+# Framing
+# ==============================================================================
+
+_LENGTH = struct.Struct(">I")
+
+
+class EventCodec:
+    """Encode stream events as SSE text frames or binary msgpack frames."""
+
+    def __init__(self, framing: str = "json"):
+        if framing not in ("json", "msgpack"):
+            raise ValueError(f"Unknown framing: {framing}, expected 'json' or 'msgpack'")
+        if framing == "msgpack" and msgpack is None:
+            raise ImportError("msgpack framing requires the 'msgpack' package: pip install msgpack")
+        self.framing = framing
+        if msgpack is not None:
+            self._packer = msgpack.Packer(default=_default, use_bin_type=True)
+
+    def payload(self, event_type: str, data: Any) -> bytes:
+        """The JSON body of an SSE frame: `{"type": ..., "data": ...}`."""
+        return dumps({"type": event_type, "data": data})
+
+    def sse_frame(self, event_id: Optional[int], event_type: str, data: Any) -> str:
+        head = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{head}event: {event_type}\ndata: {self.payload(event_type, data).decode('utf-8')}\n\n"
+
+    def binary_frame(self, event_id: Optional[int], event_type: str, data: Any) -> bytes:
+        """Length-prefixed `[id, event, data]` frame."""
+        if self.framing == "msgpack":
+            body = self._packer.pack([event_id, event_type, data])
+        else:
+            body = dumps([event_id, event_type, data])
+        return _LENGTH.pack(len(body)) + body
+
+    def frame(self, event_id: Optional[int], event_type: str, data: Any):
+        if self.framing == "json":
+            return self.sse_frame(event_id, event_type, data)
+        return self.binary_frame(event_id, event_type, data)
+
+    def decode_binary_frames(self, buffer: bytes) -> Tuple[List[Tuple[Optional[int], str, Any]], bytes]:
+        """Split `buffer` into complete frames; returns `(frames, remainder)`."""
+        frames = []
+        offset = 0
+        while len(buffer) - offset >= _LENGTH.size:
+            (length,) = _LENGTH.unpack_from(buffer, offset)
+            end = offset + _LENGTH.size + length
+            if end > len(buffer):
+                break
+            body = buffer[offset + _LENGTH.size:end]
+            if self.framing == "msgpack":
+                frames.append(tuple(msgpack.unpackb(body, raw=False)))
+            else:
+                frames.append(tuple(loads(body)))
+            offset = end
+        return frames, buffer[offset:]
+
+
+_DEFAULT_CODEC: Optional[EventCodec] = None
+
+
+def get_event_codec() -> EventCodec:
+    global _DEFAULT_CODEC
+    if _DEFAULT_CODEC is None:
+        _DEFAULT_CODEC = EventCodec()
+    return _DEFAULT_CODEC
+
+
+# ==============================================================================
+# Microbenchmark
+# ==============================================================================
+
+def _benchmark_events() -> Iterator[Tuple[str, Any]]:
+    from langchain_core.messages import AIMessageChunk
+
+    text = AIMessageChunk(
+        content="电网安全系统需求",
+        id="run--b56ef970-8674-4a5d-b49b-cc5dbe69d3db",
+        response_metadata={"model_name": "qwen-max", "system_fingerprint": None, "service_tier": "default"},
+        additional_kwargs={"refusal": None},
+    )
+    tool = AIMessageChunk(
+        content="",
+        id="run--b56ef970-8674-4a5d-b49b-cc5dbe69d3db",
+        tool_call_chunks=[{"index": 0, "id": "call_deda15", "name": "task", "args": '{"description": "生成'}],
+    )
+    while True:
+        yield "message", text
+        yield "message", tool
+        yield "text_delta", TextDelta(type="text_delta", agent=None, message_id=text.id, text="需求文档")
+
+
+def benchmark(seconds: float = 2.0) -> Dict[str, float]:
+    """Events/sec on one core: stdlib `json.dumps(default=str)` vs the codec."""
+    import time
+
+    def run(encode) -> float:
+        events = _benchmark_events()
+        count = 0
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for _ in range(300):
+                event_type, data = next(events)
+                encode(event_type, data)
+            count += 300
+        return count / seconds
+
+    codec = EventCodec()
+    results = {
+        "json_default_str": run(lambda t, d: json.dumps({"type": t, "data": d}, ensure_ascii=False, default=str)),
+        "codec_sse": run(lambda t, d: codec.sse_frame(
+            1, t, project_message(d) if t == "message" else project_event(d)
+        )),
+    }
+    if msgpack is not None:
+        binary = EventCodec("msgpack")
+        results["codec_msgpack"] = run(lambda t, d: binary.binary_frame(
+            1, t, project_message(d) if t == "message" else project_event(d)
+        ))
+    return results
+
+
+if __name__ == "__main__":
+    backend = "orjson" if orjson is not None else "json"
+    for name, rate in benchmark().items():
+        print(f"{name:20s} {rate:>12,.0f} events/sec  (backend: {backend})")
@@ -0,0 +1,312 @@
+"""Typed events for deep agent streams.
+
+`StreamEventProducer` turns the raw `(stream_type, data)` pairs from
+`agent.astream(..., stream_mode=["messages", "updates", "custom"])` into
+plain, JSON-friendly typed events, once per run. Consumers (CLI, SSE server,
+tests) subscribe to an `EventBus` (deepagents/event_bus.py) instead of
+re-implementing the dispatch in `stream_utils`.
+
+Every event has a `type` and an `agent` (None for the main agent, the
+subagent name otherwise).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Literal, Optional, Union
+from typing_extensions import TypedDict
+
+from deepagents.stream_utils import init_stream_state, render_text_chunk
+from deepagents.tool_args import append_tool_call_piece, new_tool_call_buffer, tool_call_args, tool_call_pieces
+
+
+class TextDelta(TypedDict):
+    type: Literal["text_delta"]
+    agent: Optional[str]
+    message_id: Optional[str]
+    text: str
+
+
+class MessageEnd(TypedDict):
+    type: Literal["message_end"]
+    agent: Optional[str]
+    message_id: Optional[str]
+    finish_reason: str
+
+
+class ToolCallStart(TypedDict):
+    type: Literal["tool_call_start"]
+    agent: Optional[str]
+    index: int
+    id: Optional[str]
+    name: str
+
+
+class ToolCallArgs(TypedDict):
+    type: Literal["tool_call_args"]
+    agent: Optional[str]
+    index: int
+    id: Optional[str]
+    args_delta: str
+
+
+class ToolCallField(TypedDict):
+    """A top-level argument whose value finished streaming before the call ended."""
+
+    type: Literal["tool_call_field"]
+    agent: Optional[str]
+    index: int
+    id: Optional[str]
+    name: Optional[str]
+    key: str
+    value: Any
+    truncated: bool
+
+
+class ToolCallFieldDelta(TypedDict):
+    type: Literal["tool_call_field_delta"]
+    agent: Optional[str]
+    index: int
+    id: Optional[str]
+    key: str
+    text: str
+
+
+class ToolCallEnd(TypedDict):
+    type: Literal["tool_call_end"]
+    agent: Optional[str]
+    index: int
+    id: Optional[str]
+    name: str
+    args: str
+
+
+class ToolResult(TypedDict):
+    type: Literal["tool_result"]
+    agent: Optional[str]
+    tool_call_id: Optional[str]
+    name: Optional[str]
+    content: str
+
+
+class FileDelta(TypedDict):
+    type: Literal["file_delta"]
+    agent: Optional[str]
+    added: List[str]
+    updated: List[str]
+    files: List[str]
+
+
+class TodoUpdate(TypedDict):
+    type: Literal["todo_update"]
+    agent: Optional[str]
+    todos: List[Dict[str, Any]]
+
+
+class SubagentStart(TypedDict):
+    type: Literal["subagent_start"]
+    agent: Optional[str]
+    name: str
+    description: Optional[str]
+
+
+class SubagentEnd(TypedDict):
+    type: Literal["subagent_end"]
+    agent: Optional[str]
+    name: Optional[str]
+
+
+class UsageUpdate(TypedDict):
+    type: Literal["usage"]
+    agent: Optional[str]
+    usage: Dict[str, Any]
+
+
+class ToolProgress(TypedDict):
+    """Partial output of a long-running tool, written with `get_stream_writer`.
+
+    `phase` is "thinking" or "answer"; `reset` means the text streamed so far
+    for this call (and `label`) turned out to be reasoning and should be
+    cleared. `label` tells apart several jobs of one call, e.g. the queries
+    of a batch search.
+    """
+
+    type: Literal["tool_progress"]
+    agent: Optional[str]
+    tool_call_id: Optional[str]
+    name: Optional[str]
+    label: Optional[str]
+    phase: str
+    text: str
+    reset: bool
+
+
+class CustomEvent(TypedDict):
+    type: Literal["custom"]
+    agent: Optional[str]
+    data: Any
+
+
+StreamEvent = Union[
+    TextDelta,
+    MessageEnd,
+    ToolCallStart,
+    ToolCallArgs,
+    ToolCallField,
+    ToolCallFieldDelta,
+    ToolCallEnd,
+    ToolResult,
+    FileDelta,
+    TodoUpdate,
+    SubagentStart,
+    SubagentEnd,
+    UsageUpdate,
+    ToolProgress,
+    CustomEvent,
+]
+
+
+class StreamEventProducer:
+    """Convert raw agent stream chunks into `StreamEvent`s.
+
+    Tool-call arguments are parsed incrementally: a `tool_call_field` event is
+    emitted as soon as a top-level argument is complete (e.g. `file_path`
+    before `content`). With `field_deltas=True`, string arguments also stream
+    as `tool_call_field_delta` events.
+    """
+
+    def __init__(self, field_deltas: bool = False, max_field_chars: int = 4096):
+        self.field_deltas = field_deltas
+        self.max_field_chars = max_field_chars
+        self._states: Dict[Optional[str], Dict[str, Any]] = {}
+
+    def _state(self, agent: Optional[str]) -> Dict[str, Any]:
+        if agent not in self._states:
+            self._states[agent] = init_stream_state()
+        return self._states[agent]
+
+    def events(self, stream_type: str, data: Any, agent: Optional[str] = None) -> List[StreamEvent]:
+        if stream_type == "messages":
+            message_chunk, _metadata = data
+            return self._message_events(message_chunk, agent)
+        if stream_type == "updates":
+            return self._update_events(data, agent)
+        if stream_type == "custom":
+            return self._custom_events(data, agent)
+        return [CustomEvent(type="custom", agent=agent, data=data)]
+
+    # ------------------------------------------------------------------
+
+    def _message_events(self, message_chunk: Any, agent: Optional[str]) -> List[StreamEvent]:
+        state = self._state(agent)
+        events: List[StreamEvent] = []
+        message_id = getattr(message_chunk, "id", None)
+
+        if getattr(message_chunk, "type", None) == "tool":
+            events.append(ToolResult(
+                type="tool_result",
+                agent=agent,
+                tool_call_id=getattr(message_chunk, "tool_call_id", None),
+                name=getattr(message_chunk, "name", None),
+                content=str(message_chunk.content),
+            ))
+            return events
+
+        if getattr(message_chunk, "content", None):
+            render_text_chunk(
+                message_chunk,
+                state,
+                lambda text: events.append(TextDelta(type="text_delta", agent=agent, message_id=message_id, text=text)),
+            )
+
+        for index, tool_call_id, name, args, source in tool_call_pieces(message_chunk):
+            buf = state["tool_call_chunks"].get(index)
+            if buf is None:
+                buf = state["tool_call_chunks"][index] = new_tool_call_buffer(self.max_field_chars)
+            if tool_call_id:
+                buf["id"] = tool_call_id
+            if name and not buf["name"]:
+                buf["name"] = name
+                events.append(ToolCallStart(type="tool_call_start", agent=agent, index=index, id=buf["id"], name=name))
+            args = append_tool_call_piece(buf, args, source) if args else ""
+            if not args:
+                continue
+            events.append(ToolCallArgs(type="tool_call_args", agent=agent, index=index, id=buf["id"], args_delta=args))
+            for kind, key, value, truncated in buf["parser"].feed(args):
+                if kind == "field":
+                    events.append(ToolCallField(
+                        type="tool_call_field", agent=agent, index=index, id=buf["id"], name=buf["name"],
+                        key=key, value=value, truncated=truncated,
+                    ))
+                elif self.field_deltas:
+                    events.append(ToolCallFieldDelta(
+                        type="tool_call_field_delta", agent=agent, index=index, id=buf["id"], key=key, text=value,
+                    ))
+
+        finish_reason = (getattr(message_chunk, "response_metadata", None) or {}).get("finish_reason")
+        if finish_reason:
+            for index in sorted(state["tool_call_chunks"]):
+                buf = state["tool_call_chunks"][index]
+                if buf["name"]:
+                    events.append(ToolCallEnd(
+                        type="tool_call_end", agent=agent, index=index, id=buf["id"], name=buf["name"],
+                        args=tool_call_args(buf),
+                    ))
+            state["tool_call_chunks"].clear()
+            events.append(MessageEnd(type="message_end", agent=agent, message_id=message_id, finish_reason=finish_reason))
+        return events
+
+    def _update_events(self, data: Any, agent: Optional[str]) -> List[StreamEvent]:
+        state = self._state(agent)
+        events: List[StreamEvent] = []
+        if not isinstance(data, dict):
+            return [CustomEvent(type="custom", agent=agent, data=data)]
+        for node_data in data.values():
+            if not isinstance(node_data, dict):
+                continue
+            if node_data.get("todos"):
+                events.append(TodoUpdate(type="todo_update", agent=agent, todos=list(node_data["todos"])))
+            files = node_data.get("files")
+            if files:
+                # snapshot maps path -> number of versions seen
+                snapshot = state["last_files_snapshot"] or {}
+                added = [path for path in files if path not in snapshot]
+                updated = [
+                    path for path, versions in files.items()
+                    if path in snapshot and snapshot[path] != _version_count(versions)
+                ]
+                state["last_files_snapshot"] = {**snapshot, **{p: _version_count(v) for p, v in files.items()}}
+                if added or updated:
+                    events.append(FileDelta(
+                        type="file_delta", agent=agent, added=added, updated=updated,
+                        files=list(state["last_files_snapshot"]),
+                    ))
+        return events
+
+    def _custom_events(self, data: Any, agent: Optional[str]) -> List[StreamEvent]:
+        if isinstance(data, dict) and "usage" in data:
+            return [UsageUpdate(type="usage", agent=agent, usage=data["usage"])]
+        if isinstance(data, dict) and "tool_progress" in data:
+            progress = data["tool_progress"]
+            return [ToolProgress(
+                type="tool_progress", agent=agent, tool_call_id=progress.get("tool_call_id"),
+                name=progress.get("name"), label=progress.get("label"), phase=progress.get("phase", "answer"),
+                text=progress.get("text", ""), reset=bool(progress.get("reset")),
+            )]
+        if not (isinstance(data, dict) and "subagent" in data):
+            return [CustomEvent(type="custom", agent=agent, data=data)]
+
+        event = data["subagent"]
+        event_type = event.get("type")
+        name = event.get("name")
+        if event_type == "start":
+            return [SubagentStart(type="subagent_start", agent=agent, name=name or "subagent",
+                                  description=event.get("description"))]
+        if event_type == "stop":
+            return [SubagentEnd(type="subagent_end", agent=agent, name=name)]
+        if event_type == "chunk":
+            return self.events(event.get("stream_type"), event.get("data"), agent=name or "subagent")
+        return [CustomEvent(type="custom", agent=name, data=event)]
+
+
+def _version_count(versions: Any) -> int:
+    return len(versions) if isinstance(versions, list) else 1
@@ -12,6 +12,16 @@ from langgraph.types import Checkpointer
 from langgraph.prebuilt import create_react_agent
 from langchain.chat_models import init_chat_model
 from deepagents.utils import create_node_llm
+from deepagents.usage import UsageBudget, ModelPrices, create_budget_gate, create_usage_hook, chain_post_model_hooks
+from deepagents.tool_exposure import ToolExposureCache, ToolExposurePolicy
+from deepagents.tool_journal import ToolJournal, journal_tools
+from deepagents.prompts import (
+    WRITE_TODOS_CONCISE_DESCRIPTION,
+    TASK_CONCISE_DESCRIPTION_PREFIX,
+    EDIT_WITH_COMMIT_MESSAGE_CONCISE_DESCRIPTION,
+    TOOL_CONCISE_DESCRIPTION,
+    TOOL_CONCISE_DESCRIPTION_AND_HISTORY,
+)
 
 
 
@@ -42,6 +52,10 @@ def create_deep_agent(
     config_schema: Optional[Type[Any]] = None,
     checkpointer: Optional[Checkpointer] = None,
     post_model_hook: Optional[Callable] = None,
+    usage_budget: Optional[UsageBudget] = None,
+    model_prices: Optional[ModelPrices] = None,
+    tool_exposure_policy: Optional[ToolExposurePolicy] = None,
+    tool_journal: Optional[ToolJournal] = None,
 ):
     """Create a deep agent.
 
@@ -65,9 +79,25 @@ def create_deep_agent(
         subagent_tools: The tools to use for the subagents.
         state_schema: The schema of the deep agent. Should subclass from DeepAgentState
         interrupt_config: Optional Dict[str, HumanInterruptConfig] mapping tool names to interrupt configs.
+            A config may add `auto_approve` rules (path globs, size limits, argument
+            patterns); calls matching them, or a decision remembered for the thread,
+            run without an interrupt.
 
         config_schema: The schema of the deep agent.
         checkpointer: Optional checkpointer for persisting agent state between runs.
+        post_model_hook: Optional custom post model hook.
+        usage_budget: Optional hard limits (tokens, cost, model calls) for a thread.
+            The run stops gracefully once one of them is reached: the call that
+            crosses a limit completes, no model call starts after it.
+        model_prices: Optional per-model prices (per 1k input/output tokens) used
+            to compute the `cost` in the `usage` channel.
+        tool_exposure_policy: Optional callable `(state) -> ToolExposure` choosing the
+            tools and description verbosity bound for each main-agent turn, e.g.
+            `default_tool_exposure_policy`.
+        tool_journal: Optional `ToolJournal` recording completed calls of the given
+            tools, subagent tools and `task`, so a resumed run replays them instead
+            of executing them again. Inside subagents calls are keyed by their
+            arguments, see `deepagents.tool_journal`.
     """
     
     prompt = instructions + base_prompt
@@ -78,15 +108,19 @@ def create_deep_agent(
     if isinstance(model, dict):
         model = create_node_llm(model)
     state_schema = state_schema or DeepAgentState
+    tools = journal_tools(tools, tool_journal)
     task_tool = _create_task_tool(
         list(tools) + built_in_tools,
         instructions,
         subagents or [],
         subagent_tools or [],
         model,
-        state_schema
+        state_schema,
+        usage_budget=usage_budget,
+        model_prices=model_prices,
+        tool_journal=tool_journal,
     )
-    all_tools = built_in_tools + [task_tool]
+    all_tools = built_in_tools + journal_tools([task_tool], tool_journal)
     
     # Should never be the case that both are specified
     if post_model_hook and interrupt_config:
@@ -100,8 +134,39 @@ def create_deep_agent(
         selected_post_model_hook = create_interrupt_hook(interrupt_config)
     else:
         selected_post_model_hook = None
+    # Usage accounting runs first so an exhausted budget drops tool calls
+    # before any approval interrupt is raised for them
+    selected_post_model_hook = chain_post_model_hooks(
+        create_usage_hook(usage_budget, model_prices),
+        selected_post_model_hook,
+    )
 
 
+    if tool_exposure_policy is not None:
+        if isinstance(model, str):
+            model = init_chat_model(model)
+        other_agents_string = [
+            f"- {_agent['name']}: {_agent['description']}" for _agent in subagents or []
+        ]
+        tool_exposure = ToolExposureCache(
+            model,
+            all_tools,
+            tool_exposure_policy,
+            concise_descriptions={
+                "write_todos": WRITE_TODOS_CONCISE_DESCRIPTION,
+                "task": TASK_CONCISE_DESCRIPTION_PREFIX.format(other_agents=other_agents_string),
+                "edit_file_with_commit_message": EDIT_WITH_COMMIT_MESSAGE_CONCISE_DESCRIPTION,
+                "read_file_content": TOOL_CONCISE_DESCRIPTION,
+                "read_file_content_and_history": TOOL_CONCISE_DESCRIPTION_AND_HISTORY,
+            },
+        )
+        # dynamic model: binds the tool subset chosen for the current state
+        model = tool_exposure.select_model
+    if usage_budget:
+        if isinstance(model, str):
+            model = init_chat_model(model)
+        # checked before every call; the usage hook can only stop after one
+        model = create_budget_gate(model, usage_budget, all_tools)
 
     return create_react_agent(
         model,
@@ -1,6 +1,37 @@
-"""Interrupt configuration functionality for deep agents using LangGraph prebuilts."""
+"""Interrupt configuration functionality for deep agents using LangGraph prebuilts.
 
+A gated tool can carry auto-approval rules next to its `HumanInterruptConfig`::
+
+    interrupt_config = {
+        "write_file": {
+            "allow_accept": True, "allow_edit": True, "allow_respond": True, "allow_ignore": True,
+            # no interrupt for small writes under system/
+            "auto_approve": [{"path_glob": "system/*", "max_size": 20000}],
+        },
+    }
+
+A human response may also carry `"remember": <ApprovalRule>` (or `True` for
+every call of that tool), e.g. "approve all writes under `system/` for this
+thread". Remembered rules, the digests of accepted calls and approval
+statistics live in the `approvals` channel of `DeepAgentState`, so they are
+persisted with the thread by the checkpointer.
+
+`human_wait_seconds` adds up how long humans took to answer, and
+`human_wait_removed_seconds` estimates the wait each avoided interrupt saved
+(the thread's average wait per interrupt so far, or `assumed_wait_seconds`
+before the first one).
+"""
+
+import fnmatch
+import hashlib
+import json
+import threading
+import time
 from typing import Dict, Any, List, Optional, Union
+from typing_extensions import NotRequired, TypedDict
+
+from langchain_core.messages import ToolMessage
+from langgraph.config import get_config, get_stream_writer
 from langgraph.types import interrupt
 from langgraph.prebuilt.interrupt import (
     HumanInterruptConfig,
@@ -9,19 +40,146 @@ from langgraph.prebuilt.interrupt import (
     HumanResponse,
 )
 
-ToolInterruptConfig = Dict[str, HumanInterruptConfig]
+
+class ApprovalRule(TypedDict, total=False):
+    """Conditions under which a gated tool call is approved without a human.
+
+    Every condition present must hold; an empty rule matches every call.
+    """
+
+    path_glob: str  # fnmatch pattern for the path argument
+    path_arg: str  # argument holding the path, defaults to "file_path"
+    max_size: int  # max length of the size argument
+    size_arg: str  # argument measured by max_size, defaults to "content"
+    args: Dict[str, str]  # fnmatch pattern per (stringified) argument
+
+
+class ToolApprovalConfig(HumanInterruptConfig):
+    auto_approve: NotRequired[List[ApprovalRule]]
+
+
+ToolInterruptConfig = Dict[str, Union[HumanInterruptConfig, ToolApprovalConfig]]
+
+_HUMAN_CONFIG_KEYS = ("allow_ignore", "allow_respond", "allow_edit", "allow_accept")
+APPROVAL_STATS_FIELDS = (
+    "auto_approved",  # approved by a configured rule
+    "remembered",  # approved by a remembered rule or an identical earlier decision
+    "interrupts",  # interrupts raised (one per model turn at most)
+    "interrupts_avoided",  # turns with gated calls that needed no interrupt
+    "human_decisions",
+    "human_wait_seconds",
+    "human_wait_removed_seconds",  # estimated, see the module docstring
+)
+MAX_REMEMBERED_CALLS = 500
+
+# thread_id -> {tool_call_id: time the interrupt was first raised}; the hook
+# runs again on resume, so this is how the human wait is measured (same
+# process only). Threads never resumed are forgotten after the TTL.
+PENDING_APPROVAL_TTL = 24 * 3600.0
+_PENDING_SINCE: Dict[str, Dict[str, float]] = {}
+_PENDING_LOCK = threading.Lock()
+
+
+def _mark_pending(thread_id: str, tool_call_ids: List[str], now: float) -> None:
+    with _PENDING_LOCK:
+        for pending_thread, calls in list(_PENDING_SINCE.items()):
+            for tool_call_id, raised_at in list(calls.items()):
+                if now - raised_at > PENDING_APPROVAL_TTL:
+                    del calls[tool_call_id]
+            if not calls:
+                del _PENDING_SINCE[pending_thread]
+        calls = _PENDING_SINCE.setdefault(thread_id, {})
+        for tool_call_id in tool_call_ids:
+            calls.setdefault(tool_call_id, now)
+
+
+def _pop_pending(thread_id: str, tool_call_ids: List[str], now: float) -> float:
+    """Longest wait among `tool_call_ids` (0 when they were raised in another process)."""
+    with _PENDING_LOCK:
+        calls = _PENDING_SINCE.get(thread_id, {})
+        wait = max(now - calls.pop(tool_call_id, now) for tool_call_id in tool_call_ids)
+        if not calls:
+            _PENDING_SINCE.pop(thread_id, None)
+    return wait
+
+
+def _current_thread_id() -> str:
+    try:
+        return str((get_config().get("configurable") or {}).get("thread_id", ""))
+    except RuntimeError:
+        # Not running inside a graph
+        return ""
+
+
+def clear_pending_approvals(thread_id: str) -> None:
+    """Forget the unanswered interrupts of `thread_id`, e.g. when the thread is deleted."""
+    with _PENDING_LOCK:
+        _PENDING_SINCE.pop(thread_id, None)
+
+
+def approvals_reducer(l, r):
+    if l is None:
+        return r
+    if r is None:
+        return l
+    rules = {tool: list(tool_rules) for tool, tool_rules in (l.get("rules") or {}).items()}
+    for tool, tool_rules in (r.get("rules") or {}).items():
+        existing = rules.setdefault(tool, [])
+        existing.extend(rule for rule in tool_rules if rule not in existing)
+    approved = list(dict.fromkeys((l.get("approved") or []) + (r.get("approved") or [])))
+    stats = dict(l.get("stats") or {})
+    for key, value in (r.get("stats") or {}).items():
+        stats[key] = stats.get(key, 0) + value
+    return {"rules": rules, "approved": approved[-MAX_REMEMBERED_CALLS:], "stats": stats}
+
+
+def rule_matches(rule: ApprovalRule, args: Dict[str, Any]) -> bool:
+    if "path_glob" in rule:
+        path = args.get(rule.get("path_arg", "file_path"))
+        if not isinstance(path, str) or not fnmatch.fnmatch(path.lstrip("/"), rule["path_glob"].lstrip("/")):
+            return False
+    if "max_size" in rule:
+        value = args.get(rule.get("size_arg", "content"))
+        if value is not None and len(value if isinstance(value, str) else str(value)) > rule["max_size"]:
+            return False
+    for name, pattern in (rule.get("args") or {}).items():
+        if name not in args or not fnmatch.fnmatch(str(args[name]), pattern):
+            return False
+    return True
+
+
+def _matches_any(rules: Optional[List[ApprovalRule]], args: Dict[str, Any]) -> bool:
+    return any(rule_matches(rule, args) for rule in rules or [])
+
+
+def _call_digest(tool_call: Dict[str, Any]) -> str:
+    payload = json.dumps([tool_call["name"], tool_call["args"]], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _write_approvals_event(stats: Dict[str, Any]) -> None:
+    try:
+        get_stream_writer()({"approvals": stats})
+    except Exception:
+        # Not running inside a graph stream
+        pass
+
 
 def create_interrupt_hook(
     tool_configs: ToolInterruptConfig,
     message_prefix: str = "Tool execution requires approval",
+    assumed_wait_seconds: float = 0.0,
 ) -> callable:
     """Create a post model hook that handles interrupts using native LangGraph schemas.
-    
+
     Args:
-        tool_configs: Dict mapping tool names to HumanInterruptConfig objects
+        tool_configs: Dict mapping tool names to HumanInterruptConfig objects,
+            optionally with `auto_approve` rules
         message_prefix: Optional message prefix for interrupt descriptions
+        assumed_wait_seconds: Human wait counted for an avoided interrupt while
+            the thread has no measured wait yet
     """
-    
+
     def interrupt_hook(state: Dict[str, Any]) -> Dict[str, Any]:
         """Post model hook that checks for tool calls and triggers interrupts if needed."""
         messages = state.get("messages", [])
@@ -33,31 +191,51 @@ def create_interrupt_hook(
         if not hasattr(last_message, "tool_calls") or not last_message.tool_calls:
             return
 
+        approvals = state.get("approvals") or {}
+        remembered_rules = approvals.get("rules") or {}
+        remembered_calls = set(approvals.get("approved") or [])
+        stats = {field: 0 for field in APPROVAL_STATS_FIELDS}
+
         # Separate tool calls that need interrupts from those that don't
         interrupt_tool_calls = []
-        auto_approved_tool_calls = []
-        
+
         for tool_call in last_message.tool_calls:
             tool_name = tool_call["name"]
-            if tool_name in tool_configs:
-                interrupt_tool_calls.append(tool_call)
+            if tool_name not in tool_configs:
+                continue
+            if _matches_any(tool_configs[tool_name].get("auto_approve"), tool_call["args"]):
+                stats["auto_approved"] += 1
+            elif (
+                _matches_any(remembered_rules.get(tool_name), tool_call["args"])
+                or _call_digest(tool_call) in remembered_calls
+            ):
+                stats["remembered"] += 1
             else:
-                auto_approved_tool_calls.append(tool_call)
+                interrupt_tool_calls.append(tool_call)
 
         # If no interrupts needed, return early
         if not interrupt_tool_calls:
-            return
-
-        approved_tool_calls = auto_approved_tool_calls.copy()
+            if not (stats["auto_approved"] or stats["remembered"]):
+                return
+            stats["interrupts_avoided"] = 1
+            history = approvals.get("stats") or {}
+            stats["human_wait_removed_seconds"] = (
+                history["human_wait_seconds"] / history["interrupts"]
+                if history.get("interrupts") else assumed_wait_seconds
+            )
+            _write_approvals_event(stats)
+            return {"approvals": {"stats": stats}}
 
-        # Process all tool calls that need interrupts in parallel
+        # All gated calls of this turn go into a single interrupt
         requests = []
-        
+
         for tool_call in interrupt_tool_calls:
             tool_name = tool_call["name"]
             tool_args = tool_call["args"]
             description = f"{message_prefix}\n\nTool: {tool_name}\nArgs: {tool_args}"
-            tool_config = tool_configs[tool_name]
+            tool_config = {
+                key: value for key, value in tool_configs[tool_name].items() if key in _HUMAN_CONFIG_KEYS
+            }
 
             request: HumanInterrupt = {
                 "action_request": ActionRequest(
@@ -69,13 +247,26 @@ def create_interrupt_hook(
             }
             requests.append(request)
 
+        thread_id = _current_thread_id()
+        tool_call_ids = [tool_call["id"] for tool_call in interrupt_tool_calls]
+        _mark_pending(thread_id, tool_call_ids, time.time())
+
         responses: List[HumanResponse] = interrupt(requests)
-        
+
+        stats["interrupts"] = 1
+        stats["human_decisions"] = len(interrupt_tool_calls)
+        stats["human_wait_seconds"] = _pop_pending(thread_id, tool_call_ids, time.time())
+
+        decided: Dict[str, Dict[str, Any]] = {}
+        tool_messages = []
+        new_rules: Dict[str, List[ApprovalRule]] = {}
+        new_approved = []
         for i, response in enumerate(responses):
             tool_call = interrupt_tool_calls[i]
-            
+
             if response["type"] == "accept":
-                approved_tool_calls.append(tool_call)
+                decided[tool_call["id"]] = tool_call
+                new_approved.append(_call_digest(tool_call))
             elif response["type"] == "edit":
                 edited: ActionRequest = response["args"]
                 new_tool_call = {
@@ -83,14 +274,32 @@ def create_interrupt_hook(
                     "args": edited["args"],
                     "id": tool_call["id"],
                 }
-                approved_tool_calls.append(new_tool_call)
+                decided[tool_call["id"]] = new_tool_call
+            elif response["type"] in ("response", "ignore"):
+                # the call stays on the AI message, answered by a tool message,
+                # so the tool node does not run it
+                decided[tool_call["id"]] = tool_call
+                if response["type"] == "response":
+                    content = response["args"] if isinstance(response["args"], str) else str(response["args"])
+                else:
+                    content = "The user ignored this tool call; it was not executed."
+                tool_messages.append(ToolMessage(content, name=tool_call["name"], tool_call_id=tool_call["id"]))
             else:
                 raise ValueError(f"Unknown response type: {response['type']}")
 
-        last_message.tool_calls = approved_tool_calls
+            remember = response.get("remember")
+            if remember and response["type"] in ("accept", "edit"):
+                rule: ApprovalRule = {} if remember is True else remember
+                new_rules.setdefault(tool_call["name"], []).append(rule)
 
-        return {"messages": [last_message]}
-
-    return interrupt_hook
+        last_message.tool_calls = [
+            decided.get(tool_call["id"], tool_call) for tool_call in last_message.tool_calls
+        ]
 
+        _write_approvals_event(stats)
+        return {
+            "messages": [last_message, *tool_messages],
+            "approvals": {"rules": new_rules, "approved": new_approved, "stats": stats},
+        }
 
+    return interrupt_hook
@@ -6,7 +6,9 @@
 
 import os 
 from langchain_openai import ChatOpenAI
+from deepagents.rate_limit import create_governed_model
 
 def get_default_model():
-    return ChatOpenAI(model="qwen-omni-turbo", max_tokens=64000, temperature=0.1, \
-        api_key=os.environ["QWEN_API_KEY"], base_url=os.environ["QWEN_BASE_URL"])
\ No newline at end of file
+    model = ChatOpenAI(model="qwen-omni-turbo", max_tokens=64000, temperature=0.1, stream_usage=True, \
+        api_key=os.environ["QWEN_API_KEY"], base_url=os.environ["QWEN_BASE_URL"])
+    return create_governed_model(model, endpoint=os.environ["QWEN_BASE_URL"])
\ No newline at end of file
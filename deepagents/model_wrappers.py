@@ -0,0 +1,150 @@
+"""Base class for chat models that wrap another chat model.
+
+Wrappers (response cache, routing, rate limiting, ...) sit between the agent and
+the provider model built by `create_node_llm`. They must stay usable by
+`create_react_agent`, which calls `bind_tools` and streams through `_stream` /
+`_astream`, so every wrapper forwards those to the wrapped model.
+`with_structured_output` is built by the wrapped model too (json_schema or
+function calling, whatever the provider supports) and then rerouted through
+the wrapper.
+"""
+
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import Runnable, RunnableBinding, RunnableParallel, RunnableSequence
+
+
+class DelegatingChatModel(BaseChatModel):
+    """Chat model that forwards every call to `inner`.
+
+    Subclasses override the `_generate` / `_agenerate` / `_stream` / `_astream`
+    hooks they care about and call the matching `_inner_*` helper to reach the
+    wrapped model.
+    """
+
+    inner: BaseChatModel
+
+    @property
+    def _llm_type(self) -> str:
+        return f"{self._wrapper_name}-{self.inner._llm_type}"
+
+    @property
+    def _wrapper_name(self) -> str:
+        return "delegating"
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return {"wrapper": self._wrapper_name, **self.inner._identifying_params}
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any):
+        """Bind tools using the wrapped provider's tool formatting."""
+        bound = self.inner.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def with_structured_output(self, schema: Any, *, include_raw: bool = False, **kwargs: Any):
+        """Structured output as the wrapped provider implements it, called through this wrapper."""
+        structured = self.inner.with_structured_output(schema, include_raw=include_raw, **kwargs)
+        rerouted, found = self._reroute(structured)
+        if not found:
+            # unknown chain layout: fall back to tool calling via our bind_tools
+            return super().with_structured_output(schema, include_raw=include_raw)
+        return rerouted
+
+    def _reroute(self, runnable: Runnable) -> tuple:
+        """`runnable` with every use of `inner` replaced by this wrapper, and whether one was found."""
+        if runnable is self.inner:
+            return self, True
+        if isinstance(runnable, RunnableBinding) and runnable.bound is self.inner:
+            return self.bind(**runnable.kwargs).with_config(runnable.config), True
+        if isinstance(runnable, RunnableSequence):
+            steps = [self._reroute(step) for step in runnable.steps]
+            if any(found for _, found in steps):
+                return RunnableSequence(*(step for step, _ in steps), name=runnable.name), True
+        if isinstance(runnable, RunnableParallel):
+            steps = {key: self._reroute(step) for key, step in runnable.steps__.items()}
+            if any(found for _, found in steps.values()):
+                return RunnableParallel({key: step for key, (step, _) in steps.items()}), True
+        return runnable, False
+
+    # ------------------------------------------------------------------
+    # Forwarding helpers
+    # ------------------------------------------------------------------
+
+    def _inner_generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return self.inner._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _inner_agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        return await self.inner._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _inner_stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        return self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _inner_astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        return self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    # ------------------------------------------------------------------
+    # Default behaviour: plain pass-through
+    # ------------------------------------------------------------------
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return self._inner_generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return await self._inner_agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        yield from self._inner_stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        async for chunk in self._inner_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+            yield chunk
+
+
+def merge_generation_chunks(chunks: List[ChatGenerationChunk]) -> Optional[ChatGenerationChunk]:
+    """Concatenate streamed chunks into a single generation chunk."""
+    if not chunks:
+        return None
+    merged = chunks[0]
+    for chunk in chunks[1:]:
+        merged = merged + chunk
+    return merged
+
+
+def innermost_model(model: Any) -> Any:
+    """Follow `inner` links down to the provider model."""
+    while isinstance(model, DelegatingChatModel):
+        model = model.inner
+    return model
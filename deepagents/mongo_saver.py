@@ -0,0 +1,275 @@
+"""MongoDB checkpointer mode for large deep-agent threads.
+
+`MongoDBSaver` already keeps the compound `(thread_id, checkpoint_ns,
+checkpoint_id)` indexes and writes pending writes with `bulk_write`, but it
+stores every checkpoint as one blob (the whole `files` dict with all
+versions, every message) and only reads whole documents, even to list the
+threads of the v2 history or show their last message.
+
+`OptimizedMongoDBSaver` adds:
+
+- `GridFSOffloadSerializer`: channel values (and pending writes) whose
+  encoding is `threshold` bytes or more are stored in GridFS under their
+  sha256, so a value that does not change between super-steps (usually
+  `files`) is stored once; checkpoint documents stay small. The digests
+  referenced by a document are kept in its `type` field, which is all
+  `gc_blobs` needs to read to find unreferenced blobs.
+- projection reads that skip the blobs: `list_threads`,
+  `get_checkpoint_metadata`, `get_channel_values` (only the GridFS values of
+  the requested channels are fetched) and `last_message`
+- a `(checkpoint_ns, thread_id, checkpoint_id)` index for thread listing
+
+    checkpointer = OptimizedMongoDBSaver(MongoClient(uri), serde=CompactDeepAgentSerializer())
+
+Blobs are written before the document referencing them and never updated,
+so a crash leaves at worst an unreferenced blob for `gc_blobs`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import get_checkpoint_id
+from langgraph.checkpoint.mongodb import MongoDBSaver
+from langgraph.checkpoint.mongodb.utils import loads_metadata
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+from deepagents.retention import checkpoint_time
+
+BLOB_PREFIX = "|gridfs:"  # type suffix listing referenced digests
+WHOLE_PREFIX = "|gridfs-blob:"  # type suffix of a value stored entirely in GridFS
+_REF_KEY = "__gridfs__"
+
+
+def _split_type(type_: str) -> Tuple[str, str, List[str]]:
+    """`(inner type, mode, digests)`; mode is "", "refs" or "blob"."""
+    for prefix, mode in ((WHOLE_PREFIX, "blob"), (BLOB_PREFIX, "refs")):
+        if prefix in type_:
+            inner, digests = type_.split(prefix, 1)
+            return inner, mode, digests.split(",")
+    return type_, "", []
+
+
+class GridFSOffloadSerializer:
+    """Serde wrapper moving large values into a content-addressed GridFS bucket."""
+
+    def __init__(
+        self,
+        inner: Any,
+        database: Any,
+        threshold: int = 256 * 1024,
+        bucket_name: str = "checkpoint_blobs",
+        touch_interval: float = 1800.0,
+    ):
+        import gridfs
+
+        self.inner = inner
+        self.threshold = threshold
+        self.fs = gridfs.GridFS(database, collection=bucket_name)
+        self.files = database[f"{bucket_name}.files"]
+        self.touch_interval = touch_interval
+        self._known: Dict[str, float] = {}
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.inner.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.inner.loads(data)
+
+    def _store(self, type_: str, data: bytes) -> str:
+        digest = hashlib.sha256(type_.encode() + b"\0" + data).hexdigest()
+        now = time.time()
+        if now - self._known.get(digest, 0.0) < self.touch_interval:
+            return digest
+        # reused blobs get a fresh uploadDate, so `gc_blobs` (which only
+        # deletes blobs older than `min_age_seconds`) cannot race a new reference
+        touched = self.files.update_many(
+            {"filename": digest}, {"$set": {"uploadDate": datetime.now(timezone.utc)}}
+        )
+        if touched.matched_count == 0:
+            self.fs.put(data, filename=digest, metadata={"type": type_})
+        if len(self._known) > 10000:
+            self._known.clear()
+        self._known[digest] = now
+        return digest
+
+    def _fetch(self, ref: Dict[str, str]) -> Any:
+        data = self.fs.get_last_version(ref[_REF_KEY]).read()
+        return self.inner.loads_typed((ref["type"], data))
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        channel_values = obj.get("channel_values") if isinstance(obj, dict) else None
+        if isinstance(channel_values, dict):
+            digests = []
+            offloaded = {}
+            for channel, value in channel_values.items():
+                type_, data = self.inner.dumps_typed(value)
+                if len(data) >= self.threshold:
+                    digest = self._store(type_, data)
+                    digests.append(digest)
+                    offloaded[channel] = {_REF_KEY: digest, "type": type_}
+            if offloaded:
+                obj = {**obj, "channel_values": {**channel_values, **offloaded}}
+                type_, data = self.inner.dumps_typed(obj)
+                return type_ + BLOB_PREFIX + ",".join(digests), data
+            return self.inner.dumps_typed(obj)
+        type_, data = self.inner.dumps_typed(obj)
+        if len(data) >= self.threshold:
+            return type_ + WHOLE_PREFIX + self._store(type_, data), b""
+        return type_, data
+
+    def _load(self, data: Tuple[str, bytes], channels: Optional[Sequence[str]] = None) -> Any:
+        inner_type, mode, digests = _split_type(data[0])
+        if mode == "blob":
+            return self._fetch({_REF_KEY: digests[0], "type": inner_type})
+        value = self.inner.loads_typed((inner_type, data[1]))
+        if mode == "refs":
+            channel_values = value["channel_values"]
+            for channel, item in list(channel_values.items()):
+                if isinstance(item, dict) and _REF_KEY in item and (channels is None or channel in channels):
+                    channel_values[channel] = self._fetch(item)
+        return value
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        return self._load(data)
+
+    def loads_channels(self, data: Tuple[str, bytes], channels: Sequence[str]) -> Dict[str, Any]:
+        """Only `channels` of a serialized checkpoint; other GridFS values are not fetched."""
+        checkpoint = self._load(data, channels)
+        channel_values = checkpoint.get("channel_values", {})
+        return {channel: channel_values[channel] for channel in channels if channel in channel_values}
+
+    def gc_blobs(self, referenced: set, min_age_seconds: float = 3600.0) -> Dict[str, int]:
+        """Delete blobs not in `referenced` that are older than `min_age_seconds`.
+
+        `min_age_seconds` must exceed `touch_interval` of every writer.
+        """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=min_age_seconds)
+        deleted = 0
+        reclaimed = 0
+        for file in self.files.find({"uploadDate": {"$lt": cutoff}}, {"filename": 1, "length": 1}):
+            if file["filename"] not in referenced:
+                self.fs.delete(file["_id"])
+                self._known.pop(file["filename"], None)
+                deleted += 1
+                reclaimed += file.get("length", 0)
+        return {"blobs_deleted": deleted, "reclaimed_bytes": reclaimed}
+
+
+class OptimizedMongoDBSaver(MongoDBSaver):
+    """`MongoDBSaver` with GridFS offload of large values and projection reads."""
+
+    def __init__(
+        self,
+        client: Any,
+        db_name: str = "checkpointing_db",
+        serde: Optional[Any] = None,
+        gridfs_threshold: Optional[int] = 256 * 1024,
+        **kwargs: Any,
+    ):
+        super().__init__(client, db_name=db_name, **kwargs)
+        inner = serde or JsonPlusSerializer()
+        self.serde = GridFSOffloadSerializer(inner, self.db, gridfs_threshold) if gridfs_threshold else inner
+        self._ensure_index(self.checkpoint_collection, [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1)], unique=True)
+        self._ensure_index(
+            self.writes_collection,
+            [("thread_id", 1), ("checkpoint_ns", 1), ("checkpoint_id", -1), ("task_id", 1), ("idx", 1)],
+            unique=True,
+        )
+        # thread listing: newest checkpoint of every root thread
+        self._ensure_index(self.checkpoint_collection, [("checkpoint_ns", 1), ("thread_id", 1), ("checkpoint_id", -1)])
+
+    @staticmethod
+    def _ensure_index(collection: Any, keys: List[Tuple[str, int]], **options: Any) -> None:
+        existing = [list(index["key"].items()) for index in collection.list_indexes()]
+        if keys not in existing:
+            collection.create_index(keys, **options)
+
+    def _find_latest(self, config: RunnableConfig, projection: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        query = {
+            "thread_id": str(config["configurable"]["thread_id"]),
+            "checkpoint_ns": config["configurable"].get("checkpoint_ns", ""),
+        }
+        if checkpoint_id := get_checkpoint_id(config):
+            query["checkpoint_id"] = checkpoint_id
+        return self.checkpoint_collection.find_one(
+            query, {"_id": 0, "checkpoint_id": 1, **projection}, sort=[("checkpoint_id", -1)]
+        )
+
+    def list_threads(self, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Root threads, most recently active first, without reading any checkpoint blob.
+
+        `before` is the `checkpoint_id` of the last thread of the previous page.
+        """
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": {"checkpoint_ns": ""}},
+            {"$sort": {"thread_id": 1, "checkpoint_id": -1}},
+            {"$project": {"thread_id": 1, "checkpoint_id": 1, "metadata": 1}},
+            {"$group": {
+                "_id": "$thread_id",
+                "checkpoint_id": {"$first": "$checkpoint_id"},
+                "metadata": {"$first": "$metadata"},
+                "checkpoints": {"$sum": 1},
+            }},
+        ]
+        if before is not None:
+            pipeline.append({"$match": {"checkpoint_id": {"$lt": before}}})
+        pipeline += [{"$sort": {"checkpoint_id": -1}}, {"$limit": limit}]
+        return [
+            {
+                "thread_id": doc["_id"],
+                "checkpoint_id": doc["checkpoint_id"],
+                "updated_at": checkpoint_time(doc["checkpoint_id"]),
+                "checkpoints": doc["checkpoints"],
+                "metadata": loads_metadata(self.serde, doc.get("metadata") or {}),
+            }
+            for doc in self.checkpoint_collection.aggregate(pipeline)
+        ]
+
+    def get_checkpoint_metadata(self, config: RunnableConfig) -> Optional[Dict[str, Any]]:
+        """Metadata and parent of the latest (or given) checkpoint; the blob is not read."""
+        doc = self._find_latest(config, {"parent_checkpoint_id": 1, "metadata": 1})
+        if doc is None:
+            return None
+        return {
+            "checkpoint_id": doc["checkpoint_id"],
+            "parent_checkpoint_id": doc.get("parent_checkpoint_id"),
+            "metadata": loads_metadata(self.serde, doc.get("metadata") or {}),
+        }
+
+    def get_channel_values(self, config: RunnableConfig, channels: Sequence[str]) -> Optional[Dict[str, Any]]:
+        """Values of `channels` only; metadata and pending writes are not read."""
+        doc = self._find_latest(config, {"type": 1, "checkpoint": 1})
+        if doc is None:
+            return None
+        data = (doc["type"], doc["checkpoint"])
+        if isinstance(self.serde, GridFSOffloadSerializer):
+            return self.serde.loads_channels(data, channels)
+        channel_values = self.serde.loads_typed(data).get("channel_values", {})
+        return {channel: channel_values[channel] for channel in channels if channel in channel_values}
+
+    def last_message(self, thread_id: str) -> Optional[Any]:
+        values = self.get_channel_values({"configurable": {"thread_id": thread_id}}, ["messages"])
+        messages = (values or {}).get("messages") or []
+        return messages[-1] if messages else None
+
+    async def alist_threads(self, limit: int = 50, before: Optional[str] = None) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self.list_threads, limit, before)
+
+    async def aget_channel_values(self, config: RunnableConfig, channels: Sequence[str]) -> Optional[Dict[str, Any]]:
+        return await asyncio.to_thread(self.get_channel_values, config, channels)
+
+    def gc_blobs(self, min_age_seconds: float = 3600.0) -> Dict[str, int]:
+        """Delete GridFS blobs no checkpoint or pending write references any more."""
+        if not isinstance(self.serde, GridFSOffloadSerializer):
+            return {"blobs_deleted": 0, "reclaimed_bytes": 0}
+        referenced = set()
+        for collection in (self.checkpoint_collection, self.writes_collection):
+            for doc in collection.find({"type": {"$regex": "\\|gridfs"}}, {"_id": 0, "type": 1}):
+                referenced.update(_split_type(doc["type"])[2])
+        return self.serde.gc_blobs(referenced, min_age_seconds)
@@ -324,3 +324,26 @@ Usage:
 - By default, it reads up to 2000 lines starting from the beginning of the file
 - You can optionally specify a line offset and limit (especially handy for long files), but it's recommended to read the whole file by not providing these parameters.
 - If you read a file that exists but has empty contents you will receive a system reminder warning in place of file contents."""
+
+
+# Concise tool descriptions, used by the tool exposure policy once the agent
+# has already planned (see deepagents/tool_exposure.py)
+
+WRITE_TODOS_CONCISE_DESCRIPTION = """Create or update the structured todo list for the current session.
+Pass the full list every time. Keep exactly one todo `in_progress`, and mark todos `completed` as soon as they are done."""
+
+TASK_CONCISE_DESCRIPTION_PREFIX = """Launch a sub agent to handle a multi-step task autonomously.
+
+Args:
+- description: a detailed, self-contained task description, including what the agent should return
+- subagent_type: one of the following:
+- general-purpose: research, search and multi-step tasks (Tools: *)
+{other_agents}
+
+The agent returns a single final report that the user cannot see; summarize it for the user."""
+
+EDIT_WITH_COMMIT_MESSAGE_CONCISE_DESCRIPTION = """Replace the content of an existing file with `new_content`, recording a `commit_message` that explains the edit. Read the file first."""
+
+TOOL_CONCISE_DESCRIPTION = """Read a file from the workspace (cat -n format, up to `limit` lines from `offset`)."""
+
+TOOL_CONCISE_DESCRIPTION_AND_HISTORY = """Read a file from the workspace together with its edit history (cat -n format, up to `limit` lines from `offset`)."""
@@ -0,0 +1,379 @@
+"""Process-wide rate limiter and concurrency governor for model calls.
+
+Every model built by `create_node_llm` / `get_default_model` is wrapped in a
+`GovernedChatModel` that asks the shared `ModelCallGovernor` for permission
+before calling the provider. Limits come from `configure_rate_limits` or from
+the environment:
+
+    DEEPAGENTS_REQUESTS_PER_MINUTE   token bucket on requests
+    DEEPAGENTS_TOKENS_PER_MINUTE     token bucket on (estimated) tokens
+    DEEPAGENTS_MAX_IN_FLIGHT         concurrent calls per endpoint
+
+Unset limits are not enforced. Calls wait asynchronously in a priority queue
+per endpoint; interactive calls go before background ones. A waiting call is
+woken as soon as the call ahead of it is admitted or a call releases its
+slot; only a call blocked on a token bucket sleeps, for the bucket's exact
+refill time. Pass the priority
+through the run config, e.g. `config={"metadata": {"priority": "background"}}`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from deepagents.model_wrappers import DelegatingChatModel
+
+
+PRIORITIES = {"interactive": 0, "background": 10}
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens/second."""
+
+    def __init__(self, per_minute: float, burst: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float) -> None:
+        # May go negative when actual usage exceeds the estimate; the debt
+        # delays the next callers instead of being forgotten.
+        self.tokens -= amount
+
+
+class _Ticket:
+    __slots__ = ("endpoint", "estimated_tokens", "priority", "enqueued_at")
+
+    def __init__(self, endpoint: str, estimated_tokens: int, priority: int):
+        self.endpoint = endpoint
+        self.estimated_tokens = estimated_tokens
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+
+
+class ModelCallGovernor:
+    """Admission control shared by every governed model in the process."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[float] = None,
+        tokens_per_minute: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+    ):
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._queues: Dict[str, List] = {}
+        # per endpoint: callbacks waking the calls waiting for the queue to move
+        self._wakers: Dict[str, List[Callable[[], None]]] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._sequence = itertools.count()
+        self._waits: Dict[str, deque] = {name: deque(maxlen=1000) for name in PRIORITIES}
+        self._counters = {"admitted": 0, "queued": 0, "max_wait": 0.0, "total_wait": 0.0}
+
+    @property
+    def unlimited(self) -> bool:
+        return self.request_bucket is None and self.token_bucket is None and self.max_in_flight is None
+
+    # ------------------------------------------------------------------
+    # Admission
+    # ------------------------------------------------------------------
+
+    def _enqueue(self, ticket: _Ticket) -> tuple:
+        entry = (ticket.priority, next(self._sequence), ticket)
+        with self._lock:
+            heapq.heappush(self._queues.setdefault(ticket.endpoint, []), entry)
+        return entry
+
+    def _notify(self, endpoint: str) -> None:
+        """Wake every call waiting on `endpoint`; called with the lock held."""
+        for wake in self._wakers.pop(endpoint, []):
+            wake()
+
+    def _try_admit(self, entry: tuple, wake: Callable[[], None]) -> Optional[float]:
+        """Admit `entry` if possible.
+
+        Returns 0 when admitted, the seconds until the limiting token bucket
+        has refilled, or None when the call must wait for another call to be
+        admitted or released. Unless admitted, `wake` is called on the next
+        change of the endpoint's queue.
+        """
+        ticket: _Ticket = entry[2]
+        now = time.monotonic()
+        with self._lock:
+            queue = self._queues[ticket.endpoint]
+            if queue[0] is not entry or (
+                self.max_in_flight is not None and self._in_flight.get(ticket.endpoint, 0) >= self.max_in_flight
+            ):
+                self._wakers.setdefault(ticket.endpoint, []).append(wake)
+                return None
+            wait = 0.0
+            if self.request_bucket is not None:
+                wait = max(wait, self.request_bucket.wait_time(1, now))
+            if self.token_bucket is not None:
+                wait = max(wait, self.token_bucket.wait_time(ticket.estimated_tokens, now))
+            if wait > 0:
+                # a settlement crediting tokens back wakes it early
+                self._wakers.setdefault(ticket.endpoint, []).append(wake)
+                return wait
+
+            heapq.heappop(queue)
+            if self.request_bucket is not None:
+                self.request_bucket.consume(1)
+            if self.token_bucket is not None:
+                self.token_bucket.consume(ticket.estimated_tokens)
+            self._in_flight[ticket.endpoint] = self._in_flight.get(ticket.endpoint, 0) + 1
+            self._record_wait(ticket, now - ticket.enqueued_at)
+            # the next call in line may fit as well
+            self._notify(ticket.endpoint)
+            return 0.0
+
+    def _abandon(self, entry: tuple) -> None:
+        ticket: _Ticket = entry[2]
+        with self._lock:
+            queue = self._queues.get(ticket.endpoint, [])
+            if entry in queue:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._notify(ticket.endpoint)
+
+    def _record_wait(self, ticket: _Ticket, waited: float) -> None:
+        name = "background" if ticket.priority >= PRIORITIES["background"] else "interactive"
+        self._waits[name].append(waited)
+        self._counters["admitted"] += 1
+        self._counters["total_wait"] += waited
+        self._counters["max_wait"] = max(self._counters["max_wait"], waited)
+        if waited > 0:
+            self._counters["queued"] += 1
+
+    def acquire(self, endpoint: str, estimated_tokens: int, priority: int) -> _Ticket:
+        ticket = _Ticket(endpoint, estimated_tokens, priority)
+        if self.unlimited:
+            return ticket
+        entry = self._enqueue(ticket)
+        woken = threading.Event()
+        try:
+            while True:
+                woken.clear()
+                wait = self._try_admit(entry, woken.set)
+                if wait == 0:
+                    return ticket
+                woken.wait(wait)
+        except BaseException:
+            self._abandon(entry)
+            raise
+
+    async def aacquire(self, endpoint: str, estimated_tokens: int, priority: int) -> _Ticket:
+        ticket = _Ticket(endpoint, estimated_tokens, priority)
+        if self.unlimited:
+            return ticket
+        entry = self._enqueue(ticket)
+        loop = asyncio.get_running_loop()
+        woken = asyncio.Event()
+
+        def wake() -> None:
+            # releases may come from another thread or event loop
+            try:
+                loop.call_soon_threadsafe(woken.set)
+            except RuntimeError:
+                pass  # loop closed: the waiter is gone
+
+        try:
+            while True:
+                woken.clear()
+                wait = self._try_admit(entry, wake)
+                if wait == 0:
+                    return ticket
+                try:
+                    await asyncio.wait_for(woken.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(entry)
+            raise
+
+    def release(self, ticket: _Ticket, actual_tokens: Optional[int] = None) -> None:
+        if self.unlimited:
+            return
+        with self._lock:
+            self._in_flight[ticket.endpoint] = max(0, self._in_flight.get(ticket.endpoint, 0) - 1)
+            if self.token_bucket is not None and actual_tokens is not None:
+                # settle the difference between the estimate and the real usage
+                self.token_bucket.consume(actual_tokens - ticket.estimated_tokens)
+            # tokens credited back may admit a call on any endpoint (the buckets are shared)
+            credited = self.token_bucket is not None and actual_tokens is not None and actual_tokens < ticket.estimated_tokens
+            for endpoint in list(self._wakers) if credited else [ticket.endpoint]:
+                self._notify(endpoint)
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def metrics(self) -> Dict[str, Any]:
+        def quantile(values, q):
+            if not values:
+                return 0.0
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        with self._lock:
+            waits = {name: list(values) for name, values in self._waits.items()}
+            in_flight = dict(self._in_flight)
+            queued = {endpoint: len(queue) for endpoint, queue in self._queues.items()}
+            counters = dict(self._counters)
+        return {
+            **counters,
+            "in_flight": in_flight,
+            "queue_depth": queued,
+            "queue_wait": {
+                name: {"p50": quantile(values, 0.5), "p95": quantile(values, 0.95), "count": len(values)}
+                for name, values in waits.items()
+            },
+        }
+
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.environ.get(name)
+    return float(value) if value else None
+
+
+_GOVERNOR: Optional[ModelCallGovernor] = None
+_GOVERNOR_LOCK = threading.Lock()
+
+
+def configure_rate_limits(
+    requests_per_minute: Optional[float] = None,
+    tokens_per_minute: Optional[float] = None,
+    max_in_flight: Optional[int] = None,
+) -> ModelCallGovernor:
+    """Replace the process-wide governor. Existing models pick it up on their next call."""
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        _GOVERNOR = ModelCallGovernor(requests_per_minute, tokens_per_minute, max_in_flight)
+        return _GOVERNOR
+
+
+def get_governor() -> ModelCallGovernor:
+    global _GOVERNOR
+    with _GOVERNOR_LOCK:
+        if _GOVERNOR is None:
+            max_in_flight = _env_number("DEEPAGENTS_MAX_IN_FLIGHT")
+            _GOVERNOR = ModelCallGovernor(
+                requests_per_minute=_env_number("DEEPAGENTS_REQUESTS_PER_MINUTE"),
+                tokens_per_minute=_env_number("DEEPAGENTS_TOKENS_PER_MINUTE"),
+                max_in_flight=int(max_in_flight) if max_in_flight else None,
+            )
+        return _GOVERNOR
+
+
+def get_rate_limit_metrics() -> Dict[str, Any]:
+    """Queue-wait percentiles, in-flight gauges and admission counters."""
+    return get_governor().metrics()
+
+
+# ==============================================================================
+# Chat model wrapper
+# ==============================================================================
+
+def _estimate_tokens(messages) -> int:
+    # ~4 characters per token; reconciled with usage_metadata after the call
+    return max(1, sum(len(str(getattr(m, "content", ""))) for m in messages) // 4)
+
+
+def _priority(run_manager) -> int:
+    metadata = getattr(run_manager, "metadata", None) or {}
+    priority = metadata.get("priority", "interactive")
+    if isinstance(priority, int):
+        return priority
+    return PRIORITIES.get(priority, PRIORITIES["interactive"])
+
+
+def _result_tokens(result) -> Optional[int]:
+    for generation in getattr(result, "generations", []):
+        usage = getattr(generation.message, "usage_metadata", None)
+        if usage:
+            return usage.get("total_tokens")
+    return None
+
+
+class GovernedChatModel(DelegatingChatModel):
+    """Wait for the shared governor before every provider call."""
+
+    endpoint: str = "default"
+
+    @property
+    def _wrapper_name(self) -> str:
+        return "governed"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = get_governor()
+        ticket = governor.acquire(self.endpoint, _estimate_tokens(messages), _priority(run_manager))
+        actual_tokens = None
+        try:
+            result = self._inner_generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            actual_tokens = _result_tokens(result)
+            return result
+        finally:
+            governor.release(ticket, actual_tokens)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = get_governor()
+        ticket = await governor.aacquire(self.endpoint, _estimate_tokens(messages), _priority(run_manager))
+        actual_tokens = None
+        try:
+            result = await self._inner_agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            actual_tokens = _result_tokens(result)
+            return result
+        finally:
+            governor.release(ticket, actual_tokens)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = get_governor()
+        ticket = governor.acquire(self.endpoint, _estimate_tokens(messages), _priority(run_manager))
+        actual_tokens = None
+        try:
+            for chunk in self._inner_stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None)
+                if usage:
+                    actual_tokens = (actual_tokens or 0) + usage.get("total_tokens", 0)
+                yield chunk
+        finally:
+            governor.release(ticket, actual_tokens)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        governor = get_governor()
+        ticket = await governor.aacquire(self.endpoint, _estimate_tokens(messages), _priority(run_manager))
+        actual_tokens = None
+        try:
+            async for chunk in self._inner_astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                usage = getattr(chunk.message, "usage_metadata", None)
+                if usage:
+                    actual_tokens = (actual_tokens or 0) + usage.get("total_tokens", 0)
+                yield chunk
+        finally:
+            governor.release(ticket, actual_tokens)
+
+
+def create_governed_model(model, endpoint: Optional[str] = None) -> GovernedChatModel:
+    """Wrap `model` so its calls go through the process-wide governor."""
+    return GovernedChatModel(inner=model, endpoint=endpoint or "default")
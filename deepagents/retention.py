@@ -0,0 +1,583 @@
+"""Retention and compaction of stored checkpoints.
+
+Every superstep of every thread is kept by the savers, including the
+`sub_agent_*` threads that are never resumed once their `task` returned, so
+`memory.db` and the Mongo collections only ever grow. A pruner applies a
+`RetentionPolicy` chosen per thread by fnmatch pattern (first match wins):
+
+- `keep_last`: newest checkpoints kept per namespace (at least 1, the
+  current state of the thread is never dropped)
+- `keep_interrupts`: also keep checkpoints that raised an interrupt
+- `keep_terminal`: also keep the last checkpoint of every run (the parent of
+  each `input` checkpoint)
+- `ttl_seconds`: drop the whole thread once its newest checkpoint is older
+- `compact_writes`: drop the pending writes of kept checkpoints that already
+  have a successor; interrupt, resume and error writes are kept
+
+Pending writes of dropped checkpoints are always deleted, and so are the
+tool journal entries (`deepagents.tool_journal`) recorded before the oldest
+checkpoint a thread keeps: the steps that made them were committed long ago.
+An expired thread loses its whole journal. Deletes run one
+thread at a time in short transactions, so pruning can run online next to
+the agent, e.g. in a `RetentionWorker`:
+
+    worker = RetentionWorker(SQLiteCheckpointPruner("memory.db"), interval=3600)
+    worker.start()
+
+`python -m deepagents.retention memory.db --dry-run` reports what would be
+reclaimed.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from typing_extensions import TypedDict
+
+
+class RetentionPolicy(TypedDict, total=False):
+    keep_last: int
+    keep_interrupts: bool
+    keep_terminal: bool
+    ttl_seconds: float
+    compact_writes: bool
+
+
+DEFAULT_POLICIES: Dict[str, RetentionPolicy] = {
+    # subagent threads are only read back right after their run
+    "sub_agent_*": {"keep_last": 1, "ttl_seconds": 7 * 86400, "compact_writes": True},
+    "*": {"keep_last": 20, "keep_interrupts": True, "keep_terminal": True, "compact_writes": True},
+}
+
+# writes still needed after their superstep was applied
+PRESERVED_WRITE_CHANNELS = ("__interrupt__", "__resume__", "__error__")
+
+# 100ns intervals between the Gregorian epoch (uuid v1/v6) and the unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+CheckpointKey = Tuple[str, str]  # (checkpoint_ns, checkpoint_id)
+WriteKey = Tuple[str, str, str, int]  # (checkpoint_ns, checkpoint_id, task_id, idx)
+
+
+def policy_for(thread_id: str, policies: Dict[str, RetentionPolicy]) -> Optional[RetentionPolicy]:
+    for pattern, policy in policies.items():
+        if fnmatch.fnmatch(thread_id, pattern):
+            return policy
+    return None
+
+
+def checkpoint_time(checkpoint_id: str) -> Optional[float]:
+    """Unix time encoded in a LangGraph checkpoint id (uuid6), or None."""
+    try:
+        value = uuid.UUID(checkpoint_id)
+    except (TypeError, ValueError):
+        return None
+    if value.version != 6:
+        return None
+    high = value.int >> 64
+    timestamp = ((high >> 16) << 12) | (high & 0x0FFF)
+    return (timestamp - _UUID_EPOCH_OFFSET) / 1e7
+
+
+def _metadata_source(metadata: Any, serde: Optional[Any] = None) -> Optional[str]:
+    # sqlite stores the metadata as one JSON document, Mongo as a dict of
+    # values serialized one by one with the saver's `dumps_typed`
+    if isinstance(metadata, (bytes, str)):
+        try:
+            metadata = json.loads(metadata)
+        except ValueError:
+            return None
+    if not isinstance(metadata, dict):
+        return None
+    source = metadata.get("source")
+    if isinstance(source, (list, tuple)) and len(source) == 2 and serde is not None:
+        try:
+            source = serde.loads_typed((source[0], bytes(source[1])))
+        except Exception:
+            return None
+    elif isinstance(source, bytes):
+        try:
+            source = json.loads(source)
+        except ValueError:
+            return None
+    return source if isinstance(source, str) else None
+
+
+class CheckpointPruner:
+    """Base class; backends list and delete rows, the policy logic lives here."""
+
+    def threads(self) -> List[str]:
+        raise NotImplementedError
+
+    def _checkpoints(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Rows with `ns`, `id`, `parent`, `source` and `bytes`."""
+        raise NotImplementedError
+
+    def _writes(self, thread_id: str) -> List[Dict[str, Any]]:
+        """Rows with `ns`, `id`, `task_id`, `idx`, `channel` and `bytes`."""
+        raise NotImplementedError
+
+    def _delete(self, thread_id: str, checkpoints: List[CheckpointKey], writes: List[WriteKey]) -> None:
+        raise NotImplementedError
+
+    def _delete_thread(self, thread_id: str) -> None:
+        raise NotImplementedError
+
+    def _prune_journal(self, thread_id: str, before: float) -> int:
+        """Delete tool journal entries of `thread_id` older than `before`; none by default."""
+        return 0
+
+    def storage_bytes(self) -> int:
+        raise NotImplementedError
+
+    def reclaim(self) -> None:
+        """Return freed space to the filesystem (VACUUM / compact)."""
+        raise NotImplementedError
+
+    def plan(self, thread_id: str, policy: RetentionPolicy, now: Optional[float] = None) -> Dict[str, Any]:
+        """What `policy` removes from `thread_id`, without touching anything."""
+        checkpoints = self._checkpoints(thread_id)
+        writes = self._writes(thread_id)
+        plan = {
+            "thread_id": thread_id,
+            "expired": False,
+            "checkpoints": [],
+            "writes": [],
+            "bytes": 0,
+            "kept": len(checkpoints),
+            "journal_before": None,
+        }
+        if not checkpoints:
+            return plan
+
+        ttl = policy.get("ttl_seconds")
+        times = [t for t in (checkpoint_time(row["id"]) for row in checkpoints) if t is not None]
+        if ttl and times and (now or time.time()) - max(times) > ttl:
+            plan.update(
+                expired=True,
+                checkpoints=[(row["ns"], row["id"]) for row in checkpoints],
+                writes=[(row["ns"], row["id"], row["task_id"], row["idx"]) for row in writes],
+                bytes=sum(row["bytes"] for row in checkpoints) + sum(row["bytes"] for row in writes),
+                kept=0,
+            )
+            return plan
+
+        interrupted = {(row["ns"], row["id"]) for row in writes if row["channel"] == "__interrupt__"}
+        keep = set()
+        newest = set()
+        by_ns: Dict[str, List[Dict[str, Any]]] = {}
+        for row in checkpoints:
+            by_ns.setdefault(row["ns"], []).append(row)
+        for ns, rows in by_ns.items():
+            # checkpoint ids are time ordered
+            rows.sort(key=lambda row: row["id"], reverse=True)
+            newest.add((ns, rows[0]["id"]))
+            keep.update((ns, row["id"]) for row in rows[: max(1, policy.get("keep_last", 1))])
+            if policy.get("keep_terminal"):
+                keep.update((ns, row["parent"]) for row in rows if row["source"] == "input" and row["parent"])
+        if policy.get("keep_interrupts"):
+            keep.update(interrupted)
+
+        dropped = [(row["ns"], row["id"]) for row in checkpoints if (row["ns"], row["id"]) not in keep]
+        dropped_set = set(dropped)
+        plan["checkpoints"] = dropped
+        plan["kept"] = len(checkpoints) - len(dropped)
+        if dropped:
+            kept_times = [
+                t for t in (checkpoint_time(row["id"]) for row in checkpoints if (row["ns"], row["id"]) in keep)
+                if t is not None
+            ]
+            plan["journal_before"] = min(kept_times) if kept_times else None
+        plan["bytes"] = sum(row["bytes"] for row in checkpoints if (row["ns"], row["id"]) in dropped_set)
+        for row in writes:
+            key = (row["ns"], row["id"])
+            if key in dropped_set or (
+                policy.get("compact_writes")
+                and key not in newest
+                and row["channel"] not in PRESERVED_WRITE_CHANNELS
+            ):
+                plan["writes"].append((row["ns"], row["id"], row["task_id"], row["idx"]))
+                plan["bytes"] += row["bytes"]
+        return plan
+
+    def apply(
+        self,
+        policies: Optional[Dict[str, RetentionPolicy]] = None,
+        dry_run: bool = False,
+        vacuum: bool = False,
+        now: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Apply `policies` to every stored thread and report what was removed."""
+        policies = DEFAULT_POLICIES if policies is None else policies
+        started = time.perf_counter()
+        report = {
+            "dry_run": dry_run,
+            "threads": 0,
+            "threads_expired": 0,
+            "checkpoints_deleted": 0,
+            "checkpoints_kept": 0,
+            "writes_deleted": 0,
+            "journal_entries_deleted": 0,
+            "payload_bytes": 0,
+            "storage_bytes_before": self.storage_bytes(),
+        }
+        for thread_id in self.threads():
+            policy = policy_for(thread_id, policies)
+            if policy is None:
+                continue
+            plan = self.plan(thread_id, policy, now=now)
+            report["threads"] += 1
+            report["checkpoints_kept"] += plan["kept"]
+            if not plan["checkpoints"] and not plan["writes"]:
+                continue
+            report["threads_expired"] += plan["expired"]
+            report["checkpoints_deleted"] += len(plan["checkpoints"])
+            report["writes_deleted"] += len(plan["writes"])
+            report["payload_bytes"] += plan["bytes"]
+            if dry_run:
+                continue
+            if plan["expired"]:
+                self._delete_thread(thread_id)
+            else:
+                self._delete(thread_id, plan["checkpoints"], plan["writes"])
+                if plan["journal_before"] is not None:
+                    report["journal_entries_deleted"] += self._prune_journal(thread_id, plan["journal_before"])
+        if vacuum and not dry_run:
+            self.reclaim()
+        report["storage_bytes_after"] = self.storage_bytes()
+        report["reclaimed_bytes"] = report["storage_bytes_before"] - report["storage_bytes_after"]
+        report["seconds"] = time.perf_counter() - started
+        return report
+
+
+class SQLiteCheckpointPruner(CheckpointPruner):
+    """Pruner for the `checkpoints`/`writes` tables of `langgraph-checkpoint-sqlite`.
+
+    Uses its own connection (WAL, busy timeout), so it can run while an
+    `AsyncSqliteSaver` works on the same file. A `tool_journal` table in the
+    same database is pruned along with the checkpoints.
+    """
+
+    def __init__(self, path: str, busy_timeout: float = 10.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+
+    def _has_table(self, name: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone() is not None
+
+    def threads(self):
+        with self._lock:
+            if not self._has_table("checkpoints"):
+                return []
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT thread_id FROM checkpoints")]
+
+    def _checkpoints(self, thread_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id, metadata, "
+                "length(checkpoint) + ifnull(length(metadata), 0) FROM checkpoints WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchall()
+        return [
+            {"ns": ns, "id": id_, "parent": parent, "source": _metadata_source(metadata), "bytes": size or 0}
+            for ns, id_, parent, metadata, size in rows
+        ]
+
+    def _writes(self, thread_id):
+        with self._lock:
+            if not self._has_table("writes"):
+                return []
+            rows = self._conn.execute(
+                "SELECT checkpoint_ns, checkpoint_id, task_id, idx, channel, ifnull(length(value), 0) "
+                "FROM writes WHERE thread_id = ?",
+                (thread_id,),
+            ).fetchall()
+        return [
+            {"ns": ns, "id": id_, "task_id": task_id, "idx": idx, "channel": channel, "bytes": size}
+            for ns, id_, task_id, idx, channel, size in rows
+        ]
+
+    def _delete(self, thread_id, checkpoints, writes):
+        with self._lock:
+            self._conn.executemany(
+                "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? "
+                "AND task_id = ? AND idx = ?",
+                [(thread_id, *key) for key in writes],
+            )
+            self._conn.executemany(
+                "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                [(thread_id, *key) for key in checkpoints],
+            )
+            self._conn.commit()
+
+    def _delete_thread(self, thread_id):
+        with self._lock:
+            for table in ("writes", "checkpoints", "tool_journal"):
+                if self._has_table(table):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def _prune_journal(self, thread_id, before):
+        with self._lock:
+            if not self._has_table("tool_journal"):
+                return 0
+            cursor = self._conn.execute(
+                "DELETE FROM tool_journal WHERE thread_id = ? AND created_at < ?", (thread_id, before)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def storage_bytes(self):
+        with self._lock:
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            freelist = self._conn.execute("PRAGMA freelist_count").fetchone()[0]
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return (page_count - freelist) * page_size
+
+    def file_bytes(self) -> int:
+        with self._lock:
+            page_count = self._conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self._conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def reclaim(self):
+        with self._lock:
+            # VACUUM needs a moment without writers; checkpoint the WAL first
+            # so the rewritten file is the whole database
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._conn.execute("VACUUM")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class MongoCheckpointPruner(CheckpointPruner):
+    """Pruner for the collections of `langgraph-checkpoint-mongodb`.
+
+    Pass the `MongoToolJournal` of the same database as `tool_journal` to
+    prune it along with the checkpoints.
+    """
+
+    def __init__(
+        self,
+        checkpoint_collection: Any,
+        writes_collection: Any,
+        serde: Optional[Any] = None,
+        batch_size: int = 500,
+        tool_journal: Optional[Any] = None,
+    ):
+        self.checkpoints = checkpoint_collection
+        self.writes = writes_collection
+        self.serde = serde
+        self.batch_size = batch_size
+        self.tool_journal = tool_journal
+        self._bson_size = True
+
+    @classmethod
+    def from_saver(cls, saver: Any, **kwargs) -> "MongoCheckpointPruner":
+        return cls(saver.checkpoint_collection, saver.writes_collection, serde=saver.serde, **kwargs)
+
+    def threads(self):
+        return list(self.checkpoints.distinct("thread_id"))
+
+    def _project(self, collection: Any, thread_id: str, fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+        def rows(size: Any) -> List[Dict[str, Any]]:
+            return list(collection.aggregate([
+                {"$match": {"thread_id": thread_id}},
+                {"$project": {"_id": 0, **fields, "bytes": size}},
+            ]))
+
+        if self._bson_size:
+            from pymongo.errors import OperationFailure
+
+            try:
+                return rows({"$bsonSize": "$$ROOT"})
+            except OperationFailure:
+                # $bsonSize needs MongoDB 4.4; sizes are reported as 0 without it
+                self._bson_size = False
+        return rows({"$literal": 0})
+
+    def _checkpoints(self, thread_id):
+        rows = self._project(self.checkpoints, thread_id, {
+            "ns": "$checkpoint_ns",
+            "id": "$checkpoint_id",
+            "parent": "$parent_checkpoint_id",
+            "source": "$metadata.source",
+        })
+        return [
+            {**row, "parent": row.get("parent"), "source": _metadata_source({"source": row.get("source")}, self.serde)}
+            for row in rows
+        ]
+
+    def _writes(self, thread_id):
+        return self._project(self.writes, thread_id, {
+            "ns": "$checkpoint_ns",
+            "id": "$checkpoint_id",
+            "task_id": 1,
+            "idx": 1,
+            "channel": 1,
+        })
+
+    def _bulk_delete(self, collection: Any, filters: Iterable[Dict[str, Any]]) -> None:
+        from pymongo import DeleteOne
+
+        batch = []
+        for filter_ in filters:
+            batch.append(DeleteOne(filter_))
+            if len(batch) >= self.batch_size:
+                collection.bulk_write(batch, ordered=False)
+                batch = []
+        if batch:
+            collection.bulk_write(batch, ordered=False)
+
+    def _delete(self, thread_id, checkpoints, writes):
+        self._bulk_delete(self.writes, (
+            {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": id_, "task_id": task_id, "idx": idx}
+            for ns, id_, task_id, idx in writes
+        ))
+        self._bulk_delete(self.checkpoints, (
+            {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": id_}
+            for ns, id_ in checkpoints
+        ))
+
+    def _delete_thread(self, thread_id):
+        self.writes.delete_many({"thread_id": thread_id})
+        self.checkpoints.delete_many({"thread_id": thread_id})
+        if self.tool_journal is not None:
+            self.tool_journal.delete_thread(thread_id)
+
+    def _prune_journal(self, thread_id, before):
+        return self.tool_journal.prune(thread_id, before) if self.tool_journal is not None else 0
+
+    def storage_bytes(self):
+        database = self.checkpoints.database
+        return sum(
+            database.command("collStats", collection.name).get("size", 0)
+            for collection in (self.checkpoints, self.writes)
+        )
+
+    def reclaim(self):
+        database = self.checkpoints.database
+        for collection in (self.checkpoints, self.writes):
+            database.command("compact", collection.name)
+
+
+def apply_retention(
+    target: Any,
+    policies: Optional[Dict[str, RetentionPolicy]] = None,
+    dry_run: bool = False,
+    vacuum: bool = False,
+) -> Dict[str, Any]:
+    """Prune a sqlite database path, a `MongoDBSaver` or a `CheckpointPruner`."""
+    if isinstance(target, str):
+        pruner = SQLiteCheckpointPruner(target)
+        try:
+            return pruner.apply(policies, dry_run=dry_run, vacuum=vacuum)
+        finally:
+            pruner.close()
+    if not isinstance(target, CheckpointPruner):
+        if not hasattr(target, "checkpoint_collection"):
+            raise TypeError(
+                f"Cannot prune {type(target).__name__}; pass a sqlite path, a MongoDBSaver or a CheckpointPruner"
+            )
+        target = MongoCheckpointPruner.from_saver(target)
+    return target.apply(policies, dry_run=dry_run, vacuum=vacuum)
+
+
+class RetentionWorker:
+    """Applies retention periodically in a daemon thread."""
+
+    def __init__(
+        self,
+        pruner: CheckpointPruner,
+        policies: Optional[Dict[str, RetentionPolicy]] = None,
+        interval: float = 3600.0,
+        vacuum: bool = False,
+        on_report: Optional[Callable[[Dict[str, Any]], None]] = None,
+    ):
+        self.pruner = pruner
+        self.policies = policies
+        self.interval = interval
+        self.vacuum = vacuum
+        self.on_report = on_report
+        self.last_report: Optional[Dict[str, Any]] = None
+        self.last_error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Dict[str, Any]:
+        report = self.pruner.apply(self.policies, vacuum=self.vacuum)
+        self.last_report = report
+        if self.on_report is not None:
+            self.on_report(report)
+        return report
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                # a locked database or an unreachable server only delays pruning
+                self.last_error = e
+            self._stop.wait(self.interval)
+
+    def start(self) -> "RetentionWorker":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="checkpoint-retention", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Prune stored LangGraph checkpoints")
+    parser.add_argument("database", nargs="?", default="memory.db", help="sqlite checkpoint database")
+    parser.add_argument("--mongo", help="MongoDB URI; prunes the Mongo collections instead")
+    parser.add_argument("--mongo-db", default="checkpointing_db")
+    parser.add_argument("--keep-last", type=int, help="checkpoints kept per thread (all threads)")
+    parser.add_argument("--ttl-hours", type=float, help="expire threads idle for longer (all threads)")
+    parser.add_argument("--dry-run", action="store_true", help="only report what would be removed")
+    parser.add_argument("--vacuum", action="store_true", help="give freed space back to the filesystem")
+    args = parser.parse_args()
+
+    policies = {pattern: dict(policy) for pattern, policy in DEFAULT_POLICIES.items()}
+    for policy in policies.values():
+        if args.keep_last is not None:
+            policy["keep_last"] = args.keep_last
+        if args.ttl_hours is not None:
+            policy["ttl_seconds"] = args.ttl_hours * 3600
+
+    if args.mongo:
+        from pymongo import MongoClient
+
+        from deepagents.serde import CompactDeepAgentSerializer
+
+        database = MongoClient(args.mongo)[args.mongo_db]
+        target = MongoCheckpointPruner(
+            database["checkpoints"], database["checkpoint_writes"], serde=CompactDeepAgentSerializer()
+        )
+    else:
+        target = args.database
+    report = apply_retention(target, policies, dry_run=args.dry_run, vacuum=args.vacuum)
+    for key, value in report.items():
+        print(f"{key:22s} {value:,.2f}" if isinstance(value, float) else f"{key:22s} {value}")
@@ -0,0 +1,437 @@
+"""Latency-aware routing over several model endpoints.
+
+Configure it from `create_node_llm` settings with an ordered `endpoints` list.
+Each entry overrides the base settings (usually `base_url`, `api_key` or
+`model`)::
+
+    {
+        "model": "qwen-max",
+        "model_provider": "openai",
+        "temperature": 0,
+        "api_key": os.environ["QWEN_API_KEY"],
+        "endpoints": [
+            {"base_url": os.environ["QWEN_BASE_URL"]},
+            {"base_url": os.environ["QWEN_BACKUP_BASE_URL"], "model": "qwen-plus"},
+        ],
+        "routing": {"hedge": True, "cooldown": 30},
+    }
+
+Every endpoint keeps a rolling window of latencies and outcomes shared by all
+models in the process. Endpoints with repeated failures are skipped by a
+circuit breaker until a cooldown has passed, then probed with a single call.
+With hedging enabled a duplicate request is sent to the next endpoint when
+the primary has not answered (or, when streaming, has not produced its first
+chunk) within its p95 latency; the first answer wins and the other is
+cancelled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.language_models import BaseChatModel
+
+from deepagents.model_wrappers import DelegatingChatModel
+
+
+# ==============================================================================
+# Endpoint health
+# ==============================================================================
+
+class EndpointHealth:
+    """Rolling latency/error statistics and circuit breaker for one endpoint."""
+
+    def __init__(self, window: int = 100, failure_threshold: int = 3, error_rate_threshold: float = 0.5,
+                 cooldown: float = 30.0, min_samples: int = 10):
+        self.latencies: deque = deque(maxlen=window)
+        self.outcomes: deque = deque(maxlen=window)
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+        self.min_samples = min_samples
+        self.consecutive_failures = 0
+        self.state = "closed"  # closed | open | half_open
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def available(self) -> bool:
+        """Whether `acquire` would let a call through, without claiming it."""
+        with self._lock:
+            return self.state == "closed" or time.monotonic() - self.opened_at >= self.cooldown
+
+    def acquire(self) -> bool:
+        """Whether a call may be sent now. Moves open breakers to half-open."""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            now = time.monotonic()
+            if now - self.opened_at >= self.cooldown:
+                # let one probe through per cooldown period
+                self.state = "half_open"
+                self.opened_at = now
+                return True
+            return False
+
+    def record_success(self, latency: float) -> None:
+        with self._lock:
+            self.latencies.append(latency)
+            self.outcomes.append(True)
+            self.consecutive_failures = 0
+            self.state = "closed"
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.outcomes.append(False)
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold or (
+                len(self.outcomes) >= self.min_samples and self._error_rate() >= self.error_rate_threshold
+            ):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Undo `acquire` for a call that was cancelled before it finished."""
+        with self._lock:
+            if self.state == "half_open":
+                self.state = "open"
+
+    def _error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def quantile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            error_rate = self._error_rate()
+            samples = len(self.latencies)
+        return {
+            "state": self.state,
+            "samples": samples,
+            "error_rate": error_rate,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+        }
+
+
+_HEALTH: Dict[str, EndpointHealth] = {}
+_HEALTH_LOCK = threading.Lock()
+_HEDGE_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+
+def get_endpoint_health(name: str, routing_settings: Optional[dict] = None) -> EndpointHealth:
+    routing_settings = routing_settings or {}
+    with _HEALTH_LOCK:
+        if name not in _HEALTH:
+            _HEALTH[name] = EndpointHealth(
+                window=routing_settings.get("window", 100),
+                failure_threshold=routing_settings.get("failure_threshold", 3),
+                error_rate_threshold=routing_settings.get("error_rate_threshold", 0.5),
+                cooldown=routing_settings.get("cooldown", 30.0),
+                min_samples=routing_settings.get("min_samples", 10),
+            )
+        return _HEALTH[name]
+
+
+def get_routing_stats() -> Dict[str, Dict[str, Any]]:
+    """Health snapshot of every endpoint seen in this process."""
+    with _HEALTH_LOCK:
+        items = list(_HEALTH.items())
+    return {name: health.snapshot() for name, health in items}
+
+
+# ==============================================================================
+# Routing chat model
+# ==============================================================================
+
+class RoutingChatModel(DelegatingChatModel):
+    """Send each call to the best available endpoint, with failover and hedging.
+
+    `inner` is the primary endpoint; it is also used to format bound tools.
+    """
+
+    endpoints: List[BaseChatModel]
+    endpoint_names: List[str]
+    strategy: str = "ordered"  # "ordered" keeps configured priority, "fastest" sorts by p50
+    hedge: bool = False
+    hedge_quantile: float = 0.95
+    hedge_min_delay: float = 0.2
+
+    @property
+    def _wrapper_name(self) -> str:
+        return "routing"
+
+    def _health(self, index: int) -> EndpointHealth:
+        return get_endpoint_health(self.endpoint_names[index])
+
+    def _candidates(self) -> Tuple[List[int], bool]:
+        """Endpoints to try in order, and whether their breakers are bypassed.
+
+        Nothing is claimed here: a half-open probe is only taken (`_claim`)
+        when the endpoint is actually called.
+        """
+        indices = list(range(len(self.endpoints)))
+        if self.strategy == "fastest":
+            indices.sort(key=lambda i: self._health(i).quantile(0.5) or float("inf"))
+        available = [i for i in indices if self._health(i).available()]
+        # Every breaker open: still try everything rather than fail outright
+        return (available, False) if available else (indices, True)
+
+    def _claim(self, waiting: List[int], forced: bool) -> Optional[int]:
+        """Pop the next endpoint of `waiting` that may be called now."""
+        while waiting:
+            index = waiting.pop(0)
+            if forced or self._health(index).acquire():
+                return index
+        return None
+
+    def _first(self) -> Tuple[int, List[int], bool]:
+        waiting, forced = self._candidates()
+        index = self._claim(waiting, forced)
+        if index is None:
+            # concurrent calls took every probe in the meantime
+            waiting, forced = list(range(len(self.endpoints))), True
+            index = self._claim(waiting, forced)
+        return index, waiting, forced
+
+    def _hedge_delay(self, index: int) -> Optional[float]:
+        if not self.hedge:
+            return None
+        latency = self._health(index).quantile(self.hedge_quantile)
+        if latency is None:
+            return None
+        return max(latency, self.hedge_min_delay)
+
+    # ------------------------------------------------------------------
+    # Non-streaming calls
+    # ------------------------------------------------------------------
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        first, waiting, forced = self._first()
+
+        async def attempt(index: int):
+            started = time.monotonic()
+            try:
+                result = await self.endpoints[index]._agenerate(messages, stop=stop, **kwargs)
+            except asyncio.CancelledError:
+                self._health(index).release()
+                raise
+            except Exception:
+                self._health(index).record_failure()
+                raise
+            self._health(index).record_success(time.monotonic() - started)
+            return result
+
+        running = {asyncio.ensure_future(attempt(first)): first}
+        last_error: Optional[BaseException] = None
+        try:
+            while running:
+                hedge_delay = self._hedge_delay(first) if waiting and len(running) == 1 else None
+                done, _ = await asyncio.wait(running, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # primary is slower than its p95: send a hedged duplicate
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        running[asyncio.ensure_future(attempt(index))] = index
+                    continue
+                for task in done:
+                    running.pop(task)
+                    if task.exception() is None:
+                        return task.result()
+                    last_error = task.exception()
+                if not running:
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        running[asyncio.ensure_future(attempt(index))] = index
+        finally:
+            for task in running:
+                task.cancel()
+        raise last_error
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        first, waiting, forced = self._first()
+
+        def attempt(index: int):
+            started = time.monotonic()
+            try:
+                result = self.endpoints[index]._generate(messages, stop=stop, **kwargs)
+            except Exception:
+                self._health(index).record_failure()
+                raise
+            self._health(index).record_success(time.monotonic() - started)
+            return result
+
+        running = {_HEDGE_EXECUTOR.submit(attempt, first): first}
+        last_error: Optional[BaseException] = None
+        try:
+            while running:
+                hedge_delay = self._hedge_delay(first) if waiting and len(running) == 1 else None
+                done, _ = concurrent.futures.wait(
+                    running, timeout=hedge_delay, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                if not done:
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        running[_HEDGE_EXECUTOR.submit(attempt, index)] = index
+                    continue
+                for future in done:
+                    running.pop(future)
+                    if future.exception() is None:
+                        return future.result()
+                    last_error = future.exception()
+                if not running:
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        running[_HEDGE_EXECUTOR.submit(attempt, index)] = index
+        finally:
+            # threads cannot be interrupted; late results are simply dropped
+            for future in running:
+                future.cancel()
+        raise last_error
+
+    # ------------------------------------------------------------------
+    # Streaming calls
+    # ------------------------------------------------------------------
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        first, waiting, forced = self._first()
+        # stream per started endpoint: index -> (async iterator, start time)
+        streams: Dict[int, tuple] = {}
+        first_chunks: Dict[asyncio.Future, int] = {}
+
+        def start(index: int) -> None:
+            stream = self.endpoints[index]._astream(messages, stop=stop, **kwargs)
+            streams[index] = (stream, time.monotonic())
+            first_chunks[asyncio.ensure_future(stream.__anext__())] = index
+
+        async def close(index: int) -> None:
+            stream, _ = streams.pop(index)
+            try:
+                await stream.aclose()
+            except Exception:
+                pass
+
+        start(first)
+        winner: Optional[int] = None
+        first_chunk = None
+        last_error: Optional[BaseException] = None
+        try:
+            while first_chunks:
+                hedge_delay = self._hedge_delay(first) if waiting and len(first_chunks) == 1 else None
+                done, _ = await asyncio.wait(first_chunks, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        start(index)
+                    continue
+                for task in done:
+                    index = first_chunks.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        winner, first_chunk = index, task.result()
+                        break
+                    if not isinstance(error, StopAsyncIteration):
+                        self._health(index).record_failure()
+                    last_error = error
+                    await close(index)
+                if winner is not None:
+                    break
+                if not first_chunks:
+                    index = self._claim(waiting, forced)
+                    if index is not None:
+                        start(index)
+        finally:
+            for task, index in first_chunks.items():
+                task.cancel()
+                try:
+                    await task
+                except BaseException:
+                    pass
+                self._health(index).release()
+                await close(index)
+
+        if winner is None:
+            if isinstance(last_error, StopAsyncIteration) or last_error is None:
+                return
+            raise last_error
+
+        stream, started = streams[winner]
+        latency = time.monotonic() - started
+        try:
+            if run_manager:
+                await run_manager.on_llm_new_token(first_chunk.text, chunk=first_chunk)
+            yield first_chunk
+            async for chunk in stream:
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                yield chunk
+        except (asyncio.CancelledError, GeneratorExit):
+            self._health(winner).release()
+            raise
+        except Exception:
+            self._health(winner).record_failure()
+            raise
+        # time-to-first-chunk is what the hedge delay is compared against
+        self._health(winner).record_success(latency)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        # Sync streaming fails over before the first chunk but does not hedge
+        last_error: Optional[BaseException] = None
+        index, waiting, forced = self._first()
+        while index is not None:
+            started = time.monotonic()
+            stream = self.endpoints[index]._stream(messages, stop=stop, **kwargs)
+            try:
+                first_chunk = next(stream)
+            except StopIteration:
+                self._health(index).record_success(time.monotonic() - started)
+                return
+            except Exception as error:
+                self._health(index).record_failure()
+                last_error = error
+                index = self._claim(waiting, forced)
+                continue
+            latency = time.monotonic() - started
+            try:
+                if run_manager:
+                    run_manager.on_llm_new_token(first_chunk.text, chunk=first_chunk)
+                yield first_chunk
+                for chunk in stream:
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+            except Exception:
+                self._health(index).record_failure()
+                raise
+            self._health(index).record_success(latency)
+            return
+        if last_error is not None:
+            raise last_error
+
+
+def create_routing_model(endpoint_models: List[BaseChatModel], endpoint_names: List[str],
+                         routing_settings: Optional[dict] = None) -> RoutingChatModel:
+    """Build a `RoutingChatModel` over already configured endpoint models."""
+    routing_settings = routing_settings or {}
+    for name in endpoint_names:
+        get_endpoint_health(name, routing_settings)
+    return RoutingChatModel(
+        inner=endpoint_models[0],
+        endpoints=endpoint_models,
+        endpoint_names=endpoint_names,
+        strategy=routing_settings.get("strategy", "ordered"),
+        hedge=routing_settings.get("hedge", False),
+        hedge_quantile=routing_settings.get("hedge_quantile", 0.95),
+        hedge_min_delay=routing_settings.get("hedge_min_delay", 0.2),
+    )
@@ -0,0 +1,359 @@
+"""Compact checkpoint serializer for `DeepAgentState`.
+
+The default serde writes every checkpoint with the full LangChain message
+objects (class path, every default field) and the whole `files` dict with all
+versions. `CompactDeepAgentSerializer` encodes the same values as a tagged
+tree:
+
+- messages become `[MSG, type, {non-default fields}]`
+- strings of `min_intern_length` chars or more that repeat (file contents
+  across versions, tool-call ids, paths) are stored once in a string table
+- anything JSON cannot hold (Send, Interrupt, datetimes, NaN/inf...) is delegated to
+  `JsonPlusSerializer` and embedded as an opaque blob
+- the payload is JSON (orjson when installed), optionally compressed with
+  zstd (`zstandard` package) or zlib
+
+Every payload starts with a magic + format version byte so the encoding can
+be migrated; data written by another serde (no magic, or a different type
+tag) is handed to `JsonPlusSerializer`, so existing threads keep loading.
+
+    checkpointer = AsyncSqliteSaver(conn, serde=CompactDeepAgentSerializer(compression="zstd"))
+
+`python -m deepagents.serde memory.db` compares bytes and encode/decode time
+against the default serde on the checkpoints stored in a sqlite database.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import math
+import time
+import zlib
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    ChatMessage,
+    FunctionMessage,
+    HumanMessage,
+    HumanMessageChunk,
+    RemoveMessage,
+    SystemMessage,
+    ToolMessage,
+    ToolMessageChunk,
+)
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+
+COMPACT_TYPE = "deepagents_compact"
+MAGIC = b"DAC"
+FORMAT_VERSION = 1
+
+# compression byte following the version
+_RAW, _ZLIB, _ZSTD = 0, 1, 2
+
+# tags of the encoded tree; a JSON array always starts with one
+LIST, STR, MSG, TUPLE, SET, BYTES, FOREIGN, DICT = range(8)
+
+MESSAGE_CLASSES: Dict[str, type] = {
+    "human": HumanMessage,
+    "ai": AIMessage,
+    "system": SystemMessage,
+    "tool": ToolMessage,
+    "function": FunctionMessage,
+    "chat": ChatMessage,
+    "remove": RemoveMessage,
+    "AIMessageChunk": AIMessageChunk,
+    "HumanMessageChunk": HumanMessageChunk,
+    "ToolMessageChunk": ToolMessageChunk,
+}
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class _Encoder:
+    def __init__(self, fallback: JsonPlusSerializer, min_intern_length: int):
+        self.fallback = fallback
+        self.min_intern_length = min_intern_length
+        self.counts: Counter = Counter()
+        self.table: Dict[str, int] = {}
+        self.strings: List[str] = []
+        self._message_fields: Dict[int, Dict[str, Any]] = {}
+
+    def message_fields(self, message: BaseMessage) -> Dict[str, Any]:
+        fields = self._message_fields.get(id(message))
+        if fields is None:
+            fields = self._message_fields[id(message)] = _message_fields(message)
+        return fields
+
+    def count(self, value: Any) -> None:
+        """First pass: count long strings so only repeated ones are interned."""
+        if isinstance(value, str):
+            if len(value) >= self.min_intern_length:
+                self.counts[value] += 1
+        elif isinstance(value, dict):
+            for item in value.values():
+                self.count(item)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            for item in value:
+                self.count(item)
+        elif isinstance(value, BaseMessage):
+            self.count(self.message_fields(value))
+
+    def encode(self, value: Any) -> Any:
+        if value is None or isinstance(value, (bool, int, float)):
+            if isinstance(value, int) and not isinstance(value, bool) and abs(value) >= 2 ** 63:
+                return self._foreign(value)
+            if isinstance(value, float) and not math.isfinite(value):
+                # JSON has no NaN/inf (orjson writes null)
+                return self._foreign(value)
+            return value
+        if isinstance(value, str):
+            if len(value) >= self.min_intern_length and self.counts[value] > 1:
+                index = self.table.get(value)
+                if index is None:
+                    index = self.table[value] = len(self.strings)
+                    self.strings.append(value)
+                return [STR, index]
+            return value
+        if isinstance(value, dict):
+            if all(isinstance(key, str) for key in value):
+                return {key: self.encode(item) for key, item in value.items()}
+            return [DICT, [[self.encode(key), self.encode(item)] for key, item in value.items()]]
+        if isinstance(value, list):
+            return [LIST, *[self.encode(item) for item in value]]
+        if isinstance(value, BaseMessage) and value.type in MESSAGE_CLASSES:
+            return [MSG, value.type, self.encode(self.message_fields(value))]
+        if isinstance(value, tuple) and type(value) is tuple:
+            return [TUPLE, *[self.encode(item) for item in value]]
+        if isinstance(value, (set, frozenset)):
+            return [SET, *[self.encode(item) for item in value]]
+        if isinstance(value, (bytes, bytearray)):
+            return [BYTES, base64.b64encode(bytes(value)).decode("ascii")]
+        return self._foreign(value)
+
+    def _foreign(self, value: Any) -> Any:
+        type_, data = self.fallback.dumps_typed(value)
+        return [FOREIGN, type_, base64.b64encode(data).decode("ascii")]
+
+
+def _message_fields(message: BaseMessage) -> Dict[str, Any]:
+    fields = message.model_dump(exclude_defaults=True)
+    fields.pop("type", None)
+    if "content" not in fields:
+        fields["content"] = message.content
+    return fields
+
+
+_ROOT = object()
+
+
+class CompactDocument:
+    """A decoded payload whose values are revived on demand.
+
+    `root` is the encoded tree; `revive(node)` turns any sub-tree back into
+    Python/LangChain objects, so a reader interested in one channel does not
+    pay for reviving the whole checkpoint.
+    """
+
+    def __init__(self, root: Any, strings: List[str], fallback: JsonPlusSerializer):
+        self.root = root
+        self.strings = strings
+        self.fallback = fallback
+
+    def get(self, *path: str) -> Any:
+        """The encoded node at a key path of nested (string-keyed) dicts, or None."""
+        node = self.root
+        for key in path:
+            if not isinstance(node, dict) or key not in node:
+                return None
+            node = node[key]
+        return node
+
+    def revive(self, node: Any = _ROOT) -> Any:
+        if node is _ROOT:
+            node = self.root
+        if isinstance(node, dict):
+            return {key: self.revive(item) for key, item in node.items()}
+        if not isinstance(node, list):
+            return node
+        tag = node[0]
+        if tag == LIST:
+            return [self.revive(item) for item in node[1:]]
+        if tag == STR:
+            return self.strings[node[1]]
+        if tag == MSG:
+            return MESSAGE_CLASSES[node[1]](**self.revive(node[2]))
+        if tag == TUPLE:
+            return tuple(self.revive(item) for item in node[1:])
+        if tag == SET:
+            return {self.revive(item) for item in node[1:]}
+        if tag == BYTES:
+            return base64.b64decode(node[1])
+        if tag == FOREIGN:
+            return self.fallback.loads_typed((node[1], base64.b64decode(node[2])))
+        if tag == DICT:
+            return {self.revive(key): self.revive(item) for key, item in node[1]}
+        raise ValueError(f"Unknown compact serde tag: {tag}")
+
+
+# format version -> function upgrading a decoded {"s": ..., "d": ...} body to
+# the next version; add an entry whenever FORMAT_VERSION changes
+MIGRATIONS: Dict[int, Any] = {}
+
+
+class CompactDeepAgentSerializer:
+    """`SerializerProtocol` implementation with compact encodings for deep agent state."""
+
+    def __init__(
+        self,
+        compression: Optional[str] = None,
+        compression_threshold: int = 1024,
+        min_intern_length: int = 16,
+        fallback: Optional[JsonPlusSerializer] = None,
+    ):
+        if compression not in (None, "zlib", "zstd"):
+            raise ValueError(f"Unknown compression: {compression}, expected None, 'zlib' or 'zstd'")
+        if compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression requires the 'zstandard' package: pip install zstandard")
+        self.compression = compression
+        self.compression_threshold = compression_threshold
+        self.min_intern_length = min_intern_length
+        self.fallback = fallback or JsonPlusSerializer()
+        if zstandard is not None:
+            self._zstd_compressor = zstandard.ZstdCompressor(level=3)
+            self._zstd_decompressor = zstandard.ZstdDecompressor()
+
+    # -- SerializerProtocol -------------------------------------------------
+
+    def dumps(self, obj: Any) -> bytes:
+        return self.fallback.dumps(obj)
+
+    def loads(self, data: bytes) -> Any:
+        return self.fallback.loads(data)
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        if obj is None or isinstance(obj, (bytes, bytearray)):
+            # keep the conventional encodings for these, savers special-case them
+            return self.fallback.dumps_typed(obj)
+        encoder = _Encoder(self.fallback, self.min_intern_length)
+        encoder.count(obj)
+        body = _json_dumps({"s": encoder.strings, "d": encoder.encode(obj)})
+        return COMPACT_TYPE, self._frame(body)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        document = self.loads_document(data)
+        if document is None:
+            return self.fallback.loads_typed(data)
+        return document.revive()
+
+    # -- partial reads --------------------------------------------------------
+
+    def loads_document(self, data: Tuple[str, bytes]) -> Optional[CompactDocument]:
+        """Decode without reviving; None if `data` was not written by this serde."""
+        type_, payload = data
+        if type_ != COMPACT_TYPE or not bytes(payload[:3]) == MAGIC:
+            return None
+        version, codec = payload[3], payload[4]
+        body = payload[5:]
+        if codec == _ZLIB:
+            body = zlib.decompress(body)
+        elif codec == _ZSTD:
+            if zstandard is None:
+                raise ImportError("checkpoint is zstd-compressed; install 'zstandard' to read it")
+            body = self._zstd_decompressor.decompress(body)
+        decoded = _json_loads(body)
+        while version < FORMAT_VERSION:
+            decoded = MIGRATIONS[version](decoded)
+            version += 1
+        if version > FORMAT_VERSION:
+            raise ValueError(f"Checkpoint written by a newer compact serde (format {version})")
+        return CompactDocument(decoded["d"], decoded["s"], self.fallback)
+
+    # -- framing ------------------------------------------------------------
+
+    def _frame(self, body: bytes) -> bytes:
+        codec = _RAW
+        if self.compression and len(body) >= self.compression_threshold:
+            if self.compression == "zstd":
+                body = self._zstd_compressor.compress(body)
+                codec = _ZSTD
+            else:
+                body = zlib.compress(body, 6)
+                codec = _ZLIB
+        return MAGIC + bytes((FORMAT_VERSION, codec)) + body
+
+
+# ==============================================================================
+# Benchmark on real threads
+# ==============================================================================
+
+def benchmark(db_path: str, limit: int = 200, compression: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """Bytes and encode/decode time of the default vs compact serde.
+
+    Reads up to `limit` checkpoints from a `langgraph-checkpoint-sqlite`
+    database (table `checkpoints`).
+    """
+    import sqlite3
+
+    default = JsonPlusSerializer()
+    compact = CompactDeepAgentSerializer(compression=compression)
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute(
+        "SELECT type, checkpoint FROM checkpoints ORDER BY rowid DESC LIMIT ?", (limit,)
+    ).fetchall()
+    conn.close()
+    checkpoints = [compact.loads_typed((type_, bytes(blob))) for type_, blob in rows]
+
+    results = {}
+    for name, serde in (("default", default), ("compact", compact)):
+        started = time.perf_counter()
+        encoded = [serde.dumps_typed(checkpoint) for checkpoint in checkpoints]
+        encode_s = time.perf_counter() - started
+        started = time.perf_counter()
+        for item in encoded:
+            serde.loads_typed(item)
+        decode_s = time.perf_counter() - started
+        results[name] = {
+            "checkpoints": len(checkpoints),
+            "bytes": sum(len(data) for _type, data in encoded),
+            "encode_ms": encode_s * 1000,
+            "decode_ms": decode_s * 1000,
+        }
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "memory.db"
+    compression = sys.argv[2] if len(sys.argv) > 2 else None
+    for name, stats in benchmark(path, compression=compression).items():
+        print(
+            f"{name:8s} {stats['checkpoints']:5d} checkpoints  {stats['bytes']:>12,d} bytes  "
+            f"encode {stats['encode_ms']:9.1f} ms  decode {stats['decode_ms']:9.1f} ms"
+        )
@@ -0,0 +1,349 @@
+"""Tuned SQLite checkpointer profile.
+
+`AsyncSqliteSaver(aiosqlite.connect("memory.db"))` runs every read and write
+through one connection behind one lock, with the default page cache and a
+commit (and fsync) per `aput`/`aput_writes`. With many threads streaming at
+once checkpoint writes queue behind each other and behind reads.
+
+`TunedAsyncSqliteSaver` keeps the same tables and wire format and changes how
+they are accessed:
+
+- WAL, `synchronous=NORMAL` (no fsync per commit; a power loss may lose the
+  last commits but never corrupts the file), a larger page cache, mmap and
+  in-memory temp storage
+- one writer connection with group commit: writes issued within
+  `commit_interval` (or up to `max_batch` of them) share one transaction;
+  `aput` still returns only after its transaction committed
+- a pool of `readers` connections for `aget_tuple`/`alist`, so reads do not
+  wait for the writer; a read of a thread with writes still queued flushes
+  them first
+- constant SQL strings on connections with a larger statement cache, so the
+  statements are prepared once per connection
+
+    checkpointer = TunedAsyncSqliteSaver("memory.db", serde=CompactDeepAgentSerializer())
+
+`python -m deepagents.sqlite_saver --threads 100` compares checkpoint latency
+(p50/p99) with the default saver.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set, Tuple
+
+import aiosqlite
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+INSERT_CHECKPOINT = (
+    "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+    "type, checkpoint, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+_WRITE_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value"
+_WRITE_COLUMNS_WITH_PATH = "thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value"
+
+
+class TunedAsyncSqliteSaver(AsyncSqliteSaver):
+    """`AsyncSqliteSaver` with WAL tuning, group commit and a reader pool."""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        serde: Optional[Any] = None,
+        readers: int = 4,
+        commit_interval: float = 0.002,
+        max_batch: int = 256,
+        synchronous: str = "NORMAL",
+        cache_size_kib: int = 64 * 1024,
+        mmap_size: int = 256 * 1024 * 1024,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 256,
+    ):
+        super().__init__(aiosqlite.connect(path, cached_statements=cached_statements), serde=serde)
+        self.path = path
+        self.reader_count = readers
+        self.commit_interval = commit_interval
+        self.max_batch = max_batch
+        self.synchronous = synchronous
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self.batches = 0
+        self.batched_writes = 0
+        self._pending: List[Tuple[str, list, asyncio.Future]] = []
+        self._pending_threads: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._reader_savers: List[AsyncSqliteSaver] = []
+        self._tuning_lock = asyncio.Lock()
+        self._writes_sql: Dict[bool, str] = {}
+        self._has_writes_task_path = True
+
+    async def _tune(self, conn: aiosqlite.Connection) -> None:
+        for pragma in (
+            f"synchronous={self.synchronous}",
+            f"cache_size=-{self.cache_size_kib}",
+            f"mmap_size={self.mmap_size}",
+            f"busy_timeout={self.busy_timeout_ms}",
+            "temp_store=MEMORY",
+        ):
+            await conn.execute(f"PRAGMA {pragma}")
+
+    async def setup(self) -> None:
+        if self._readers is not None:
+            return
+        # tables and WAL mode
+        await super().setup()
+        async with self._tuning_lock:
+            if self._readers is not None:
+                return
+            async with self.lock:
+                await self._tune(self.conn)
+                columns = {row[1] for row in await self.conn.execute_fetchall("PRAGMA table_info(writes)")}
+            write_columns = _WRITE_COLUMNS_WITH_PATH if "task_path" in columns else _WRITE_COLUMNS
+            placeholders = ", ".join("?" * len(write_columns.split(", ")))
+            self._writes_sql = {
+                replace: f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO writes ({write_columns}) "
+                f"VALUES ({placeholders})"
+                for replace in (True, False)
+            }
+            self._has_writes_task_path = "task_path" in columns
+
+            readers: asyncio.Queue = asyncio.Queue()
+            for _ in range(max(1, self.reader_count)):
+                conn = await aiosqlite.connect(self.path, cached_statements=self.cached_statements)
+                await self._tune(conn)
+                await conn.execute("PRAGMA query_only=ON")
+                # the writer created the tables; readers only run the base SELECTs
+                reader = AsyncSqliteSaver(conn, serde=self.serde)
+                reader.is_setup = True
+                self._reader_savers.append(reader)
+                readers.put_nowait(reader)
+            self._readers = readers
+
+    @asynccontextmanager
+    async def _reader(self) -> AsyncIterator[AsyncSqliteSaver]:
+        reader = await self._readers.get()
+        try:
+            yield reader
+        finally:
+            self._readers.put_nowait(reader)
+
+    async def _submit(self, thread_id: str, sql: str, rows: list) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((sql, rows, future))
+        self._pending_threads.add(thread_id)
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_after(self.commit_interval))
+        await future
+
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        # cleared before taking the batch: anything queued from now on
+        # schedules its own flush
+        self._flush_task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        """Commit every queued write now."""
+        async with self.lock:
+            batch, self._pending = self._pending, []
+            self._pending_threads = set()
+            if not batch:
+                return
+            self.batches += 1
+            self.batched_writes += len(batch)
+            try:
+                for sql, rows, _future in batch:
+                    await self.conn.executemany(sql, rows)
+                await self.conn.commit()
+            except Exception:
+                await self.conn.rollback()
+                # one at a time, so a failing write only fails its own call
+                for sql, rows, future in batch:
+                    try:
+                        await self.conn.executemany(sql, rows)
+                        await self.conn.commit()
+                    except Exception as e:
+                        await self.conn.rollback()
+                        if not future.done():
+                            future.set_exception(e)
+                    else:
+                        if not future.done():
+                            future.set_result(None)
+                return
+            for _sql, _rows, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        await self.setup()
+        if str(config["configurable"]["thread_id"]) in self._pending_threads:
+            await self.flush()
+        async with self._reader() as reader:
+            return await reader.aget_tuple(config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        await self.setup()
+        if self._pending:
+            await self.flush()
+        async with self._reader() as reader:
+            async for item in reader.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(
+            get_checkpoint_metadata(config, metadata), ensure_ascii=False
+        ).encode("utf-8", "ignore")
+        await self._submit(thread_id, INSERT_CHECKPOINT, [(
+            thread_id,
+            checkpoint_ns,
+            checkpoint["id"],
+            config["configurable"].get("checkpoint_id"),
+            type_,
+            serialized_checkpoint,
+            serialized_metadata,
+        )])
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.setup()
+        thread_id = str(config["configurable"]["thread_id"])
+        prefix = (thread_id, str(config["configurable"]["checkpoint_ns"]), str(config["configurable"]["checkpoint_id"]), task_id)
+        if self._has_writes_task_path:
+            prefix += (task_path,)
+        rows = [
+            (*prefix, WRITES_IDX_MAP.get(channel, idx), channel, *self.serde.dumps_typed(value))
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        sql = self._writes_sql[all(channel in WRITES_IDX_MAP for channel, _value in writes)]
+        await self._submit(thread_id, sql, rows)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.flush()
+        await super().adelete_thread(thread_id)
+
+    async def aclose(self) -> None:
+        """Commit queued writes and close every connection."""
+        await self.flush()
+        for reader in self._reader_savers:
+            await reader.conn.close()
+        self._reader_savers = []
+        self._readers = None
+        await self.conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "batched_writes": self.batched_writes,
+            "writes_per_commit": self.batched_writes / self.batches if self.batches else 0.0,
+            "pending": len(self._pending),
+        }
+
+
+async def _benchmark_saver(saver: Any, threads: int, steps: int, payload_bytes: int) -> Dict[str, float]:
+    import time
+
+    from langgraph.checkpoint.base import empty_checkpoint
+    from langgraph.checkpoint.base.id import uuid6
+
+    latencies: List[float] = []
+
+    async def run_thread(index: int) -> None:
+        config = {"configurable": {"thread_id": f"bench-{index}", "checkpoint_ns": ""}}
+        for step in range(steps):
+            checkpoint = empty_checkpoint()
+            checkpoint["id"] = str(uuid6(clock_seq=step))
+            checkpoint["channel_values"] = {"messages": "x" * payload_bytes, "step": step}
+            started = time.perf_counter()
+            config = await saver.aput(config, checkpoint, {"source": "loop", "step": step}, {})
+            await saver.aput_writes(config, [("messages", "y" * 256)], task_id=f"task-{step}")
+            latencies.append(time.perf_counter() - started)
+            # the graph reads the thread back before the next step
+            await saver.aget_tuple({"configurable": {"thread_id": f"bench-{index}", "checkpoint_ns": ""}})
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_thread(index) for index in range(threads)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "checkpoints_per_s": len(latencies) / elapsed,
+    }
+
+
+async def benchmark(threads: int = 100, steps: int = 20, payload_bytes: int = 4096) -> Dict[str, Dict[str, float]]:
+    """Checkpoint latency of the default vs tuned saver on fresh database files."""
+    import os
+    import tempfile
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        default = AsyncSqliteSaver(await aiosqlite.connect(os.path.join(directory, "default.db")))
+        results["default"] = await _benchmark_saver(default, threads, steps, payload_bytes)
+        await default.conn.close()
+
+        tuned = TunedAsyncSqliteSaver(os.path.join(directory, "tuned.db"))
+        results["tuned"] = await _benchmark_saver(tuned, threads, steps, payload_bytes)
+        results["tuned"]["writes_per_commit"] = tuned.stats()["writes_per_commit"]
+        await tuned.aclose()
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Checkpoint latency of the default vs tuned sqlite saver")
+    parser.add_argument("--threads", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=20)
+    parser.add_argument("--payload-bytes", type=int, default=4096)
+    args = parser.parse_args()
+    for name, stats in asyncio.run(benchmark(args.threads, args.steps, args.payload_bytes)).items():
+        print(
+            f"{name:8s} p50 {stats['p50_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms  "
+            f"{stats['checkpoints_per_s']:9.1f} checkpoints/s"
+        )
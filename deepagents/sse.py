@@ -0,0 +1,430 @@
+"""Resumable SSE streaming for deep agent runs.
+
+The v2 protocol (see v2/README.md) sends `event:/data:` frames without ids, so
+a dropped connection loses the rest of the run. Here every frame gets a
+monotonic id and is kept in a bounded per-thread ring buffer (optionally
+spilled to a jsonl file), and the run itself executes as a detached task:
+
+    runs = SSERunRegistry(spill_dir="./sse_logs")
+    runs.start(thread_id, agent, {"messages": message}, config)
+
+    # POST /api/chat/stream and every reconnect (GET with Last-Event-ID)
+    async for frame in runs.subscribe(thread_id, last_event_id=request.headers.get("Last-Event-ID")):
+        yield frame
+
+Clients that disconnect simply stop consuming; the agent keeps running and a
+reconnect replays everything after `Last-Event-ID`. If the requested id has
+already been evicted from memory and no spill file exists, a `resync` event is
+sent so the client reloads the thread from `/api/threads/{id}/messages`.
+A finished run's log (and its spill file) is dropped `finished_ttl` seconds
+after it ends, once nobody is still reading it.
+
+Any number of observers can follow the same run (a second tab, a reviewer):
+
+    async for frame in runs.subscribe(thread_id, snapshot=True):
+        yield frame
+
+Each observer has its own cursor into the shared log, so the agent runs once
+no matter how many are watching. A late joiner, or an observer that falls
+more than `observer_max_lag` events behind, gets one `snapshot` event (current
+assistant text, todos, file index, running subagents and tool calls) and then
+the live events after it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import glob
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from deepagents.event_codec import dumps, get_event_codec, loads, project_message
+
+
+SSEEvent = Tuple[int, str, Any]  # (id, event type, payload)
+
+
+def format_sse(event_id: Optional[int], event_type: str, data: Any) -> str:
+    """One SSE frame in the v2 shape: `data: {"type": ..., "data": ...}`."""
+    return get_event_codec().sse_frame(event_id, event_type, data)
+
+
+# ==============================================================================
+# Stream chunk -> v2 payloads
+# ==============================================================================
+
+def serialize_update(data: Any) -> Dict[str, Any]:
+    """Keep only the JSON-friendly channels the frontend reads from updates."""
+    update: Dict[str, Any] = {}
+    if not isinstance(data, dict):
+        return update
+    for node_data in data.values():
+        if not isinstance(node_data, dict):
+            continue
+        for key in ("files", "todos", "usage"):
+            if node_data.get(key):
+                update[key] = node_data[key]
+    return update
+
+
+def serialize_stream_chunk(stream_type: str, data: Any) -> Optional[Tuple[str, Any]]:
+    """Map one `agent.astream` chunk to a v2 `(event, payload)` pair, or None."""
+    if stream_type == "messages":
+        message_chunk, _metadata = data
+        return "message", project_message(message_chunk)
+    if stream_type == "updates":
+        update = serialize_update(data)
+        return ("update", update) if update else None
+    if stream_type == "custom":
+        if isinstance(data, dict) and "subagent" in data:
+            event = dict(data["subagent"])
+            if event.get("type") == "chunk":
+                inner = serialize_stream_chunk(event.get("stream_type"), event.get("data"))
+                if inner is None:
+                    return None
+                event["data"] = inner[1]
+            return "subagent", event
+        if isinstance(data, dict) and "usage" in data:
+            return "usage", data["usage"]
+        if isinstance(data, dict) and "tool_progress" in data:
+            return "tool_progress", data["tool_progress"]
+        return "custom", data
+    return None
+
+
+# ==============================================================================
+# Thread snapshot for late joiners
+# ==============================================================================
+
+class ThreadSnapshot:
+    """Compact view of a thread's run, folded from the events it produced."""
+
+    def __init__(self, thread_id: str, previous: Optional["ThreadSnapshot"] = None):
+        self.thread_id = thread_id
+        self.status = "running"
+        self.message_id: Optional[str] = None
+        self.text_parts: List[str] = []
+        self.todos: List[Any] = list(previous.todos) if previous else []
+        self.files: Dict[str, int] = dict(previous.files) if previous else {}  # path -> versions
+        self.subagents: Dict[str, Optional[str]] = {}  # running subagent -> description
+        self.tool_calls: Dict[int, Optional[str]] = {}  # index -> name, while streaming
+
+    def apply(self, event_type: str, data: Any) -> None:
+        if event_type == "message":
+            self._apply_message(data)
+        elif event_type == "update":
+            if data.get("todos"):
+                self.todos = list(data["todos"])
+            for path, versions in (data.get("files") or {}).items():
+                self.files[path] = len(versions) if isinstance(versions, list) else 1
+        elif event_type == "subagent":
+            if data.get("type") == "start":
+                self.subagents[data.get("name") or "subagent"] = data.get("description")
+            elif data.get("type") == "stop":
+                self.subagents.pop(data.get("name") or "subagent", None)
+        elif event_type in ("done", "error"):
+            self.status = event_type
+        elif event_type == "stop":
+            self.status = "stopped"
+
+    def _apply_message(self, data: Dict[str, Any]) -> None:
+        if data.get("type") != "ai":
+            return
+        if data.get("id") != self.message_id:
+            self.message_id = data.get("id")
+            self.text_parts = []
+            self.tool_calls = {}
+        content = data.get("content")
+        if content:
+            self.text_parts.append(content if isinstance(content, str) else str(content))
+        for tc in (data.get("additional_kwargs") or {}).get("tool_call_chunks") or []:
+            index = tc.get("index") or 0
+            if tc.get("name") or index not in self.tool_calls:
+                self.tool_calls[index] = tc.get("name") or self.tool_calls.get(index)
+        if (data.get("response_metadata") or {}).get("finish_reason"):
+            self.tool_calls = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        if len(self.text_parts) > 1:
+            self.text_parts[:] = ["".join(self.text_parts)]
+        return {
+            "thread_id": self.thread_id,
+            "status": self.status,
+            "message_id": self.message_id,
+            "text": self.text_parts[0] if self.text_parts else "",
+            "todos": self.todos,
+            "files": self.files,
+            "subagents": [{"name": name, "description": desc} for name, desc in self.subagents.items()],
+            "tool_calls": [{"index": index, "name": name} for index, name in sorted(self.tool_calls.items())],
+        }
+
+
+# ==============================================================================
+# Per-thread event log
+# ==============================================================================
+
+class SSEEventLog:
+    """Bounded, append-only log of one thread's SSE events.
+
+    With a `spill_path`, events pushed out of the ring buffer are appended to
+    a jsonl file through one open handle, `spill_batch` lines at a time.
+    """
+
+    def __init__(
+        self,
+        thread_id: str,
+        maxlen: int = 2000,
+        spill_path: Optional[str] = None,
+        start_id: int = 0,
+        snapshot: Optional[ThreadSnapshot] = None,
+        spill_batch: int = 256,
+    ):
+        self.thread_id = thread_id
+        self.buffer: deque = deque(maxlen=maxlen)
+        self.spill_path = spill_path
+        self.spill_batch = spill_batch
+        self.start_id = start_id
+        self.last_id = start_id
+        self.closed = False
+        self.closed_at: Optional[float] = None
+        self.snapshot = snapshot or ThreadSnapshot(thread_id)
+        self.observers = 0
+        self._changed = asyncio.Condition()
+        self._spill_pending: List[str] = []
+        self._spill_file = None
+
+    @property
+    def first_buffered_id(self) -> int:
+        return self.buffer[0][0] if self.buffer else self.last_id + 1
+
+    async def append(self, event_type: str, data: Any) -> int:
+        self.last_id += 1
+        event: SSEEvent = (self.last_id, event_type, data)
+        if self.spill_path and len(self.buffer) == self.buffer.maxlen:
+            event_id, evicted_type, evicted_data = self.buffer[0]
+            self._spill_pending.append(
+                dumps({"id": event_id, "event": evicted_type, "data": evicted_data}).decode("utf-8") + "\n"
+            )
+            if len(self._spill_pending) >= self.spill_batch:
+                self.flush_spill()
+        self.buffer.append(event)
+        self.snapshot.apply(event_type, data)
+        async with self._changed:
+            self._changed.notify_all()
+        return self.last_id
+
+    def flush_spill(self) -> None:
+        if not self._spill_pending:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+        self._spill_file.write("".join(self._spill_pending))
+        self._spill_file.flush()
+        self._spill_pending.clear()
+
+    async def close(self) -> None:
+        self.closed = True
+        self.closed_at = time.monotonic()
+        if self.spill_path:
+            self.flush_spill()
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+        async with self._changed:
+            self._changed.notify_all()
+
+    def discard(self) -> None:
+        """Drop the spill file (the log is no longer served)."""
+        self._spill_pending.clear()
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        if self.spill_path and os.path.exists(self.spill_path):
+            os.remove(self.spill_path)
+
+    def _spilled_between(self, after_id: int, before_id: int) -> Iterator[SSEEvent]:
+        self.flush_spill()
+        with open(self.spill_path, encoding="utf-8") as f:
+            for line in f:
+                record = loads(line)
+                if after_id < record["id"] < before_id:
+                    yield record["id"], record["event"], record["data"]
+
+    def events_after(self, after_id: int) -> Optional[List[SSEEvent]]:
+        """Events with id > `after_id`, or None when they are no longer available."""
+        first = self.first_buffered_id
+        if after_id + 1 >= first:
+            return [event for event in self.buffer if event[0] > after_id]
+        if self.spill_path and (self._spill_pending or os.path.exists(self.spill_path)):
+            return list(self._spilled_between(after_id, first)) + list(self.buffer)
+        return None
+
+    async def wait_for(self, after_id: int, timeout: Optional[float] = None) -> bool:
+        """Wait until an event newer than `after_id` exists or the log closes."""
+        async with self._changed:
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.last_id > after_id or self.closed), timeout
+                )
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+
+# ==============================================================================
+# Detached runs
+# ==============================================================================
+
+class SSERunRegistry:
+    """Run agents detached from client connections and serve resumable SSE."""
+
+    def __init__(
+        self,
+        buffer_size: int = 2000,
+        spill_dir: Optional[str] = None,
+        heartbeat_interval: float = 15.0,
+        stream_mode: Tuple[str, ...] = ("messages", "updates", "custom"),
+        observer_max_lag: Optional[int] = None,
+        finished_ttl: float = 600.0,
+    ):
+        self.buffer_size = buffer_size
+        self.finished_ttl = finished_ttl
+        self.spill_dir = spill_dir
+        self.heartbeat_interval = heartbeat_interval
+        self.observer_max_lag = observer_max_lag
+        self.stream_mode = list(stream_mode)
+        self._logs: Dict[str, SSEEventLog] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def is_running(self, thread_id: str) -> bool:
+        task = self._tasks.get(thread_id)
+        return task is not None and not task.done()
+
+    def get_log(self, thread_id: str) -> Optional[SSEEventLog]:
+        return self._logs.get(thread_id)
+
+    def observer_count(self, thread_id: str) -> int:
+        log = self._logs.get(thread_id)
+        return log.observers if log else 0
+
+    def start(self, thread_id: str, agent, inputs: Any, config: Optional[Dict[str, Any]] = None) -> SSEEventLog:
+        """Start a run for `thread_id`. Raises RuntimeError if one is already running."""
+        if self.is_running(thread_id):
+            raise RuntimeError(f"Thread {thread_id} already has a running stream")
+        previous = self._logs.get(thread_id)
+        # ids keep increasing across runs of the same thread so a stale
+        # Last-Event-ID never matches an event of the new run; a thread whose
+        # log was evicted starts from the clock for the same reason
+        start_id = max(previous.last_id if previous else 0, int(time.time() * 1000))
+        spill_path = None
+        if self.spill_dir:
+            # one spill file per run: the previous run's file goes with its
+            # log, so a thread's spill never outgrows a single run
+            spill_path = os.path.join(self.spill_dir, f"{thread_id}.{start_id}.jsonl")
+            if previous is None:
+                for stale in glob.glob(os.path.join(self.spill_dir, f"{glob.escape(thread_id)}.*.jsonl")):
+                    os.remove(stale)
+            elif not previous.observers:
+                previous.discard()
+        log = SSEEventLog(
+            thread_id,
+            maxlen=self.buffer_size,
+            spill_path=spill_path,
+            start_id=start_id,
+            snapshot=ThreadSnapshot(thread_id, previous.snapshot if previous else None),
+        )
+        self._logs[thread_id] = log
+        self._tasks[thread_id] = asyncio.ensure_future(self._run(log, agent, inputs, config))
+        return log
+
+    async def _run(self, log: SSEEventLog, agent, inputs: Any, config: Optional[Dict[str, Any]]) -> None:
+        try:
+            async for stream_type, data in agent.astream(inputs, config=config, stream_mode=self.stream_mode):
+                serialized = serialize_stream_chunk(stream_type, data)
+                if serialized is not None:
+                    await log.append(*serialized)
+            await log.append("done", {})
+        except asyncio.CancelledError:
+            await log.append("stop", {"reason": "interrupted"})
+        except Exception as e:
+            await log.append("error", {"error": str(e)})
+        finally:
+            await log.close()
+            asyncio.get_running_loop().call_later(self.finished_ttl, self._evict, log)
+
+    def _evict(self, log: SSEEventLog) -> None:
+        """Forget a finished run `finished_ttl` seconds after it ended."""
+        if log.observers:
+            # still being replayed, look again later
+            asyncio.get_running_loop().call_later(self.finished_ttl, self._evict, log)
+            return
+        if self._logs.get(log.thread_id) is log:
+            del self._logs[log.thread_id]
+            self._tasks.pop(log.thread_id, None)
+        # a log superseded by a newer run still owns its spill file
+        log.discard()
+
+    async def stop(self, thread_id: str) -> bool:
+        task = self._tasks.get(thread_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        return True
+
+    async def subscribe(
+        self,
+        thread_id: str,
+        last_event_id: Optional[Any] = None,
+        snapshot: bool = False,
+    ) -> AsyncIterator[str]:
+        """Yield SSE frames after `last_event_id`, following the run until it ends.
+
+        With `snapshot=True` an observer without `last_event_id` starts from a
+        `snapshot` event instead of replaying the run, and gaps (evicted or
+        too far behind) are bridged with a snapshot instead of `resync`.
+        """
+        log = self._logs.get(thread_id)
+        if log is None:
+            yield format_sse(None, "error", {"error": f"No stream for thread {thread_id}"})
+            return
+        try:
+            cursor = int(last_event_id) if last_event_id not in (None, "") else None
+        except (TypeError, ValueError):
+            cursor = None
+        # counted from the first frame on, so the log is not evicted while
+        # an observer holds its snapshot
+        log.observers += 1
+        try:
+            if cursor is None:
+                cursor = log.start_id
+                if snapshot:
+                    yield format_sse(log.last_id, "snapshot", log.snapshot.to_dict())
+                    cursor = log.last_id
+            while True:
+                lagging = (
+                    snapshot and self.observer_max_lag is not None and log.last_id - cursor > self.observer_max_lag
+                )
+                events = None if lagging else log.events_after(cursor)
+                if events is None:
+                    if snapshot:
+                        yield format_sse(log.last_id, "snapshot", log.snapshot.to_dict())
+                        cursor = log.last_id
+                    else:
+                        yield format_sse(log.last_id, "resync", {"thread_id": thread_id})
+                        cursor = log.first_buffered_id - 1
+                    continue
+                for event_id, event_type, data in events:
+                    yield format_sse(event_id, event_type, data)
+                    cursor = event_id
+                if log.closed and cursor >= log.last_id:
+                    return
+                if not await log.wait_for(cursor, timeout=self.heartbeat_interval):
+                    # comment frame keeps proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+        finally:
+            log.observers -= 1
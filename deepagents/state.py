@@ -3,6 +3,8 @@ from typing import NotRequired, Annotated
 from typing import Literal
 from typing import Any, List
 from typing_extensions import TypedDict
+from deepagents.usage import usage_reducer
+from deepagents.interrupt import approvals_reducer
 
 
 class Todo(TypedDict):
@@ -28,3 +30,7 @@ def file_reducer(l, r):
 class DeepAgentState(AgentState):
     todos: NotRequired[list[Todo]]
     files: Annotated[NotRequired[dict[str, List[Any]]], file_reducer]
+    # token/cost totals, see deepagents/usage.py
+    usage: Annotated[NotRequired[dict[str, Any]], usage_reducer]
+    # remembered approval rules and statistics, see deepagents/interrupt.py
+    approvals: Annotated[NotRequired[dict[str, Any]], approvals_reducer]
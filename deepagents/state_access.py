@@ -0,0 +1,327 @@
+"""Partial reads of a thread's state for history panels.
+
+`agent.get_state(config)` revives the whole checkpoint: every message object
+and every version of every file, only to render the last page of a
+conversation. `ThreadStateReader` reads one channel of the latest (or a
+given) checkpoint straight from the checkpointer:
+
+    reader = ThreadStateReader(checkpointer)
+    page = await reader.aget_messages(thread_id, limit=50)            # tail page
+    older = await reader.aget_messages(thread_id, limit=50, before=page["start"])
+    index = await reader.aget_files_index(thread_id)                  # no contents
+    content = await reader.aget_file_content(thread_id, "/report.md")
+
+With `CompactDeepAgentSerializer` the checkpoint is only decoded to its
+encoded tree; messages outside the requested page, file contents and the
+other channels are never revived, and with `OptimizedMongoDBSaver` GridFS
+values of other channels are not even fetched. Supported storage: the
+sqlite savers, the Mongo savers and `TieredCheckpointSaver` (threads in
+its hot tier are read from memory). Any other checkpointer or serde falls
+back to `aget_tuple`, so results are the same, only slower.
+
+Decoded checkpoints are kept in a small LRU keyed by checkpoint id, so
+paging through a thread decodes it once.
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from deepagents.serde import LIST, STR, CompactDeepAgentSerializer, CompactDocument
+
+_BY_ID_SQL = (
+    "SELECT checkpoint_id, type, checkpoint FROM checkpoints "
+    "WHERE thread_id = ? AND checkpoint_ns = '' AND checkpoint_id = ?"
+)
+_LATEST_ID_SQL = (
+    "SELECT checkpoint_id FROM checkpoints "
+    "WHERE thread_id = ? AND checkpoint_ns = '' ORDER BY checkpoint_id DESC LIMIT 1"
+)
+
+
+class CheckpointView(abc.ABC):
+    """Channels of one checkpoint, revived on demand."""
+
+    def __init__(self, checkpoint_id: Optional[str]):
+        self.checkpoint_id = checkpoint_id
+
+    @abc.abstractmethod
+    def channel(self, name: str) -> Any:
+        ...
+
+    def message_count(self) -> int:
+        return len(self.channel("messages") or [])
+
+    def message_slice(self, start: int, end: int) -> List[Any]:
+        return list((self.channel("messages") or [])[start:end])
+
+    def files_index(self) -> Dict[str, Dict[str, int]]:
+        return {
+            path: {"entries": len(entries), "chars": sum(len(entry) for entry in entries)}
+            for path, entries in (self.channel("files") or {}).items()
+        }
+
+    def file_entries(self, path: str) -> Optional[List[str]]:
+        return (self.channel("files") or {}).get(path)
+
+
+class ValuesView(CheckpointView):
+    """View over already revived channel values (fallback path)."""
+
+    def __init__(self, checkpoint_id: Optional[str], channel_values: Dict[str, Any]):
+        super().__init__(checkpoint_id)
+        self.channel_values = channel_values
+
+    def channel(self, name):
+        return self.channel_values.get(name)
+
+
+class CompactView(CheckpointView):
+    """View over a `CompactDocument`; lists and dicts are sliced before reviving."""
+
+    def __init__(self, checkpoint_id: Optional[str], document: CompactDocument, resolve_ref: Any = None):
+        super().__init__(checkpoint_id)
+        self.document = document
+        self.resolve_ref = resolve_ref
+        self._resolved: Dict[str, Tuple[CompactDocument, Any]] = {}
+
+    def _node(self, name: str) -> Tuple[CompactDocument, Any]:
+        if name in self._resolved:
+            return self._resolved[name]
+        document, node = self.document, self.document.get("channel_values", name)
+        # channel offloaded to GridFS by OptimizedMongoDBSaver
+        if isinstance(node, dict) and "__gridfs__" in node and self.resolve_ref is not None:
+            ref = document.revive(node)
+            document, node = self.resolve_ref(ref)
+        self._resolved[name] = (document, node)
+        return document, node
+
+    def channel(self, name):
+        document, node = self._node(name)
+        return None if node is None else document.revive(node)
+
+    def _list_items(self, name: str) -> Tuple[CompactDocument, List[Any]]:
+        document, node = self._node(name)
+        if isinstance(node, list) and node and node[0] == LIST:
+            return document, node[1:]
+        return document, []
+
+    def message_count(self):
+        return len(self._list_items("messages")[1])
+
+    def message_slice(self, start, end):
+        document, items = self._list_items("messages")
+        return [document.revive(item) for item in items[start:end]]
+
+    def _string_length(self, document: CompactDocument, node: Any) -> int:
+        if isinstance(node, str):
+            return len(node)
+        if isinstance(node, list) and len(node) == 2 and node[0] == STR:
+            return len(document.strings[node[1]])
+        return 0
+
+    def files_index(self):
+        document, node = self._node("files")
+        if not isinstance(node, dict):
+            return {}
+        index = {}
+        for path, entries in node.items():
+            items = entries[1:] if isinstance(entries, list) and entries and entries[0] == LIST else []
+            index[path] = {
+                "entries": len(items),
+                "chars": sum(self._string_length(document, item) for item in items),
+            }
+        return index
+
+    def file_entries(self, path):
+        document, node = self._node("files")
+        if not isinstance(node, dict) or path not in node:
+            return None
+        return document.revive(node[path])
+
+
+def _compact_serde(serde: Any) -> Optional[CompactDeepAgentSerializer]:
+    serde = getattr(serde, "inner", serde)
+    return serde if isinstance(serde, CompactDeepAgentSerializer) else None
+
+
+class ThreadStateReader:
+    """Single-channel, paginated reads of the root namespace of a thread."""
+
+    def __init__(self, checkpointer: Any, cache_size: int = 8):
+        self.checkpointer = checkpointer
+        self.cache_size = cache_size
+        self._views: "OrderedDict[Tuple[str, str], CheckpointView]" = OrderedDict()
+
+    # -- loading ------------------------------------------------------------
+
+    def _view_from_blob(self, saver: Any, checkpoint_id: str, type_: str, blob: bytes) -> CheckpointView:
+        serde = saver.serde
+        compact = _compact_serde(serde)
+        if compact is not None and "|gridfs-blob:" not in type_:
+            # drop the GridFS digest list OptimizedMongoDBSaver appends to the type
+            document = compact.loads_document((type_.split("|", 1)[0], blob))
+            if document is not None:
+                return CompactView(checkpoint_id, document, self._ref_resolver(serde, compact))
+        checkpoint = serde.loads_typed((type_, blob))
+        return ValuesView(checkpoint_id, checkpoint.get("channel_values", {}))
+
+    @staticmethod
+    def _ref_resolver(serde: Any, compact: CompactDeepAgentSerializer) -> Any:
+        if not hasattr(serde, "fs"):
+            return None
+
+        def resolve(ref: Dict[str, str]) -> Tuple[CompactDocument, Any]:
+            data = serde.fs.get_last_version(ref["__gridfs__"]).read()
+            document = compact.loads_document((ref["type"], data))
+            if document is None:
+                # written by the fallback serde (None/bytes); re-encode the value
+                value = compact.loads_typed((ref["type"], data))
+                document = compact.loads_document(compact.dumps_typed({"value": value}))
+                return document, document.get("value")
+            return document, document.root
+
+        return resolve
+
+    async def _sqlite_rows(self, saver: Any, sql: str, params: Tuple) -> List[Tuple]:
+        await saver.setup()
+        if hasattr(saver, "_reader"):
+            if str(params[0]) in getattr(saver, "_pending_threads", ()):
+                await saver.flush()
+            async with saver._reader() as reader:
+                return list(await reader.conn.execute_fetchall(sql, params))
+        async with saver.lock:
+            return list(await saver.conn.execute_fetchall(sql, params))
+
+    async def _load_sqlite(self, saver: Any, thread_id: str, checkpoint_id: Optional[str]) -> Optional[CheckpointView]:
+        if checkpoint_id is None:
+            rows = await self._sqlite_rows(saver, _LATEST_ID_SQL, (thread_id,))
+            if not rows:
+                return None
+            checkpoint_id = rows[0][0]
+        cached = self._cached(thread_id, checkpoint_id)
+        if cached is not None:
+            return cached
+        rows = await self._sqlite_rows(saver, _BY_ID_SQL, (thread_id, checkpoint_id))
+        if not rows:
+            return None
+        _id, type_, blob = rows[0]
+        return self._store(thread_id, self._view_from_blob(saver, checkpoint_id, type_, bytes(blob)))
+
+    async def _load_mongo(self, saver: Any, thread_id: str, checkpoint_id: Optional[str]) -> Optional[CheckpointView]:
+        query = {"thread_id": thread_id, "checkpoint_ns": ""}
+        if checkpoint_id is not None:
+            query["checkpoint_id"] = checkpoint_id
+
+        def find(projection):
+            return saver.checkpoint_collection.find_one(
+                query, {"_id": 0, "checkpoint_id": 1, **projection}, sort=[("checkpoint_id", -1)]
+            )
+
+        latest = await asyncio.to_thread(find, {})
+        if latest is None:
+            return None
+        cached = self._cached(thread_id, latest["checkpoint_id"])
+        if cached is not None:
+            return cached
+        query["checkpoint_id"] = latest["checkpoint_id"]
+        doc = await asyncio.to_thread(find, {"type": 1, "checkpoint": 1})
+        if doc is None:
+            return None
+        view = await asyncio.to_thread(
+            self._view_from_blob, saver, doc["checkpoint_id"], doc["type"], bytes(doc["checkpoint"])
+        )
+        return self._store(thread_id, view)
+
+    async def _load_tuple(self, saver: Any, thread_id: str, checkpoint_id: Optional[str]) -> Optional[CheckpointView]:
+        configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+        if checkpoint_id is not None:
+            configurable["checkpoint_id"] = checkpoint_id
+        tuple_ = await saver.aget_tuple({"configurable": configurable})
+        if tuple_ is None:
+            return None
+        return ValuesView(tuple_.config["configurable"].get("checkpoint_id"), tuple_.checkpoint.get("channel_values", {}))
+
+    async def aload_view(self, thread_id: str, checkpoint_id: Optional[str] = None) -> Optional[CheckpointView]:
+        """View of the latest (or given) root checkpoint of `thread_id`, or None."""
+        saver = self.checkpointer
+        thread_id = str(thread_id)
+        if hasattr(saver, "durable") and hasattr(saver, "hot"):
+            # tiered: the hot tier has the freshest state, already in memory
+            if thread_id in saver.hot.storage or thread_id in saver._queues:
+                ids = saver.hot.storage.get(thread_id, {}).get("", {})
+                latest_id = checkpoint_id or (max(ids) if ids else None)
+                cached = self._cached(thread_id, latest_id) if latest_id else None
+                if cached is not None:
+                    return cached
+                view = await self._load_tuple(saver, thread_id, checkpoint_id)
+                return None if view is None else self._store(thread_id, view)
+            saver = saver.durable
+        if hasattr(saver, "checkpoint_collection"):
+            return await self._load_mongo(saver, thread_id, checkpoint_id)
+        if hasattr(saver, "conn") and hasattr(saver, "setup"):
+            return await self._load_sqlite(saver, thread_id, checkpoint_id)
+        return await self._load_tuple(saver, thread_id, checkpoint_id)
+
+    def _cached(self, thread_id: str, checkpoint_id: str) -> Optional[CheckpointView]:
+        view = self._views.get((thread_id, checkpoint_id))
+        if view is not None:
+            self._views.move_to_end((thread_id, checkpoint_id))
+        return view
+
+    def _store(self, thread_id: str, view: CheckpointView) -> CheckpointView:
+        self._views[(thread_id, view.checkpoint_id)] = view
+        while len(self._views) > self.cache_size:
+            self._views.popitem(last=False)
+        return view
+
+    # -- reads ----------------------------------------------------------------
+
+    async def aget_channel(self, thread_id: str, channel: str, checkpoint_id: Optional[str] = None) -> Any:
+        view = await self.aload_view(thread_id, checkpoint_id)
+        return None if view is None else view.channel(channel)
+
+    async def aget_messages(
+        self,
+        thread_id: str,
+        limit: int = 50,
+        before: Optional[int] = None,
+        checkpoint_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Up to `limit` messages ending before index `before` (default: the tail).
+
+        Returns `{"messages", "start", "total", "has_more", "checkpoint_id"}`;
+        pass `start` as `before` to get the previous page.
+        """
+        view = await self.aload_view(thread_id, checkpoint_id)
+        if view is None:
+            return {"messages": [], "start": 0, "total": 0, "has_more": False, "checkpoint_id": None}
+        total = view.message_count()
+        end = total if before is None else max(0, min(before, total))
+        start = max(0, end - limit)
+        return {
+            "messages": view.message_slice(start, end),
+            "start": start,
+            "total": total,
+            "has_more": start > 0,
+            "checkpoint_id": view.checkpoint_id,
+        }
+
+    async def aget_files_index(self, thread_id: str, checkpoint_id: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """`{path: {"entries", "chars"}}` without reviving any file content."""
+        view = await self.aload_view(thread_id, checkpoint_id)
+        return {} if view is None else view.files_index()
+
+    async def aget_file_content(
+        self, thread_id: str, path: str, checkpoint_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Content of one file, joined the way `read_file_content` does."""
+        view = await self.aload_view(thread_id, checkpoint_id)
+        entries = None if view is None else view.file_entries(path)
+        return None if entries is None else "\n".join(entries)
+
+    async def aget_todos(self, thread_id: str, checkpoint_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return (await self.aget_channel(thread_id, "todos", checkpoint_id)) or []
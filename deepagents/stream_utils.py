@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import json
 from typing import Any, Callable, Dict, Optional
 
+from langchain_core.messages import BaseMessageChunk
+
+from deepagents.tool_args import append_tool_call_piece, new_tool_call_buffer, tool_call_args, tool_call_pieces
+
 
 # UI visibility config shared between main and sub-agents
 UI_VISIBILITY: Dict[str, Any] = {
@@ -13,28 +18,92 @@ UI_VISIBILITY: Dict[str, Any] = {
     },
     "show_todos_updates": True,
     "show_file_updates": True,
+    "show_usage": False,
+    "show_tool_progress": False,
 }
 
 
-def init_stream_state() -> Dict[str, Any]:
+def init_stream_state(cumulative: Optional[bool] = None) -> Dict[str, Any]:
+    """Per-agent render state. `cumulative` fixes the provider's chunk mode; None detects it."""
     return {
-        "buffered_text": "",
-        "tool_call_chunks": {},  # idx -> {name, args}
+        "text_parts": [],  # rendered text of the current message, joined lazily
+        "message_id": None,
+        "cumulative": cumulative,  # provider resends the whole content per chunk
+        "detected": None,  # per message: None, "cumulative" or "deltas" when cumulative is None
+        "tool_call_chunks": {},  # idx -> {name, args, id, source, parser}
         "printed_tool_calls": set(),
         "last_files_snapshot": None,
     }
 
 
+def _buffered_text(state: Dict[str, Any]) -> str:
+    parts = state["text_parts"]
+    if len(parts) > 1:
+        parts[:] = ["".join(parts)]
+    return parts[0] if parts else ""
+
+
 def _print_delta_text(current: str, state: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
-    buffered_text: str = state["buffered_text"]
-    max_lcp = min(len(buffered_text), len(current))
-    i = 0
-    while i < max_lcp and buffered_text[i] == current[i]:
-        i += 1
+    """Fallback for providers that resend the cumulative content on every chunk."""
+    buffered_text = _buffered_text(state)
+    if current.startswith(buffered_text):
+        i = len(buffered_text)
+    else:
+        max_lcp = min(len(buffered_text), len(current))
+        i = 0
+        while i < max_lcp and buffered_text[i] == current[i]:
+            i += 1
     delta = current[i:]
     if delta:
         print_fn(delta)
-    state["buffered_text"] = current
+    state["text_parts"] = [current]
+
+
+def render_text_chunk(message_chunk: Any, state: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
+    """Print the new text carried by `message_chunk`.
+
+    `AIMessageChunk`s from `stream_mode="messages"` normally carry true
+    deltas, which are printed and appended as-is (linear in the answer
+    length). Unless the state fixes the mode, every chunk is checked: one that
+    starts with all the text rendered so far and is longer is a cumulative
+    resend and only its suffix is printed; the first chunk that does not is
+    proof of a delta stream, and the rest of the message is appended as-is.
+    Whole messages go through the longest-common-prefix fallback.
+    """
+    content = message_chunk.content
+    current = content if isinstance(content, str) else str(content)
+    message_id = getattr(message_chunk, "id", None)
+    if message_id != state["message_id"]:
+        state["message_id"] = message_id
+        state["text_parts"] = []
+        state["detected"] = None
+    if not current:
+        return
+
+    if not isinstance(message_chunk, BaseMessageChunk) or state["cumulative"]:
+        _print_delta_text(current, state, print_fn)
+        return
+
+    parts = state["text_parts"]
+    if state["cumulative"] is None and parts and state["detected"] != "deltas":
+        buffered = _buffered_text(state)
+        if len(current) > len(buffered) and current.startswith(buffered):
+            print_fn(current[len(buffered):])
+            state["text_parts"] = [current]
+            state["detected"] = "cumulative"
+            return
+        if current == buffered and state["detected"] == "cumulative":
+            # resend without new text
+            return
+        state["detected"] = "deltas"
+
+    print_fn(current)
+    parts.append(current)
+
+
+def _preview(value: Any, limit: int = 200) -> str:
+    text = value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+    return text if len(text) <= limit else text[:limit] + "..."
 
 
 def handle_messages_chunk(message_chunk: Any, state: Dict[str, Any], ui: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
@@ -43,43 +112,39 @@ def handle_messages_chunk(message_chunk: Any, state: Dict[str, Any], ui: Dict[st
             # Skip printing tool message content
             pass
         else:
-            _print_delta_text(str(message_chunk.content), state, lambda s: print_fn(s, end="", flush=True))
-
-    addkw = getattr(message_chunk, "additional_kwargs", {}) or {}
-
-    # Assemble partial tool_call chunks by index
-    for chunk_tc in (addkw.get("tool_call_chunks") or []):
-        idx = chunk_tc.get("index", 0)
-        buf = state["tool_call_chunks"].setdefault(idx, {"name": None, "args": ""})
-        if chunk_tc.get("name"):
-            buf["name"] = chunk_tc["name"]
-        if chunk_tc.get("args"):
-            buf["args"] += chunk_tc["args"]
-
-    # Also accumulate from tool_calls entries which may stream partials via arguments/name
-    for tc in (addkw.get("tool_calls") or []):
-        idx = tc.get("index", 0)
-        func = tc.get("function") or {}
-        name = func.get("name") or tc.get("name")
-        args = func.get("arguments") or tc.get("args")
-        buf = state["tool_call_chunks"].setdefault(idx, {"name": None, "args": ""})
-        if name:
+            render_text_chunk(message_chunk, state, lambda s: print_fn(s, end="", flush=True))
+
+    # Assemble partial tool calls by index; complete top-level arguments are
+    # printed as soon as they finish streaming, long values truncated
+    for idx, _tool_call_id, name, args, source in tool_call_pieces(message_chunk):
+        buf = state["tool_call_chunks"].get(idx)
+        if buf is None:
+            buf = state["tool_call_chunks"][idx] = new_tool_call_buffer()
+        if name and not buf["name"]:
             buf["name"] = name
-        if args:
-            buf["args"] += args
+            if name not in ui["hide_tool_calls_for"]:
+                print_fn(f"\n🔧 调用工具: {name}")
+        args = append_tool_call_piece(buf, args, source) if args else ""
+        if not args or buf["name"] in ui["hide_tool_calls_for"]:
+            continue
+        for kind, key, value, truncated in buf["parser"].feed(args):
+            if kind == "field":
+                shown = "..." if truncated else _preview(value)
+                print_fn(f"   {key}: {shown}")
 
-    # If model indicates tool_calls finish, flush assembled chunked calls (respect visibility config)
+    # If model indicates tool_calls finish, flush calls whose arguments could
+    # not be parsed incrementally (respect visibility config)
     finish_reason = getattr(message_chunk, "response_metadata", {}).get("finish_reason")
     if finish_reason in ("tool_calls", "stop"):
         for idx in sorted(state["tool_call_chunks"].keys()):
             buf = state["tool_call_chunks"][idx]
             if buf.get("name") and buf.get("args"):
-                if buf["name"] in ui["hide_tool_calls_for"]:
+                if buf["name"] in ui["hide_tool_calls_for"] or buf["parser"].done:
                     continue
-                sig = f"{buf['name']}|{buf['args']}"
+                args = tool_call_args(buf)
+                sig = f"{buf['name']}|{args}"
                 if sig not in state["printed_tool_calls"]:
-                    print_fn(f"\n🔧 调用工具: {buf['name']}")
-                    print_fn(f"   参数: {buf['args']}")
+                    print_fn(f"   参数: {args}")
                     state["printed_tool_calls"].add(sig)
         state["tool_call_chunks"].clear()
 
@@ -128,6 +193,26 @@ def handle_updates_chunk(data: Any, state: Dict[str, Any], ui: Dict[str, Any], p
         print_fn(str(data))
 
 
+def handle_usage_event(event: Dict[str, Any], ui: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
+    if event.get("budget_exceeded"):
+        print_fn(f"\n⛔ 预算已用尽: {event['budget_exceeded']}")
+        return
+    if not ui.get("show_usage"):
+        return
+    delta = event.get("delta") or {}
+    scope = event.get("name") or event.get("scope", "main")
+    print_fn(f"\n💰 [{scope}] tokens +{delta.get('total_tokens', 0)} (in {delta.get('input_tokens', 0)} / out {delta.get('output_tokens', 0)})")
+
+
+def handle_approvals_event(event: Dict[str, Any], ui: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
+    skipped = event.get("auto_approved", 0) + event.get("remembered", 0)
+    if skipped:
+        removed = event.get("human_wait_removed_seconds", 0)
+        print_fn(f"\n✅ 已自动批准 {skipped} 个工具调用" + (f"（约节省等待 {removed:.1f}s）" if removed else ""))
+    if event.get("interrupts"):
+        print_fn(f"\n⏱️ 人工审批等待 {event.get('human_wait_seconds', 0):.1f}s")
+
+
 def handle_subagent_event(
     event: Dict[str, Any],
     subagent_states: Dict[str, Dict[str, Any]],
@@ -162,8 +247,11 @@ def handle_subagent_event(
         elif stream_type == "updates":
             handle_updates_chunk(data, sub_state, ui, print_fn)
         elif stream_type == "custom":
-            # For nested custom events inside sub-agent, print raw
-            print_fn(str(data))
+            if isinstance(data, dict) and "usage" in data:
+                handle_usage_event(data["usage"], ui, print_fn)
+            else:
+                # For nested custom events inside sub-agent, print raw
+                print_fn(str(data))
         return
 
     # Backward-compatibility: legacy 'content' and 'tool_call'
@@ -198,6 +286,10 @@ def process_stream_chunk(
         try:
             if isinstance(data, dict) and "subagent" in data:
                 handle_subagent_event(data["subagent"], subagent_states, ui, print_fn)
+            elif isinstance(data, dict) and "usage" in data:
+                handle_usage_event(data["usage"], ui, print_fn)
+            elif isinstance(data, dict) and "approvals" in data:
+                handle_approvals_event(data["approvals"], ui, print_fn)
             else:
                 print_fn(str(data))
         except Exception:
@@ -207,3 +299,111 @@ def process_stream_chunk(
         print_fn(str(data))
 
 
+EXIT_WORDS = ("exit", "quit", "bye")
+
+
+async def run_console(
+    agent: Any,
+    config: Dict[str, Any],
+    checkpointer: Any = None,
+    ui: Dict[str, Any] = UI_VISIBILITY,
+    read_input: Callable[[str], str] = input,
+    print_fn: Callable[[str], None] = print,
+    prompt: str = "Enter a question: ",
+) -> None:
+    """Read questions from the console and stream the agent's answers until an exit word.
+
+    `input` runs in a worker thread so the event loop keeps serving background
+    tasks (the write-behind of `TieredCheckpointSaver`) while the user types.
+    On exit `checkpointer` is closed, which flushes the checkpoints still
+    queued in memory.
+    """
+    import asyncio
+
+    try:
+        while True:
+            user_input = await asyncio.to_thread(read_input, prompt)
+            if user_input.lower() in EXIT_WORDS:
+                break
+
+            main_state = init_stream_state()
+            subagent_states: Dict[str, Dict[str, Any]] = {}
+            async for stream_type, data in agent.astream(
+                {"messages": user_input},
+                config=config,
+                stream_mode=["messages", "updates", "custom"],
+            ):
+                process_stream_chunk(
+                    stream_type=stream_type,
+                    data=data,
+                    main_state=main_state,
+                    subagent_states=subagent_states,
+                    ui=ui,
+                    print_fn=print_fn,
+                )
+    finally:
+        if checkpointer is not None and hasattr(checkpointer, "aclose"):
+            await checkpointer.aclose()
+
+
+
+
+def _legacy_print_delta_text(current: str, state: Dict[str, Any], print_fn: Callable[[str], None]) -> None:
+    """The per-chunk longest-common-prefix diff used before `render_text_chunk`, kept for the benchmark."""
+    buffered_text = state["buffered_text"]
+    max_lcp = min(len(buffered_text), len(current))
+    i = 0
+    while i < max_lcp and buffered_text[i] == current[i]:
+        i += 1
+    delta = current[i:]
+    if delta:
+        print_fn(delta)
+    state["buffered_text"] = current
+
+
+def benchmark(chars: int = 100_000, chunk_chars: int = 4) -> Dict[str, float]:
+    """Seconds to render a `chars`-long answer streamed in `chunk_chars` pieces.
+
+    `deltas` is a provider sending true deltas, `cumulative` one resending the
+    whole content per chunk; `legacy_cumulative` is the old character-by-character
+    prefix diff on the same input (quadratic, so it runs on a tenth of the text
+    and is scaled by 100).
+    """
+    import time
+
+    from langchain_core.messages import AIMessageChunk
+
+    text = ("流式输出的回答 streamed answer text. " * (chars // 20 + 1))[:chars]
+
+    def run(render, chunks) -> float:
+        state = init_stream_state()
+        state["buffered_text"] = ""
+        elapsed = 0.0
+        # chunks are built lazily (the cumulative ones would not fit in memory
+        # all at once) and only the rendering is timed
+        for piece in chunks:
+            started = time.perf_counter()
+            render(piece, state, lambda s: None)
+            elapsed += time.perf_counter() - started
+        return elapsed
+
+    def deltas(length: int):
+        return (AIMessageChunk(content=text[i:i + chunk_chars], id="m") for i in range(0, length, chunk_chars))
+
+    def cumulative(length: int):
+        return (AIMessageChunk(content=text[:i + chunk_chars], id="m") for i in range(0, length, chunk_chars))
+
+    legacy_chars = chars // 10
+    return {
+        "deltas": run(render_text_chunk, deltas(chars)),
+        "cumulative": run(render_text_chunk, cumulative(chars)),
+        "legacy_cumulative": 100 * run(
+            lambda piece, state, print_fn: _legacy_print_delta_text(piece.content, state, print_fn),
+            cumulative(legacy_chars),
+        ),
+    }
+
+
+if __name__ == "__main__":
+    for name, seconds in benchmark().items():
+        print(f"{name:20s} {seconds * 1000:>12,.1f} ms per 100,000-char answer")
@@ -16,6 +16,8 @@ from deepagents.prompts import (
 
 from langgraph.prebuilt import InjectedState
 from deepagents.utils import create_node_llm
+from deepagents.usage import create_usage_hook, usage_delta, budget_exceeded
+from deepagents.tool_journal import JournaledTool, journal_tools
 from langgraph.config import get_stream_writer
 import json
 from langgraph.checkpoint.memory import InMemorySaver
@@ -36,13 +38,22 @@ def _create_task_tool(
     subagents: list[SubAgent], 
     subagent_tools: Sequence[Union[BaseTool, Callable, dict[str, Any]]],
     model, state_schema,
-    checkpointer=None
+    checkpointer=None,
+    usage_budget=None,
+    model_prices=None,
+    tool_journal=None,
     ):
+    # a resumed subagent issues new tool call ids: key its journal entries by call arguments
+    tools = [
+        journal_tools([tool_], tool_journal, key_by_args=True)[0] if isinstance(tool_, JournaledTool) else tool_
+        for tool_ in tools
+    ]
     agents = {
         "general-purpose": create_react_agent(model, prompt=instructions, tools=tools, checkpointer=False)
     }
     tools_by_name = {}
-    all_tools = tools + subagent_tools # add subagent tools to the tools
+    # subagent tools are the slow, side-effecting ones (e.g. cnki_search)
+    all_tools = tools + journal_tools(subagent_tools, tool_journal, key_by_args=True) # add subagent tools to the tools
     for tool_ in all_tools:
         if not isinstance(tool_, BaseTool):
             tool_ = tool(tool_)
@@ -69,9 +80,15 @@ def _create_task_tool(
             FILE_INSTRUCTION_SUFFIX.format(read_permissions=_agent["read_permissions"], write_permissions=_agent["write_permissions"])
         if checkpointer is None:
             checkpointer = InMemorySaver()
+        # enforces the thread budget inside long subagent runs
+        usage_hook = (
+            create_usage_hook(usage_budget, model_prices, scope="subagent", name=_agent["name"])
+            if usage_budget else None
+        )
         agents[_agent["name"]] = create_react_agent(
             sub_model, prompt=_agent_prompt, 
-            tools=_tools, state_schema=state_schema, checkpointer=checkpointer
+            tools=_tools, state_schema=state_schema, checkpointer=checkpointer,
+            post_model_hook=usage_hook,
         )
 
     other_agents_string = [
@@ -90,6 +107,15 @@ def _create_task_tool(
     ):
         if subagent_type not in agents:
             return f"Error: invoked agent of type {subagent_type}, the only allowed types are {[f'`{k}`' for k in agents]}"
+        reason = budget_exceeded(state.get("usage"), usage_budget)
+        if reason:
+            return Command(
+                update={
+                    "messages": [
+                        ToolMessage(f"Error: subagent `{subagent_type}` not started, {reason}", tool_call_id=tool_call_id)
+                    ],
+                }
+            )
         sub_agent = agents[subagent_type]
         state["messages"] = [{"role": "user", "content": description}]
         # Emit structured custom events for streaming; main aggregates display
@@ -122,10 +148,16 @@ def _create_task_tool(
         final_state = sub_agent.get_state(sub_config)
         result = final_state.values if hasattr(final_state, 'values') else {"messages": [{"role": "assistant", "content": "子智能体任务完成"}]}
         writer({"subagent": {"type": "stop"}})
-        
+
+        # Subagent messages only contain this invocation, so their usage is the delta
+        sub_usage = usage_delta(result.get("messages", []), model_prices)
+        sub_usage["by_subagent"] = {tool_call_id: {"name": subagent_type, **sub_usage["total"]}}
+        writer({"usage": {"scope": "subagent", "name": subagent_type, "tool_call_id": tool_call_id, "delta": sub_usage["total"]}})
+
         return Command(
             update={
                 "files": result.get("files", {}),
+                "usage": sub_usage,
                 "messages": [
                     ToolMessage(
                         result["messages"][-1].content, tool_call_id=tool_call_id
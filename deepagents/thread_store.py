@@ -0,0 +1,348 @@
+"""Indexed per-user thread metadata.
+
+The v2 server keeps each user's thread list in a `user_{user_id}.json` file
+that is rewritten whole on every activity, and `message_count` is never
+updated. `ThreadStore` keeps the same metadata in a SQLite table indexed by
+`(user_id, updated_at)`, so listing stays a single index range scan however
+many threads a user has:
+
+    store = ThreadStore("threads.db")
+    store.add_thread(thread_id, "新对话", user_id="x_lab")
+    store.record_user_message(thread_id)
+    bus.add_sink(store.sink(thread_id), name="threads", policy="block")
+    page = store.list_threads("x_lab", limit=50, query="需求")
+    more = store.list_threads("x_lab", limit=50, cursor=page["next_cursor"])
+
+Counters are maintained incrementally from the typed events of the main agent
+(`message_end`, `tool_result`, `usage`, `file_delta`): each event is a single
+`UPDATE ... SET col = col + ?`, nothing is recounted from the checkpoints.
+The sink writes from a worker thread (`arecord_event`), so the commits never
+block the event loop; use `policy="block"` so no counter update is dropped.
+Pagination is keyset based (`next_cursor`), so deep pages cost the same as
+the first one. `import_json` migrates existing `user_*.json` files.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from typing_extensions import NotRequired, TypedDict
+
+from deepagents.events import StreamEvent
+
+
+DEFAULT_USER = "x_lab"
+
+THREAD_STATUSES = ("idle", "running", "interrupted", "error")
+
+
+class ThreadInfo(TypedDict):
+    thread_id: str
+    user_id: str
+    title: str
+    created_at: str
+    updated_at: str
+    last_message_at: Optional[str]
+    message_count: int
+    input_tokens: int
+    output_tokens: int
+    total_tokens: int
+    file_count: int
+    last_file: Optional[str]
+    last_file_at: Optional[str]
+    status: str
+
+
+class ThreadPage(TypedDict):
+    threads: List[ThreadInfo]
+    next_cursor: Optional[str]
+    total: NotRequired[int]
+
+
+_COLUMNS = (
+    "thread_id", "user_id", "title", "created_at", "updated_at", "last_message_at", "message_count",
+    "input_tokens", "output_tokens", "total_tokens", "file_count", "last_file", "last_file_at", "status",
+)
+_TIME_COLUMNS = ("created_at", "updated_at", "last_message_at", "last_file_at")
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS threads ("
+    "thread_id TEXT PRIMARY KEY, user_id TEXT NOT NULL, title TEXT NOT NULL DEFAULT '', "
+    "created_at REAL NOT NULL, updated_at REAL NOT NULL, last_message_at REAL, "
+    "message_count INTEGER NOT NULL DEFAULT 0, input_tokens INTEGER NOT NULL DEFAULT 0, "
+    "output_tokens INTEGER NOT NULL DEFAULT 0, total_tokens INTEGER NOT NULL DEFAULT 0, "
+    "file_count INTEGER NOT NULL DEFAULT 0, last_file TEXT, last_file_at REAL, "
+    "status TEXT NOT NULL DEFAULT 'idle')",
+    "CREATE INDEX IF NOT EXISTS threads_user_updated ON threads (user_id, updated_at DESC, thread_id DESC)",
+)
+
+
+def _iso(value: Optional[float]) -> Optional[str]:
+    return None if value is None else datetime.fromtimestamp(value).isoformat()
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _encode_cursor(updated_at: float, thread_id: str) -> str:
+    return f"{updated_at!r}|{thread_id}"
+
+
+def _decode_cursor(cursor: str) -> Tuple[float, str]:
+    updated_at, _, thread_id = cursor.partition("|")
+    try:
+        return float(updated_at), thread_id
+    except ValueError:
+        raise ValueError(f"Invalid thread cursor: {cursor!r}") from None
+
+
+def _like_pattern(query: str) -> str:
+    return "%" + re.sub(r"([\\%_])", r"\\\1", query.strip()) + "%"
+
+
+class ThreadStore:
+    """Thread metadata in an indexed SQLite table, safe to share between threads."""
+
+    def __init__(self, path: str = "threads.db", busy_timeout: float = 5.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+
+    def _write(self, sql: str, params: Iterable[Any] = ()) -> int:
+        with self._lock:
+            cursor = self._conn.execute(sql, tuple(params))
+            self._conn.commit()
+            return cursor.rowcount
+
+    def _info(self, row: Tuple[Any, ...]) -> ThreadInfo:
+        info = dict(zip(_COLUMNS, row))
+        for column in _TIME_COLUMNS:
+            info[column] = _iso(info[column])
+        return info  # type: ignore[return-value]
+
+    # --- the local_storage.py operations --------------------------------
+
+    def add_thread(self, thread_id: str, title: str = "", user_id: str = DEFAULT_USER,
+                   created_at: Optional[float] = None) -> None:
+        """Register `thread_id` for `user_id`; an existing thread keeps its counters."""
+        now = time.time() if created_at is None else created_at
+        self._write(
+            "INSERT INTO threads (thread_id, user_id, title, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(thread_id) DO UPDATE SET title = excluded.title, user_id = excluded.user_id",
+            (thread_id, user_id, title, now, now),
+        )
+
+    def update_thread_activity(self, thread_id: str, **fields: Any) -> bool:
+        """Bump `updated_at` and set the given columns (e.g. `title`, `status`)."""
+        unknown = set(fields) - {"title", "status", "last_message_at"}
+        if unknown:
+            raise ValueError(f"Cannot set thread fields: {sorted(unknown)}")
+        if "status" in fields and fields["status"] not in THREAD_STATUSES:
+            raise ValueError(f"Unknown thread status: {fields['status']}, expected one of {THREAD_STATUSES}")
+        assignments = ["updated_at = ?"] + [f"{name} = ?" for name in fields]
+        return self._write(
+            f"UPDATE threads SET {', '.join(assignments)} WHERE thread_id = ?",
+            (time.time(), *fields.values(), thread_id),
+        ) > 0
+
+    def set_status(self, thread_id: str, status: str) -> bool:
+        return self.update_thread_activity(thread_id, status=status)
+
+    def get_thread(self, thread_id: str) -> Optional[ThreadInfo]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return None if row is None else self._info(row)
+
+    def thread_belongs_to_user(self, thread_id: str, user_id: str = DEFAULT_USER) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM threads WHERE thread_id = ? AND user_id = ?", (thread_id, user_id)
+            ).fetchone()
+        return row is not None
+
+    def remove_thread(self, thread_id: str, user_id: Optional[str] = None) -> bool:
+        if user_id is None:
+            return self._write("DELETE FROM threads WHERE thread_id = ?", (thread_id,)) > 0
+        return self._write("DELETE FROM threads WHERE thread_id = ? AND user_id = ?", (thread_id, user_id)) > 0
+
+    def list_threads(
+        self,
+        user_id: str = DEFAULT_USER,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        query: Optional[str] = None,
+        status: Optional[str] = None,
+        with_total: bool = False,
+    ) -> ThreadPage:
+        """Threads of `user_id`, most recently active first.
+
+        `query` matches a substring of the title; pass the returned
+        `next_cursor` to get the following page (None on the last one).
+        """
+        where = ["user_id = ?"]
+        params: List[Any] = [user_id]
+        if query:
+            where.append("title LIKE ? ESCAPE '\\'")
+            params.append(_like_pattern(query))
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        filters, filter_params = " AND ".join(where), list(params)
+        if cursor:
+            where.append("(updated_at, thread_id) < (?, ?)")
+            params.extend(_decode_cursor(cursor))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM threads WHERE {' AND '.join(where)} "
+                "ORDER BY updated_at DESC, thread_id DESC LIMIT ?",
+                (*params, limit + 1),
+            ).fetchall()
+            total = (
+                self._conn.execute(f"SELECT COUNT(*) FROM threads WHERE {filters}", filter_params).fetchone()[0]
+                if with_total else None
+            )
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = _encode_cursor(last[_COLUMNS.index("updated_at")], last[0])
+        page: ThreadPage = {"threads": [self._info(row) for row in rows], "next_cursor": next_cursor}
+        if total is not None:
+            page["total"] = total
+        return page
+
+    # --- incremental counters -------------------------------------------
+
+    def increment(
+        self,
+        thread_id: str,
+        messages: int = 0,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        total_tokens: int = 0,
+        at: Optional[float] = None,
+    ) -> bool:
+        """Add to the counters of `thread_id`; False if the thread is unknown."""
+        now = time.time() if at is None else at
+        return self._write(
+            "UPDATE threads SET message_count = message_count + ?, input_tokens = input_tokens + ?, "
+            "output_tokens = output_tokens + ?, total_tokens = total_tokens + ?, updated_at = ?, "
+            "last_message_at = CASE WHEN ? > 0 THEN ? ELSE last_message_at END WHERE thread_id = ?",
+            (messages, input_tokens, output_tokens, total_tokens, now, messages, now, thread_id),
+        ) > 0
+
+    def record_user_message(self, thread_id: str) -> bool:
+        return self.increment(thread_id, messages=1)
+
+    def record_files(self, thread_id: str, changed: List[str], file_count: int) -> bool:
+        now = time.time()
+        return self._write(
+            "UPDATE threads SET file_count = ?, last_file = COALESCE(?, last_file), last_file_at = ?, "
+            "updated_at = ? WHERE thread_id = ?",
+            (file_count, changed[-1] if changed else None, now, now, thread_id),
+        ) > 0
+
+    def record_event(self, thread_id: str, event: StreamEvent) -> None:
+        """Update the counters of `thread_id` from one main-agent event.
+
+        Subagent events are ignored: their messages live in their own threads
+        and their token usage arrives as a single `usage` event of the
+        `task` tool in the main agent.
+        """
+        if event.get("agent") is not None:
+            return
+        event_type = event["type"]
+        if event_type in ("message_end", "tool_result"):
+            self.increment(thread_id, messages=1)
+        elif event_type == "usage":
+            delta = event["usage"].get("delta") or {}
+            if delta:
+                self.increment(
+                    thread_id,
+                    input_tokens=delta.get("input_tokens", 0),
+                    output_tokens=delta.get("output_tokens", 0),
+                    total_tokens=delta.get("total_tokens", 0),
+                )
+        elif event_type == "file_delta":
+            self.record_files(thread_id, event["added"] + event["updated"], len(event["files"]))
+
+    async def arecord_event(self, thread_id: str, event: StreamEvent) -> None:
+        """`record_event` in a worker thread, off the event loop."""
+        await asyncio.to_thread(self.record_event, thread_id, event)
+
+    def sink(self, thread_id: str):
+        """An `EventBus` sink that keeps the counters of `thread_id` current."""
+        return lambda event: self.arecord_event(thread_id, event)
+
+    def set_message_count(self, thread_id: str, message_count: int) -> bool:
+        """Overwrite the counter, e.g. with `ThreadStateReader.aget_messages(...)["total"]`."""
+        return self._write(
+            "UPDATE threads SET message_count = ? WHERE thread_id = ?", (message_count, thread_id)
+        ) > 0
+
+    # --- migration ------------------------------------------------------
+
+    def import_json(self, pattern: str = "user_*.json") -> int:
+        """Import the threads of `user_{user_id}.json` files; returns the number imported.
+
+        Accepts a list of ThreadInfo dicts, a `{"threads": [...]}` document or a
+        `{thread_id: info}` mapping per file. Existing rows are left untouched.
+        """
+        imported = 0
+        for path in sorted(glob.glob(pattern)):
+            match = re.match(r"user_(.+)\.json$", os.path.basename(path))
+            if not match:
+                continue
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                data = data.get("threads", data)
+            if isinstance(data, dict):
+                data = [{"thread_id": key, **value} for key, value in data.items() if isinstance(value, dict)]
+            rows = []
+            for info in data:
+                if not isinstance(info, dict) or not info.get("thread_id"):
+                    continue
+                created_at = _timestamp(info.get("created_at")) or time.time()
+                last_message_at = _timestamp(info.get("last_message_at") or info.get("updated_at"))
+                rows.append((
+                    info["thread_id"], match.group(1), info.get("title") or "", created_at,
+                    last_message_at or created_at, last_message_at, int(info.get("message_count") or 0),
+                ))
+            with self._lock:
+                cursor = self._conn.executemany(
+                    "INSERT OR IGNORE INTO threads (thread_id, user_id, title, created_at, updated_at, "
+                    "last_message_at, message_count) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.commit()
+            imported += max(cursor.rowcount, 0)
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
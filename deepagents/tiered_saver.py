@@ -0,0 +1,467 @@
+"""Tiered checkpointer: checkpoints served from memory, written behind to a durable saver.
+
+With `MongoDBSaver` on Atlas every super-step waits for a network round-trip
+(two, with the pending writes) before the graph continues.
+`TieredCheckpointSaver` answers the graph from an in-memory hot tier and
+writes to the durable saver (Mongo, SQLite...) in the background:
+
+    checkpointer = TieredCheckpointSaver(MongoDBSaver(client), max_lag=1.0)
+
+Write path
+    `aput`/`aput_writes` store into the hot tier and queue the operation for
+    the thread. A background task flushes every queue at most `max_lag`
+    seconds after the first queued operation, in order, per thread. Within
+    one flush only the newest checkpoint of each namespace (and checkpoints
+    holding an interrupt) is written, together with its pending writes; the
+    checkpoints in between are skipped, so the durable history is sparser
+    than the hot one. Their `new_versions` are carried over to the next
+    written checkpoint.
+
+Bounded lag
+    Once `max_pending` operations are queued, writers wait for a flush
+    (backpressure) instead of queuing more; a failing durable saver
+    therefore stops the graph instead of growing memory.
+
+Flush on interrupt
+    Pending writes on the `__interrupt__` (or `__error__`) channel are
+    flushed before `aput_writes` returns, so an interrupt shown to the user
+    is always durable and can be resumed from any process.
+
+Crash semantics
+    A crash loses at most the operations queued in the last `max_lag`
+    seconds (at most `max_pending`). The durable saver always holds a state
+    the thread actually went through (operations are applied in order), so a
+    restarted process resumes from the last flushed checkpoint and runs the
+    lost super-steps again; completed tool calls are replayed by a
+    `ToolJournal`. Call `aflush()` before a planned shutdown.
+
+Reads
+    `aget_tuple` is answered by the hot tier; for a thread not held in memory
+    (another process wrote it, or it was evicted after `hot_idle_seconds`)
+    the durable saver is read and the latest checkpoint warms the hot tier.
+    `alist` flushes the thread and lists the durable history. One process
+    must own a thread at a time.
+
+The sync `put`/`put_writes` write through to both tiers.
+
+`python -m deepagents.tiered_saver --rtt-ms 40` measures per-step latency
+against a durable saver with a simulated Atlas round-trip (or a real local
+Mongo with `--mongo mongodb://localhost:27017`).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+)
+from langgraph.checkpoint.memory import InMemorySaver
+
+# a flush is forced before these pending writes are acknowledged
+FLUSH_CHANNELS = ("__interrupt__", "__error__")
+# checkpoints holding these writes are never skipped by coalescing
+KEEP_CHANNELS = ("__interrupt__", "__resume__", "__error__")
+
+
+def _coalesce(ops: List[Tuple]) -> Tuple[List[Tuple], int]:
+    """Drop checkpoints superseded within `ops`; returns (ops, skipped)."""
+    put_keys = {}
+    keep = set()
+    for op in ops:
+        if op[0] == "put":
+            key = (op[1]["configurable"]["checkpoint_ns"], op[2]["id"])
+            put_keys[key[0]] = key
+        elif any(channel in KEEP_CHANNELS for channel, _value in op[2]):
+            keep.add((op[1]["configurable"]["checkpoint_ns"], op[1]["configurable"]["checkpoint_id"]))
+    keep.update(put_keys.values())
+    written = {(op[1]["configurable"]["checkpoint_ns"], op[2]["id"]) for op in ops if op[0] == "put"}
+
+    result = []
+    carried: Dict[str, Dict[str, Any]] = {}
+    skipped = 0
+    for op in ops:
+        if op[0] == "put":
+            ns = op[1]["configurable"]["checkpoint_ns"]
+            if (ns, op[2]["id"]) not in keep:
+                carried.setdefault(ns, {}).update(op[4])
+                skipped += 1
+                continue
+            if ns in carried:
+                op = (*op[:4], {**carried.pop(ns), **op[4]})
+        else:
+            key = (op[1]["configurable"]["checkpoint_ns"], op[1]["configurable"]["checkpoint_id"])
+            # writes of an already durable checkpoint are always applied
+            if key in written and key not in keep:
+                skipped += 1
+                continue
+        result.append(op)
+    return result, skipped
+
+
+class TieredCheckpointSaver(BaseCheckpointSaver):
+    """In-memory hot tier in front of a durable checkpointer."""
+
+    def __init__(
+        self,
+        durable: BaseCheckpointSaver,
+        max_lag: float = 1.0,
+        max_pending: int = 1000,
+        hot_idle_seconds: float = 600.0,
+        coalesce: bool = True,
+    ):
+        super().__init__(serde=durable.serde)
+        self.durable = durable
+        # offloading serializers (GridFS) do network I/O in dumps_typed; only the
+        # write-behind to the durable saver should pay for that
+        self.hot = InMemorySaver(serde=getattr(durable.serde, "inner", durable.serde))
+        self.max_lag = max_lag
+        self.max_pending = max_pending
+        self.hot_idle_seconds = hot_idle_seconds
+        self.coalesce = coalesce
+        self.last_error: Optional[BaseException] = None
+        self.metrics = {
+            "operations": 0,
+            "written": 0,
+            "skipped": 0,
+            "flushes": 0,
+            "hot_hits": 0,
+            "durable_reads": 0,
+            "max_lag_seconds": 0.0,
+        }
+        self._queues: Dict[str, List[Tuple]] = {}
+        self._queued_at: Dict[str, float] = {}
+        self._thread_locks: Dict[str, asyncio.Lock] = {}
+        self._touched: Dict[str, float] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+
+    @property
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    def get_next_version(self, current: Optional[Any], channel: Any) -> Any:
+        # versions must be the ones the durable saver would produce
+        return self.durable.get_next_version(current, channel)
+
+    # write path
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._wakeup = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def _enqueue(self, thread_id: str, op: Tuple) -> None:
+        self._ensure_flusher()
+        if self.pending >= self.max_pending:
+            await self.aflush()
+        self._queues.setdefault(thread_id, []).append(op)
+        self._queued_at.setdefault(thread_id, time.monotonic())
+        self._touched[thread_id] = time.monotonic()
+        self.metrics["operations"] += 1
+        self._wakeup.set()
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queued_at:
+                oldest = min(self._queued_at.values())
+                await asyncio.sleep(max(0.0, oldest + self.max_lag - time.monotonic()))
+                due = [
+                    thread_id
+                    for thread_id, queued_at in list(self._queued_at.items())
+                    if queued_at + self.max_lag <= time.monotonic()
+                ]
+                for thread_id in due:
+                    try:
+                        await self._flush_thread(thread_id)
+                        self.last_error = None
+                    except Exception as e:
+                        # kept queued; retried on the next round
+                        self.last_error = e
+                        self._queued_at[thread_id] = time.monotonic()
+            self._evict_idle()
+
+    async def _call_durable(self, name: str, *args: Any) -> Any:
+        try:
+            return await getattr(self.durable, "a" + name)(*args)
+        except NotImplementedError:
+            return await asyncio.to_thread(getattr(self.durable, name), *args)
+
+    async def _flush_thread(self, thread_id: str) -> None:
+        lock = self._thread_locks.setdefault(thread_id, asyncio.Lock())
+        async with lock:
+            ops = self._queues.pop(thread_id, [])
+            queued_at = self._queued_at.pop(thread_id, None)
+            if not ops:
+                return
+            if queued_at is not None:
+                self.metrics["max_lag_seconds"] = max(self.metrics["max_lag_seconds"], time.monotonic() - queued_at)
+            if self.coalesce:
+                ops, skipped = _coalesce(ops)
+                self.metrics["skipped"] += skipped
+            for position, op in enumerate(ops):
+                try:
+                    if op[0] == "put":
+                        await self._call_durable("put", *op[1:])
+                    else:
+                        await self._call_durable("put_writes", *op[1:])
+                except BaseException:
+                    # requeue what was not written, ahead of anything newer
+                    self._queues[thread_id] = ops[position:] + self._queues.get(thread_id, [])
+                    self._queued_at.setdefault(thread_id, queued_at or time.monotonic())
+                    raise
+                self.metrics["written"] += 1
+            self.metrics["flushes"] += 1
+
+    async def aflush(self, thread_id: Optional[str] = None) -> None:
+        """Write every queued operation (of `thread_id`, or of all threads) now."""
+        for thread_id_ in [thread_id] if thread_id is not None else list(self._queues):
+            await self._flush_thread(thread_id_)
+
+    def _evict_idle(self) -> None:
+        now = time.monotonic()
+        for thread_id, touched in list(self._touched.items()):
+            if now - touched > self.hot_idle_seconds and thread_id not in self._queues:
+                self.hot.delete_thread(thread_id)
+                del self._touched[thread_id]
+                self._thread_locks.pop(thread_id, None)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        saved = self.hot.put(config, checkpoint, metadata, new_versions)
+        await self._enqueue(str(config["configurable"]["thread_id"]), ("put", config, checkpoint, metadata, new_versions))
+        return saved
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        self.hot.put_writes(config, writes, task_id, task_path)
+        await self._enqueue(thread_id, ("writes", config, list(writes), task_id, task_path))
+        if any(channel in FLUSH_CHANNELS for channel, _value in writes):
+            await self.aflush(thread_id)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._queues.pop(thread_id, None)
+        self._queued_at.pop(thread_id, None)
+        self._touched.pop(thread_id, None)
+        self.hot.delete_thread(thread_id)
+        await self._call_durable("delete_thread", thread_id)
+
+    async def aclose(self) -> None:
+        """Flush everything and stop the background task."""
+        await self.aflush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    # read path
+
+    def _warm(self, tuple_: CheckpointTuple) -> None:
+        configurable = tuple_.config["configurable"]
+        parent_config = {
+            "configurable": {
+                "thread_id": configurable["thread_id"],
+                "checkpoint_ns": configurable.get("checkpoint_ns", ""),
+                "checkpoint_id": (tuple_.parent_config or {}).get("configurable", {}).get("checkpoint_id"),
+            }
+        }
+        # InMemorySaver only stores the blobs of the channels listed in new_versions
+        saved = self.hot.put(parent_config, tuple_.checkpoint, tuple_.metadata, tuple_.checkpoint["channel_versions"])
+        by_task: Dict[str, List[Tuple[str, Any]]] = {}
+        for task_id, channel, value in tuple_.pending_writes or []:
+            by_task.setdefault(task_id, []).append((channel, value))
+        for task_id, writes in by_task.items():
+            self.hot.put_writes(saved, writes, task_id)
+        self._touched[str(configurable["thread_id"])] = time.monotonic()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        tuple_ = self.hot.get_tuple(config)
+        if tuple_ is not None:
+            self.metrics["hot_hits"] += 1
+            self._touched[thread_id] = time.monotonic()
+            return tuple_
+        if thread_id in self._queues:
+            await self.aflush(thread_id)
+        self.metrics["durable_reads"] += 1
+        tuple_ = await self._call_durable("get_tuple", config)
+        if tuple_ is not None and not get_checkpoint_id(config):
+            self._warm(tuple_)
+        return tuple_
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config is not None:
+            await self.aflush(str(config["configurable"]["thread_id"]))
+        else:
+            await self.aflush()
+        try:
+            async for item in self.durable.alist(config, filter=filter, before=before, limit=limit):
+                yield item
+        except NotImplementedError:
+            for item in await asyncio.to_thread(
+                lambda: list(self.durable.list(config, filter=filter, before=before, limit=limit))
+            ):
+                yield item
+
+    # sync API: write-through
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return self.hot.get_tuple(config) or self.durable.get_tuple(config)
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        return self.durable.list(config, filter=filter, before=before, limit=limit)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self.hot.put(config, checkpoint, metadata, new_versions)
+        return self.durable.put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self.hot.put_writes(config, writes, task_id, task_path)
+        self.durable.put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.hot.delete_thread(thread_id)
+        self.durable.delete_thread(thread_id)
+
+
+class LatencySaver(InMemorySaver):
+    """`InMemorySaver` with a fixed delay per async call; a remote saver stand-in."""
+
+    def __init__(self, rtt: float = 0.04, **kwargs):
+        super().__init__(**kwargs)
+        self.rtt = rtt
+
+    async def aget_tuple(self, config):
+        await asyncio.sleep(self.rtt)
+        return await super().aget_tuple(config)
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        await asyncio.sleep(self.rtt)
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.sleep(self.rtt)
+        return await super().aput_writes(config, writes, task_id, task_path)
+
+
+async def benchmark(durable_factory: Any, steps: int = 50, max_lag: float = 1.0) -> Dict[str, Dict[str, float]]:
+    """Per-step latency of a counter graph on the durable saver directly vs tiered."""
+    from typing_extensions import TypedDict
+
+    from langgraph.graph import END, START, StateGraph
+
+    class State(TypedDict):
+        count: int
+
+    def step(state):
+        return {"count": state["count"] + 1}
+
+    def route(state):
+        return "step" if state["count"] < steps else END
+
+    builder = StateGraph(State)
+    builder.add_node("step", step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", route)
+
+    results = {}
+    for name in ("durable", "tiered"):
+        durable = durable_factory()
+        saver = durable if name == "durable" else TieredCheckpointSaver(durable, max_lag=max_lag)
+        graph = builder.compile(checkpointer=saver)
+        config = {"configurable": {"thread_id": f"bench-{name}-{time.time_ns()}"}, "recursion_limit": steps * 2 + 10}
+        stamps = []
+        started = time.perf_counter()
+        async for _update in graph.astream({"count": 0}, config, stream_mode="updates"):
+            stamps.append(time.perf_counter())
+        total = time.perf_counter() - started
+        if isinstance(saver, TieredCheckpointSaver):
+            flush_started = time.perf_counter()
+            await saver.aclose()
+            results[name] = {"final_flush_ms": (time.perf_counter() - flush_started) * 1000, **saver.metrics}
+        else:
+            results[name] = {}
+        gaps = sorted(later - earlier for earlier, later in zip(stamps, stamps[1:]))
+        results[name].update(
+            step_mean_ms=total / steps * 1000,
+            step_p50_ms=gaps[len(gaps) // 2] * 1000,
+            step_p99_ms=gaps[min(len(gaps) - 1, int(len(gaps) * 0.99))] * 1000,
+            total_s=total,
+        )
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Per-step latency with and without the hot tier")
+    parser.add_argument("--rtt-ms", type=float, default=40.0, help="simulated round-trip of the durable saver")
+    parser.add_argument("--mongo", help="use a real MongoDBSaver at this URI instead")
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--max-lag", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.mongo:
+        from langgraph.checkpoint.mongodb import MongoDBSaver
+        from pymongo import MongoClient
+
+        client = MongoClient(args.mongo)
+
+        def factory():
+            return MongoDBSaver(client, db_name="tiered_saver_benchmark")
+    else:
+        def factory():
+            return LatencySaver(rtt=args.rtt_ms / 1000)
+
+    for name, stats in asyncio.run(benchmark(factory, steps=args.steps, max_lag=args.max_lag)).items():
+        print(
+            f"{name:8s} step mean {stats['step_mean_ms']:8.2f} ms  p50 {stats['step_p50_ms']:8.2f} ms  p99 {stats['step_p99_ms']:8.2f} ms  "
+            f"total {stats['total_s']:6.2f} s"
+            + (f"  skipped {stats['skipped']}  final flush {stats['final_flush_ms']:.1f} ms" if name == "tiered" else "")
+        )
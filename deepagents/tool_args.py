@@ -0,0 +1,296 @@
+"""Incremental parsing of streamed tool-call arguments.
+
+Tool-call arguments arrive as JSON text split across many chunks. Waiting for
+`finish_reason` means a UI cannot show the `task` description or the
+`write_file` path until the whole (possibly very long) `content` argument has
+streamed. `IncrementalArgsParser` consumes the pieces as they arrive and
+reports each top-level field as soon as its value is complete:
+
+    parser = IncrementalArgsParser()
+    parser.feed('{"file_path": "/a.md", "con')   # [("field", "file_path", "/a.md", False)]
+    parser.feed('tent": "# Title')                # [("delta", "content", "# Title", False)]
+
+Memory is bounded: completed fields are handed out, not kept, and a value is
+buffered only up to `max_field_chars` (longer values are reported with
+`truncated=True`; string deltas are still emitted in full).
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# (kind, key, value, truncated); kind is "field" (value complete) or "delta"
+# (new text of a string value still streaming)
+ArgEvent = Tuple[str, str, Any, bool]
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalArgsParser:
+    """Streaming parser for one tool call's top-level JSON object."""
+
+    def __init__(self, max_field_chars: int = 4096):
+        self.max_field_chars = max_field_chars
+        self.state = "start"
+        self.failed = False
+        self._key_parts: List[str] = []
+        self._key: Optional[str] = None
+        self._value_parts: List[str] = []
+        self._value_chars = 0
+        self._truncated = False
+        self._delta_parts: List[str] = []
+        self._escape: Optional[str] = None  # pending escape sequence, without the backslash
+        self._high_surrogate: Optional[int] = None
+        # nested (non-string) values
+        self._depth = 0
+        self._in_string = False
+        self._string_escape = False
+
+    @property
+    def done(self) -> bool:
+        return self.state == "done"
+
+    # ------------------------------------------------------------------
+
+    def _keep(self, text: str) -> None:
+        if self._truncated:
+            return
+        if self._value_chars + len(text) > self.max_field_chars:
+            self._truncated = True
+            self._value_parts = []
+            return
+        self._value_parts.append(text)
+        self._value_chars += len(text)
+
+    def _reset_value(self) -> None:
+        self._value_parts = []
+        self._value_chars = 0
+        self._truncated = False
+
+    def _decode_escape(self, char: str) -> Optional[str]:
+        """Feed one char of an escape sequence; returns decoded text once complete."""
+        self._escape += char
+        if self._escape[0] != "u":
+            decoded = _ESCAPES.get(self._escape, self._escape)
+            self._escape = None
+            return decoded
+        if len(self._escape) < 5:
+            return None
+        code = int(self._escape[1:], 16)
+        self._escape = None
+        if 0xD800 <= code < 0xDC00:
+            self._high_surrogate = code
+            return ""
+        if 0xDC00 <= code < 0xE000 and self._high_surrogate is not None:
+            code = 0x10000 + ((self._high_surrogate - 0xD800) << 10) + (code - 0xDC00)
+        self._high_surrogate = None
+        return chr(code)
+
+    def _read_string(self, text: str, i: int, sink) -> Tuple[int, bool]:
+        """Consume string characters from `text[i:]`; returns (next index, closed)."""
+        n = len(text)
+        while i < n:
+            if self._escape is not None:
+                decoded = self._decode_escape(text[i])
+                if decoded:
+                    sink(decoded)
+                i += 1
+                continue
+            # copy the run of plain characters in one slice
+            j = i
+            while j < n and text[j] != '"' and text[j] != "\\":
+                j += 1
+            if j > i:
+                sink(text[i:j])
+            if j == n:
+                return n, False
+            if text[j] == '"':
+                return j + 1, True
+            self._escape = ""
+            i = j + 1
+        return n, False
+
+    def _string_sink(self, piece: str) -> None:
+        self._keep(piece)
+        self._delta_parts.append(piece)
+
+    def _flush_delta(self, events: List[ArgEvent]) -> None:
+        if self._delta_parts:
+            events.append(("delta", self._key, "".join(self._delta_parts), self._truncated))
+            self._delta_parts = []
+
+    def _complete(self, events: List[ArgEvent], value: Any) -> None:
+        events.append(("field", self._key, None if self._truncated else value, self._truncated))
+        self._reset_value()
+        self.state = "comma_or_end"
+
+    def feed(self, text: str) -> List[ArgEvent]:
+        """Consume the next piece of argument text and return the events it completes."""
+        events: List[ArgEvent] = []
+        if self.failed or self.done or not text:
+            return events
+        i, n = 0, len(text)
+        while i < n:
+            state = self.state
+            char = text[i]
+            if state in ("start", "key_or_end", "colon", "value_start", "comma_or_end") and char in _WHITESPACE:
+                i += 1
+            elif state == "start":
+                if char != "{":
+                    self.failed = True
+                    return events
+                self.state = "key_or_end"
+                i += 1
+            elif state == "key_or_end":
+                if char == "}":
+                    self.state = "done"
+                    return events
+                if char != '"':
+                    self.failed = True
+                    return events
+                self._key_parts = []
+                self.state = "key"
+                i += 1
+            elif state == "key":
+                i, closed = self._read_string(text, i, self._key_parts.append)
+                if closed:
+                    self._key = "".join(self._key_parts)
+                    self.state = "colon"
+            elif state == "colon":
+                if char != ":":
+                    self.failed = True
+                    return events
+                self.state = "value_start"
+                i += 1
+            elif state == "value_start":
+                self._reset_value()
+                if char == '"':
+                    self.state = "string_value"
+                    i += 1
+                else:
+                    self._depth = 0
+                    self._in_string = False
+                    self._string_escape = False
+                    self.state = "raw_value"
+            elif state == "string_value":
+                i, closed = self._read_string(text, i, self._string_sink)
+                if closed:
+                    self._flush_delta(events)
+                    self._complete(events, "".join(self._value_parts))
+            elif state == "raw_value":
+                i = self._read_raw(text, i, events)
+            elif state == "comma_or_end":
+                if char == ",":
+                    self.state = "key_or_end"
+                elif char == "}":
+                    self.state = "done"
+                    return events
+                else:
+                    self.failed = True
+                    return events
+                i += 1
+            else:
+                return events
+        if self.state == "string_value":
+            self._flush_delta(events)
+        return events
+
+    def _read_raw(self, text: str, i: int, events: List[ArgEvent]) -> int:
+        """Consume a number, literal, object or array value."""
+        start = i
+        n = len(text)
+        while i < n:
+            char = text[i]
+            if self._in_string:
+                if self._string_escape:
+                    self._string_escape = False
+                elif char == "\\":
+                    self._string_escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]" and self._depth > 0:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._keep(text[start:i + 1])
+                    self._finish_raw(events)
+                    return i + 1
+            elif self._depth == 0 and (char in ",}" or char in _WHITESPACE):
+                # end of a scalar: leave the delimiter for comma_or_end
+                self._keep(text[start:i])
+                self._finish_raw(events)
+                return i
+            i += 1
+        self._keep(text[start:i])
+        return i
+
+    def _finish_raw(self, events: List[ArgEvent]) -> None:
+        if self._truncated:
+            self._complete(events, None)
+            return
+        raw = "".join(self._value_parts).strip()
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            self.failed = True
+            return
+        self._complete(events, value)
+
+
+def tool_call_pieces(message_chunk: Any) -> Iterator[Tuple[int, Optional[str], Optional[str], str, str]]:
+    """Yield `(index, id, name, args_piece, source)` for the tool-call deltas of a chunk.
+
+    Only one source is read per chunk: LangChain's `tool_call_chunks`, then the
+    legacy `additional_kwargs` entries, so providers that fill several of them
+    are not counted twice.
+    """
+    addkw = getattr(message_chunk, "additional_kwargs", {}) or {}
+    pieces = getattr(message_chunk, "tool_call_chunks", None) or addkw.get("tool_call_chunks")
+    if pieces:
+        for piece in pieces:
+            yield piece.get("index") or 0, piece.get("id"), piece.get("name"), piece.get("args") or "", "chunks"
+        return
+    for tc in (addkw.get("tool_calls") or []):
+        func = tc.get("function") or {}
+        args = func.get("arguments") or tc.get("args") or ""
+        if not isinstance(args, str):
+            # some providers send already parsed arguments
+            args = json.dumps(args, ensure_ascii=False)
+        yield tc.get("index") or 0, tc.get("id"), func.get("name") or tc.get("name"), args, "tool_calls"
+
+
+def new_tool_call_buffer(max_field_chars: int = 4096) -> Dict[str, Any]:
+    return {"name": None, "args": [], "id": None, "source": None, "parser": IncrementalArgsParser(max_field_chars)}
+
+
+def tool_call_args(buf: Dict[str, Any]) -> str:
+    """The arguments received so far, joined once (pieces are kept as a list)."""
+    parts = buf["args"]
+    if len(parts) > 1:
+        parts[:] = ["".join(parts)]
+    return parts[0] if parts else ""
+
+
+def append_tool_call_piece(buf: Dict[str, Any], args: str, source: str) -> str:
+    """Append `args` to `buf` and return the text that is actually new.
+
+    Some providers stream `tool_call_chunks` and then repeat the complete
+    arguments in `tool_calls` (or the other way round). A piece from another
+    source that restates what was already received only contributes its
+    unseen suffix.
+    """
+    if buf["source"] is None:
+        buf["source"] = source
+    elif source != buf["source"] and buf["args"]:
+        received = tool_call_args(buf)
+        if args.startswith(received):
+            args = args[len(received):]
+    if args:
+        buf["args"].append(args)
+    return args
@@ -0,0 +1,239 @@
+"""Per-turn tool exposure for the main agent.
+
+By default every main-agent turn ships every tool schema with its full
+description. A tool exposure policy looks at the state before each model call
+and returns which tools to bind and how verbose their descriptions should be::
+
+    def policy(state) -> ToolExposure:
+        return {"tools": ["task", "write_todos"], "verbosity": "concise"}
+
+Tool schemas are converted once; the model bound to each (tool subset,
+verbosity) pair is cached, so a turn only pays for a dict lookup. Tools hidden
+from the model stay registered in the tool node, so a call to them still
+executes. A tool the thread has already called stays bound whatever the policy
+says, so every tool call in the history has its schema in the request.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+from typing import Any, Callable, Dict, List, Literal, Optional, Sequence
+from typing_extensions import NotRequired, TypedDict
+
+from langchain_core.tools import BaseTool, tool as as_tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+class ToolExposure(TypedDict):
+    """Tools to bind for one model turn. Missing `tools` means all tools."""
+
+    tools: NotRequired[List[str]]
+    verbosity: NotRequired[Literal["full", "concise"]]
+
+
+ToolExposurePolicy = Callable[[Dict[str, Any]], ToolExposure]
+
+
+def default_tool_exposure_policy(state: Dict[str, Any]) -> ToolExposure:
+    """Hide file readers until files exist and shorten descriptions after planning.
+
+    - no files in the workspace: the read/edit tools cannot succeed, drop them
+    - todos already written: the agent has planned, concise descriptions suffice
+    """
+    exposure: ToolExposure = {"verbosity": "concise" if state.get("todos") else "full"}
+    if not state.get("files"):
+        exposure["tools"] = ["write_todos", "write_file", "ls", "task"]
+    return exposure
+
+
+class ToolExposureCache:
+    """Precomputed tool schemas and bound models for every exposure seen."""
+
+    def __init__(
+        self,
+        model,
+        tools: Sequence[BaseTool],
+        policy: ToolExposurePolicy,
+        concise_descriptions: Optional[Dict[str, str]] = None,
+    ):
+        self.model = model
+        self.policy = policy
+        tools = [tool if isinstance(tool, BaseTool) else as_tool(tool) for tool in tools]
+        self.tool_names = [tool.name for tool in tools]
+        self._schemas: Dict[str, Dict[str, dict]] = {}
+        for tool in tools:
+            full = convert_to_openai_tool(tool)
+            concise = json.loads(json.dumps(full))
+            if concise_descriptions and tool.name in concise_descriptions:
+                concise["function"]["description"] = concise_descriptions[tool.name]
+            self._schemas[tool.name] = {"full": full, "concise": concise}
+        self._bound: Dict[tuple, Any] = {}
+        self._schema_chars: Dict[tuple, int] = {}
+        self._turns: Dict[tuple, int] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, exposure: ToolExposure) -> tuple:
+        names = exposure.get("tools")
+        selected = tuple(name for name in self.tool_names if names is None or name in names)
+        return selected, exposure.get("verbosity", "full")
+
+    def bound_model(self, exposure: ToolExposure):
+        key = self._key(exposure)
+        with self._lock:
+            self._turns[key] = self._turns.get(key, 0) + 1
+            if key not in self._bound:
+                names, verbosity = key
+                schemas = [self._schemas[name][verbosity] for name in names]
+                self._bound[key] = self.model.bind_tools(schemas)
+                self._schema_chars[key] = len(json.dumps(schemas, ensure_ascii=False))
+            return self._bound[key]
+
+    @staticmethod
+    def _called_tools(messages: Sequence[Any]) -> List[str]:
+        called: List[str] = []
+        for message in messages:
+            for tool_call in getattr(message, "tool_calls", None) or ():
+                if tool_call["name"] not in called:
+                    called.append(tool_call["name"])
+        return called
+
+    def select_model(self, state: Dict[str, Any], runtime: Any = None):
+        """Dynamic model callable for `create_react_agent`."""
+        exposure = self.policy(state)
+        names = exposure.get("tools")
+        if names is not None:
+            called = [name for name in self._called_tools(state.get("messages") or ()) if name not in names]
+            if called:
+                exposure = {**exposure, "tools": [*names, *called]}
+        return self.bound_model(exposure)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Turns served and schema size (chars, ~tokens) per exposure.
+
+        The token figure is only chars/4; `benchmark` measures the prompt
+        tokens the provider actually bills, and the time to first token.
+        """
+        with self._lock:
+            return [
+                {
+                    "tools": list(names),
+                    "verbosity": verbosity,
+                    "turns": self._turns.get((names, verbosity), 0),
+                    "schema_chars": chars,
+                    "schema_tokens_estimate": chars // 4,
+                }
+                for (names, verbosity), chars in self._schema_chars.items()
+            ]
+
+
+_BENCHMARK_STATES: Dict[str, Dict[str, Any]] = {
+    "planning": {},
+    "writing": {"todos": [{"content": "起草需求文档", "status": "in_progress"}]},
+    "editing": {
+        "todos": [{"content": "完善需求文档", "status": "in_progress"}],
+        "files": {"需求文档.md": "# 需求\n"},
+    },
+}
+
+
+def benchmark(
+    model: Any,
+    tools: Sequence[BaseTool],
+    policy: ToolExposurePolicy = default_tool_exposure_policy,
+    concise_descriptions: Optional[Dict[str, str]] = None,
+    states: Optional[Dict[str, Dict[str, Any]]] = None,
+    repeats: int = 3,
+) -> List[Dict[str, Any]]:
+    """Per-turn prompt tokens and time to first token: every tool vs `policy`.
+
+    For each state the same request is streamed `repeats` times with all tools
+    at full verbosity and with the exposure `policy` picks, alternating the
+    two. `input_tokens` is what the provider reports (None when it reports no
+    usage), `ttft_ms` the median time to the first chunk. With `model=None`
+    only the schema sizes are reported.
+    """
+    import statistics
+    import time
+
+    from langchain_core.messages import HumanMessage
+
+    cache = ToolExposureCache(model, tools, policy, concise_descriptions)
+    messages = [HumanMessage("请先列出工作区中的文件。")]
+
+    def measure(bound) -> Dict[str, Any]:
+        started = time.perf_counter()
+        first, input_tokens = None, None
+        for chunk in bound.stream(messages):
+            if first is None:
+                first = time.perf_counter() - started
+            if getattr(chunk, "usage_metadata", None):
+                input_tokens = chunk.usage_metadata.get("input_tokens", input_tokens)
+        return {"ttft": first, "input_tokens": input_tokens}
+
+    results = []
+    for name, state in (states or _BENCHMARK_STATES).items():
+        exposures = {"all": {"verbosity": "full"}, "policy": policy(state)}
+        samples: Dict[str, List[Dict[str, Any]]] = {label: [] for label in exposures}
+        for _ in range(repeats if model is not None else 0):
+            for label, exposure in exposures.items():
+                samples[label].append(measure(cache.bound_model(exposure)))
+        for label, exposure in exposures.items():
+            names, verbosity = cache._key(exposure)
+            chars = len(json.dumps([cache._schemas[n][verbosity] for n in names], ensure_ascii=False))
+            results.append({
+                "state": name,
+                "exposure": label,
+                "tools": len(names),
+                "schema_tokens_estimate": chars // 4,
+                "input_tokens": samples[label][-1]["input_tokens"] if samples[label] else None,
+                "ttft_ms": (
+                    1000 * statistics.median(sample["ttft"] for sample in samples[label]) if samples[label] else None
+                ),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    import os
+
+    from deepagents.prompts import (
+        EDIT_WITH_COMMIT_MESSAGE_CONCISE_DESCRIPTION,
+        TASK_CONCISE_DESCRIPTION_PREFIX,
+        TASK_DESCRIPTION_PREFIX,
+        TASK_DESCRIPTION_SUFFIX,
+        TOOL_CONCISE_DESCRIPTION,
+        TOOL_CONCISE_DESCRIPTION_AND_HISTORY,
+        WRITE_TODOS_CONCISE_DESCRIPTION,
+    )
+    from deepagents.tools import (
+        edit_file_with_commit_message, ls, read_file_content, read_file_content_and_history, write_file, write_todos,
+    )
+
+    # same schema as the real `task` tool, without building the subagents
+    @as_tool(description=TASK_DESCRIPTION_PREFIX.format(other_agents=[]) + TASK_DESCRIPTION_SUFFIX)
+    def task(description: str, subagent_type: str) -> str:
+        return ""
+
+    main_tools = [write_todos, write_file, read_file_content, ls, read_file_content_and_history,
+                  edit_file_with_commit_message, task]
+    concise = {
+        "write_todos": WRITE_TODOS_CONCISE_DESCRIPTION,
+        "task": TASK_CONCISE_DESCRIPTION_PREFIX.format(other_agents=[]),
+        "edit_file_with_commit_message": EDIT_WITH_COMMIT_MESSAGE_CONCISE_DESCRIPTION,
+        "read_file_content": TOOL_CONCISE_DESCRIPTION,
+        "read_file_content_and_history": TOOL_CONCISE_DESCRIPTION_AND_HISTORY,
+    }
+    if os.environ.get("QWEN_API_KEY") and os.environ.get("QWEN_BASE_URL"):
+        from deepagents.model import get_default_model
+
+        rows = benchmark(get_default_model(), main_tools, concise_descriptions=concise)
+    else:
+        print("QWEN_API_KEY / QWEN_BASE_URL not set: schema sizes only, no input tokens or TTFT")
+        rows = benchmark(None, main_tools, concise_descriptions=concise)
+    print(f"{'state':10s} {'exposure':8s} {'tools':>5s} {'~schema tok':>11s} {'input tok':>9s} {'ttft ms':>9s}")
+    for row in rows:
+        input_tokens = "-" if row["input_tokens"] is None else f"{row['input_tokens']:,}"
+        ttft = "-" if row["ttft_ms"] is None else f"{row['ttft_ms']:,.0f}"
+        print(f"{row['state']:10s} {row['exposure']:8s} {row['tools']:>5d} "
+              f"{row['schema_tokens_estimate']:>11,d} {input_tokens:>9s} {ttft:>9s}")
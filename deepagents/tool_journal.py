@@ -0,0 +1,404 @@
+"""Journal of completed tool calls, so a resumed run never executes one twice.
+
+LangGraph saves the writes of every task that finished in a superstep, but
+the tools node runs all tool calls of one model turn as a single task. When
+that task is interrupted (crash, cancellation, an interrupt raised by a
+sibling call) the calls that already finished have no writes, and on resume
+every tool call of the turn executes again, including slow or side-effecting
+ones such as `cnki_search` or a whole subagent `task`.
+
+Tools wrapped with `journal_tools` record their result under
+`(thread_id, tool_call_id)` once they finish; a later invocation of the same
+call returns the recorded result (the same `ToolMessage` or `Command`)
+instantly:
+
+    journal = SQLiteToolJournal("memory.db")   # next to the sqlite checkpoints
+    agent = create_deep_agent(..., checkpointer=checkpointer, tool_journal=journal)
+
+Inside a subagent the key is different. A resumed `task` starts the
+subagent again on its thread (`sub_agent_{type}_{tool_call_id}`), and the
+subagent model issues new tool call ids, so subagent tools are journaled with
+`key_by_args=True`: the entry is keyed by the tool name and its arguments
+(injected ones excluded) within the subagent thread. Identical calls in one
+subagent thread share a result, which suits lookups such as `cnki_search`.
+
+Keep the journal in the same store as the checkpoints (the sqlite file, or
+`MongoToolJournal.from_saver(mongo_saver)`), so a run resumed on another host
+finds it. Calls that raise are not recorded, so they are retried on resume as
+before. Entries are only needed until the step that made them is committed:
+checkpoint retention drops them with the checkpoints (see
+`deepagents.retention`).
+
+`python -m deepagents.tool_journal` interrupts the xlangguage pipeline after
+the first tool call of each subagent stage, resumes it and reports the resume
+latency, journal hits and tool time saved.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from langchain_core.messages import ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import BaseTool, tool as as_tool
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.types import Command
+
+
+class ToolJournal:
+    """Base class; backends implement `_load` and `_store`."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    def _load(self, thread_id: str, tool_call_id: str) -> Optional[Tuple[Any, float]]:
+        raise NotImplementedError
+
+    def _store(self, thread_id: str, tool_call_id: str, tool_name: str, result: Any, elapsed: float) -> None:
+        raise NotImplementedError
+
+    def get(self, thread_id: str, tool_call_id: str) -> Optional[Tuple[Any, float]]:
+        """`(result, seconds the call originally took)` or None."""
+        entry = self._load(thread_id, tool_call_id)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.saved_seconds += entry[1]
+        return entry
+
+    def put(self, thread_id: str, tool_call_id: str, tool_name: str, result: Any, elapsed: float = 0.0) -> None:
+        self._store(thread_id, tool_call_id, tool_name, result, elapsed)
+
+    def delete_thread(self, thread_id: str) -> None:
+        raise NotImplementedError
+
+    def prune(self, thread_id: str, before: float) -> int:
+        """Drop the entries of `thread_id` recorded before unix time `before`."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "saved_seconds": self.saved_seconds}
+
+
+class InMemoryToolJournal(ToolJournal):
+    def __init__(self):
+        super().__init__()
+        self._entries: Dict[Tuple[str, str], Tuple[Any, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self, thread_id, tool_call_id):
+        with self._lock:
+            entry = self._entries.get((thread_id, tool_call_id))
+        return None if entry is None else entry[:2]
+
+    def _store(self, thread_id, tool_call_id, tool_name, result, elapsed):
+        with self._lock:
+            self._entries[(thread_id, tool_call_id)] = (result, elapsed, time.time())
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == thread_id]:
+                del self._entries[key]
+
+    def prune(self, thread_id, before):
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if key[0] == thread_id and entry[2] < before]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+
+class SQLiteToolJournal(ToolJournal):
+    """Journal in a SQLite table; can share the database file of the checkpointer."""
+
+    def __init__(self, path: str, serde: Optional[Any] = None):
+        super().__init__()
+        self.path = path
+        self.serde = serde or JsonPlusSerializer()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tool_journal ("
+            "thread_id TEXT NOT NULL, tool_call_id TEXT NOT NULL, tool_name TEXT, "
+            "type TEXT, value BLOB, elapsed REAL, created_at REAL, "
+            "PRIMARY KEY (thread_id, tool_call_id))"
+        )
+        self._conn.commit()
+
+    def _load(self, thread_id, tool_call_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT type, value, elapsed FROM tool_journal WHERE thread_id = ? AND tool_call_id = ?",
+                (thread_id, tool_call_id),
+            ).fetchone()
+        if row is None:
+            return None
+        return self.serde.loads_typed((row[0], row[1])), row[2] or 0.0
+
+    def _store(self, thread_id, tool_call_id, tool_name, result, elapsed):
+        type_, value = self.serde.dumps_typed(result)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO tool_journal VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, tool_call_id, tool_name, type_, value, elapsed, time.time()),
+            )
+            self._conn.commit()
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM tool_journal WHERE thread_id = ?", (thread_id,))
+            self._conn.commit()
+
+    def prune(self, thread_id, before):
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM tool_journal WHERE thread_id = ? AND created_at < ?", (thread_id, before)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+
+class MongoToolJournal(ToolJournal):
+    """Journal in a collection next to the Mongo checkpoints."""
+
+    def __init__(self, collection: Any, serde: Optional[Any] = None):
+        super().__init__()
+        self.collection = collection
+        self.serde = serde or JsonPlusSerializer()
+        self.collection.create_index([("thread_id", 1), ("tool_call_id", 1)], unique=True)
+        self.collection.create_index([("thread_id", 1), ("created_at", 1)])
+
+    @classmethod
+    def from_saver(cls, saver: Any, name: str = "tool_journal") -> "MongoToolJournal":
+        # the plain serde: journal entries are pruned by deleting documents,
+        # blobs offloaded to GridFS would be left behind
+        serde = getattr(saver.serde, "inner", saver.serde)
+        return cls(saver.checkpoint_collection.database[name], serde=serde)
+
+    def _load(self, thread_id, tool_call_id):
+        doc = self.collection.find_one(
+            {"thread_id": thread_id, "tool_call_id": tool_call_id}, {"type": 1, "value": 1, "elapsed": 1}
+        )
+        if doc is None:
+            return None
+        return self.serde.loads_typed((doc["type"], bytes(doc["value"]))), doc.get("elapsed") or 0.0
+
+    def _store(self, thread_id, tool_call_id, tool_name, result, elapsed):
+        type_, value = self.serde.dumps_typed(result)
+        self.collection.replace_one(
+            {"thread_id": thread_id, "tool_call_id": tool_call_id},
+            {
+                "thread_id": thread_id, "tool_call_id": tool_call_id, "tool_name": tool_name,
+                "type": type_, "value": value, "elapsed": elapsed, "created_at": time.time(),
+            },
+            upsert=True,
+        )
+
+    def delete_thread(self, thread_id):
+        self.collection.delete_many({"thread_id": thread_id})
+
+    def prune(self, thread_id, before):
+        return self.collection.delete_many({"thread_id": thread_id, "created_at": {"$lt": before}}).deleted_count
+
+
+def _journal_key(
+    input: Any, config: Optional[RunnableConfig], tool: Optional[BaseTool] = None
+) -> Optional[Tuple[str, str]]:
+    # only tool calls coming from the tool node carry an id to key on
+    if not (isinstance(input, dict) and input.get("type") == "tool_call" and input.get("id")):
+        return None
+    thread_id = ((config or {}).get("configurable") or {}).get("thread_id", "")
+    if tool is None:
+        return str(thread_id), input["id"]
+    return str(thread_id), _call_identity(tool, input.get("args") or {})
+
+
+def _call_identity(tool: BaseTool, args: Dict[str, Any]) -> str:
+    """`name:sha256(args)`, over the arguments the model chose (no injected state)."""
+    schema = tool.tool_call_schema
+    if isinstance(schema, dict):
+        fields = (schema.get("properties") or {}).keys()
+    else:
+        fields = getattr(schema, "model_fields", None) or args.keys()
+    chosen = {key: value for key, value in args.items() if key in fields}
+    encoded = json.dumps(chosen, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{tool.name}:{hashlib.sha256(encoded.encode()).hexdigest()}"
+
+
+def _retarget(result: Any, tool_call_id: str) -> Any:
+    """A recorded result answering `tool_call_id` instead of the call that recorded it."""
+    if isinstance(result, ToolMessage):
+        return result.model_copy(update={"tool_call_id": tool_call_id})
+    if isinstance(result, Command) and isinstance(result.update, dict) and "messages" in result.update:
+        messages = [_retarget(message, tool_call_id) for message in result.update["messages"]]
+        return Command(
+            graph=result.graph, update={**result.update, "messages": messages}, resume=result.resume, goto=result.goto
+        )
+    return result
+
+
+class JournaledTool(BaseTool):
+    """Wrap a tool so completed calls are recorded and replayed from a journal."""
+
+    tool: BaseTool
+    journal: Any
+    key_by_args: bool = False
+
+    def __init__(self, tool: BaseTool, journal: ToolJournal, key_by_args: bool = False, **kwargs):
+        super().__init__(
+            name=tool.name,
+            description=tool.description,
+            args_schema=tool.args_schema,
+            return_direct=tool.return_direct,
+            response_format=tool.response_format,
+            tool=tool,
+            journal=journal,
+            key_by_args=key_by_args,
+            **kwargs,
+        )
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = _journal_key(input, config, self.tool if self.key_by_args else None)
+        if key is not None:
+            entry = self.journal.get(*key)
+            if entry is not None:
+                return _retarget(entry[0], input["id"]) if self.key_by_args else entry[0]
+        started = time.monotonic()
+        result = self.tool.invoke(input, config, **kwargs)
+        if key is not None:
+            self.journal.put(*key, self.name, result, time.monotonic() - started)
+        return result
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        key = _journal_key(input, config, self.tool if self.key_by_args else None)
+        if key is not None:
+            entry = self.journal.get(*key)
+            if entry is not None:
+                return _retarget(entry[0], input["id"]) if self.key_by_args else entry[0]
+        started = time.monotonic()
+        result = await self.tool.ainvoke(input, config, **kwargs)
+        if key is not None:
+            self.journal.put(*key, self.name, result, time.monotonic() - started)
+        return result
+
+    def _run(self, *args: Any, run_manager: Any = None, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.tool.invoke(kwargs, config)
+
+    async def _arun(self, *args: Any, run_manager: Any = None, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.tool.ainvoke(kwargs, config)
+
+
+def journal_tools(tools: Sequence[Any], journal: Optional[ToolJournal], key_by_args: bool = False) -> list:
+    """Wrap every tool in `tools` with `journal`; returns `tools` unchanged if None.
+
+    Tools already journaled are re-keyed if `key_by_args` differs (a main
+    agent tool handed to a subagent).
+    """
+    if journal is None:
+        return list(tools)
+    wrapped = []
+    for tool_ in tools:
+        if isinstance(tool_, dict) or (isinstance(tool_, JournaledTool) and tool_.key_by_args == key_by_args):
+            wrapped.append(tool_)
+            continue
+        if isinstance(tool_, JournaledTool):
+            tool_ = tool_.tool
+        elif not isinstance(tool_, BaseTool):
+            tool_ = as_tool(tool_)
+        wrapped.append(JournaledTool(tool_, journal, key_by_args=key_by_args))
+    return wrapped
+
+
+_STREAM_MODE = ["messages", "updates", "custom"]
+
+
+def _subagent_event(stream_type: str, data: Any) -> Optional[Dict[str, Any]]:
+    if stream_type != "custom" or not isinstance(data, dict):
+        return None
+    return data.get("subagent")
+
+
+async def benchmark_resume(agent: Any, journal: ToolJournal, stage: str, user_input: str) -> Dict[str, Any]:
+    """Interrupt `agent` after the first tool result inside subagent `stage`, resume, time the rest of the stage.
+
+    Replayed calls only hit when the resumed subagent model issues the same
+    arguments again (see `key_by_args`), so `journal_hits` can vary between
+    runs of a non-deterministic model.
+    """
+    import uuid
+
+    config = {"configurable": {"thread_id": f"resume_bench_{stage}_{uuid.uuid4().hex[:8]}"}}
+
+    # 1. run until a tool call inside the stage has completed, then interrupt
+    stream = agent.astream({"messages": user_input}, config=config, stream_mode=_STREAM_MODE)
+    interrupted = False
+    async for stream_type, data in stream:
+        event = _subagent_event(stream_type, data)
+        if (
+            event and event.get("type") == "chunk" and event.get("name") == stage
+            and event.get("stream_type") == "messages" and getattr(event["data"][0], "type", None) == "tool"
+        ):
+            interrupted = True
+            break
+    await stream.aclose()
+    if not interrupted:
+        return {"stage": stage, "interrupted": False}
+
+    # 2. resume from the checkpoint and time until the stage finishes
+    hits, saved = journal.hits, journal.saved_seconds
+    started = time.perf_counter()
+    first_event = None
+    stage_started = False
+    async for stream_type, data in agent.astream(None, config=config, stream_mode=_STREAM_MODE):
+        if first_event is None:
+            first_event = time.perf_counter() - started
+        event = _subagent_event(stream_type, data)
+        if not event:
+            continue
+        stage_started = stage_started or event.get("name") == stage
+        # the stop event carries no name; the stage ends at the first stop after its start
+        if stage_started and event.get("type") == "stop":
+            break
+    return {
+        "stage": stage,
+        "interrupted": True,
+        "first_event_s": first_event or 0.0,
+        "resume_s": time.perf_counter() - started,
+        "journal_hits": journal.hits - hits,
+        "saved_s": journal.saved_seconds - saved,
+    }
+
+
+if __name__ == "__main__":
+    import asyncio
+
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    from xlangguage_nodes.xlangguage_agent import tool_journal, xlangguage_agent
+
+    stages = ["requirement_doc_agent", "requirement_code_agent", "architecture_agent", "system_agent"]
+
+    async def main():
+        print(f"{'stage':<24}{'first event s':>14}{'resume s':>10}{'hits':>6}{'saved s':>10}")
+        for stage in stages:
+            result = await benchmark_resume(xlangguage_agent, tool_journal, stage, "请为电网安全监控系统完成需求、架构与系统建模")
+            if not result["interrupted"]:
+                print(f"{stage:<24}  no tool call reached in this stage")
+                continue
+            print(
+                f"{stage:<24}{result['first_event_s']:>14.2f}{result['resume_s']:>10.2f}"
+                f"{result['journal_hits']:>6}{result['saved_s']:>10.2f}"
+            )
+        print(f"journal: {tool_journal.stats()}")
+
+    asyncio.run(main())
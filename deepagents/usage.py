@@ -0,0 +1,234 @@
+"""Token and cost accounting for deep agent runs.
+
+Usage is kept in the `usage` channel of `DeepAgentState`, so the totals are
+persisted with every checkpoint of the thread::
+
+    {
+        "total": {"calls": 3, "input_tokens": 1200, "output_tokens": 300, "total_tokens": 1500, "cost": 0.0},
+        "by_model": {"qwen-max": {...}},
+        "by_subagent": {"<tool_call_id>": {"name": "requirement_doc_agent", ...}},
+    }
+
+Every update written to the channel is a delta; `usage_reducer` adds it to the
+running totals.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence
+from typing_extensions import NotRequired, TypedDict
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable, RunnableLambda
+from langgraph.config import get_stream_writer
+
+
+class UsageBudget(TypedDict):
+    """Hard limits for a thread. A run stops gracefully once one is reached.
+
+    The call that crosses a limit completes (its usage is only known
+    afterwards); no model call starts once a limit is reached.
+    """
+
+    max_total_tokens: NotRequired[int]
+    max_cost: NotRequired[float]
+    max_calls: NotRequired[int]
+
+
+# {model_name: {"input": price per 1k input tokens, "output": price per 1k output tokens}}
+ModelPrices = Dict[str, Dict[str, float]]
+
+USAGE_FIELDS = ("calls", "input_tokens", "output_tokens", "total_tokens", "cost")
+
+
+def usage_reducer(l, r):
+    if l is None:
+        return r
+    if r is None:
+        return l
+    merged = dict(l)
+    for key, value in r.items():
+        if isinstance(value, dict):
+            merged[key] = usage_reducer(merged.get(key), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            merged[key] = merged.get(key, 0) + value
+        else:
+            merged[key] = value
+    return merged
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {field: 0 for field in USAGE_FIELDS}
+
+
+def _message_model_name(message: Any) -> str:
+    metadata = getattr(message, "response_metadata", None) or {}
+    return metadata.get("model_name") or metadata.get("model") or "unknown"
+
+
+def message_usage(message: Any, prices: Optional[ModelPrices] = None) -> Optional[Dict[str, Any]]:
+    """Usage totals for a single model response, or None if it has no usage."""
+    usage_metadata = getattr(message, "usage_metadata", None)
+    if not usage_metadata:
+        return None
+    input_tokens = usage_metadata.get("input_tokens", 0)
+    output_tokens = usage_metadata.get("output_tokens", 0)
+    price = (prices or {}).get(_message_model_name(message), {})
+    return {
+        "calls": 1,
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "total_tokens": usage_metadata.get("total_tokens", input_tokens + output_tokens),
+        "cost": (input_tokens * price.get("input", 0.0) + output_tokens * price.get("output", 0.0)) / 1000,
+    }
+
+
+def usage_delta(messages: Iterable[Any], prices: Optional[ModelPrices] = None) -> Dict[str, Any]:
+    """Aggregate the usage of `messages` into a delta for the `usage` channel."""
+    delta: Dict[str, Any] = {"total": _empty_totals(), "by_model": {}}
+    for message in messages:
+        if not isinstance(message, AIMessage):
+            continue
+        totals = message_usage(message, prices)
+        if totals is None:
+            continue
+        delta["total"] = usage_reducer(delta["total"], totals)
+        model_name = _message_model_name(message)
+        delta["by_model"][model_name] = usage_reducer(delta["by_model"].get(model_name), totals)
+    return delta
+
+
+def budget_exceeded(usage: Optional[Dict[str, Any]], budget: Optional[UsageBudget]) -> Optional[str]:
+    """Return a human readable reason if `usage` has reached `budget`."""
+    if not usage or not budget:
+        return None
+    total = usage.get("total", {})
+    if "max_total_tokens" in budget and total.get("total_tokens", 0) >= budget["max_total_tokens"]:
+        return f"token budget of {budget['max_total_tokens']} reached ({total.get('total_tokens', 0)} used)"
+    if "max_cost" in budget and total.get("cost", 0.0) >= budget["max_cost"]:
+        return f"cost budget of {budget['max_cost']} reached ({total.get('cost', 0.0):.4f} used)"
+    if "max_calls" in budget and total.get("calls", 0) >= budget["max_calls"]:
+        return f"model call budget of {budget['max_calls']} reached ({total.get('calls', 0)} used)"
+    return None
+
+
+def _write_usage_event(event: Dict[str, Any]) -> None:
+    try:
+        get_stream_writer()({"usage": event})
+    except Exception:
+        # Not running inside a graph stream
+        pass
+
+
+def create_usage_hook(
+    budget: Optional[UsageBudget] = None,
+    prices: Optional[ModelPrices] = None,
+    scope: str = "main",
+    name: Optional[str] = None,
+) -> Callable:
+    """Create a post model hook that records usage and enforces `budget`.
+
+    When the budget is reached the last model response is replaced by a final
+    answer without tool calls, so the agent loop ends instead of raising.
+    Usage events are tagged with `scope` and, for subagents, their `name`.
+    """
+    tags: Dict[str, Any] = {"scope": scope}
+    if name is not None:
+        tags["name"] = name
+
+    def usage_hook(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        messages = state.get("messages", [])
+        if not messages or not isinstance(messages[-1], AIMessage):
+            return None
+
+        last_message = messages[-1]
+        delta = usage_delta([last_message], prices)
+        usage = usage_reducer(state.get("usage"), delta)
+        _write_usage_event({**tags, "delta": delta["total"], "total": usage.get("total")})
+
+        update: Dict[str, Any] = {"usage": delta}
+        reason = budget_exceeded(usage, budget)
+        if reason and last_message.tool_calls:
+            update["messages"] = [
+                AIMessage(
+                    id=last_message.id,
+                    content=f"{last_message.content}\n\nStopped: {reason}.".strip(),
+                    response_metadata=last_message.response_metadata,
+                    usage_metadata=last_message.usage_metadata,
+                )
+            ]
+            _write_usage_event({**tags, "budget_exceeded": reason})
+        return update
+
+    return usage_hook
+
+
+def create_budget_gate(model: Any, budget: UsageBudget, tools: Sequence[Any] = ()) -> Callable:
+    """Dynamic model for `create_react_agent` that stops before a call once `budget` is reached.
+
+    The usage hook only sees a call after it was made, so a thread already at
+    its limit (from an earlier run, or a subagent's usage merged by `task`)
+    would make one more call. The gate answers such a turn itself with a
+    final message and no provider call. `model` is a chat model (bound to
+    `tools` here) or a dynamic model callable such as `ToolExposureCache.select_model`.
+    """
+    if isinstance(model, Runnable) or not callable(model):
+        bound = model.bind_tools(list(tools)) if tools else model
+
+        def select(state, runtime=None):
+            return bound
+    else:
+        select = model
+
+    def gate(state: Dict[str, Any], runtime: Any = None):
+        reason = budget_exceeded(state.get("usage"), budget)
+        if reason is None:
+            return select(state, runtime)
+        _write_usage_event({"scope": "main", "budget_exceeded": reason})
+        return RunnableLambda(lambda _input: AIMessage(content=f"Stopped: {reason}."))
+
+    return gate
+
+
+def chain_post_model_hooks(*hooks: Optional[Callable]) -> Optional[Callable]:
+    """Run several post model hooks in order and merge their updates.
+
+    Each hook sees the messages as rewritten by the previous hooks. `messages`
+    updates are concatenated (add_messages replaces by id), other keys are
+    overwritten by later hooks.
+    """
+    hooks = tuple(hook for hook in hooks if hook is not None)
+    if not hooks:
+        return None
+    if len(hooks) == 1:
+        return hooks[0]
+
+    def chained_hook(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        current = dict(state)
+        merged: Dict[str, Any] = {}
+        for hook in hooks:
+            update = hook(current)
+            if not update:
+                continue
+            for key, value in update.items():
+                if key == "messages":
+                    merged.setdefault("messages", []).extend(value)
+                    replaced = {m.id: m for m in value if getattr(m, "id", None)}
+                    current["messages"] = [replaced.get(getattr(m, "id", None), m) for m in current["messages"]]
+                else:
+                    merged[key] = value
+                    current[key] = value
+        return merged or None
+
+    return chained_hook
+
+
+def get_usage(agent, config) -> Dict[str, Any]:
+    """Usage totals persisted for the thread in `config`."""
+    state = agent.get_state(config)
+    return (state.values or {}).get("usage") or {"total": _empty_totals(), "by_model": {}, "by_subagent": {}}
+
+
+async def aget_usage(agent, config) -> Dict[str, Any]:
+    state = await agent.aget_state(config)
+    return (state.values or {}).get("usage") or {"total": _empty_totals(), "by_model": {}, "by_subagent": {}}
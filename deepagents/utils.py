@@ -15,22 +15,29 @@ def create_node_llm(node_config: dict, tools: Optional[list] = [], structured_ou
     Args:
         base_llm: 基础可配置 LLM
         node_config: 节点特定配置
+            - (optional) `cache`: 响应缓存配置, 见 deepagents/cache.py
+            - (optional) `endpoints` / `routing`: 多端点路由配置, 见 deepagents/routing.py
         tools: 节点特定工具列表
     
     Returns:
         配置好的 LLM 实例
     """
-    from langchain.chat_models import init_chat_model
-
     print(f"node_config: {node_config}")
-    configured_llm = init_chat_model(
-        model=node_config.get("model", None),
-        model_provider=node_config.get("model_provider", None),
-        temperature=node_config.get("temperature", None),
-        max_retries=node_config.get("max_retries", None),
-        api_key=node_config.get("api_key", None),
-        base_url=node_config.get("base_url", None)
-    )
+    if node_config.get("endpoints"):
+        # multi-endpoint routing with failover/hedging, see deepagents/routing.py
+        from deepagents.routing import create_routing_model
+        endpoint_configs = [{**node_config, **endpoint} for endpoint in node_config["endpoints"]]
+        configured_llm = create_routing_model(
+            [_init_node_chat_model(endpoint_config) for endpoint_config in endpoint_configs],
+            [f"{c.get('base_url')}|{c.get('model')}" for c in endpoint_configs],
+            node_config.get("routing"),
+        )
+    else:
+        configured_llm = _init_node_chat_model(node_config)
+    if node_config.get("cache"):
+        # opt-in exact-match response cache, see deepagents/cache.py
+        from deepagents.cache import create_cached_model
+        configured_llm = create_cached_model(configured_llm, node_config["cache"])
     # print(f"configured_llm: {configured_llm}")
     if tools:
         configured_llm = configured_llm.bind_tools(tools)
@@ -43,6 +50,28 @@ def create_node_llm(node_config: dict, tools: Optional[list] = [], structured_ou
     
     return configured_llm
 
+def _init_node_chat_model(node_config: dict):
+    from langchain.chat_models import init_chat_model
+    from deepagents.rate_limit import create_governed_model
+
+    extra_kwargs = {}
+    if node_config.get("model_provider") == "openai":
+        # usage_metadata on streamed responses, needed for token accounting
+        extra_kwargs["stream_usage"] = node_config.get("stream_usage", True)
+    chat_model = init_chat_model(
+        model=node_config.get("model", None),
+        model_provider=node_config.get("model_provider", None),
+        temperature=node_config.get("temperature", None),
+        max_retries=node_config.get("max_retries", None),
+        api_key=node_config.get("api_key", None),
+        base_url=node_config.get("base_url", None),
+        **extra_kwargs
+    )
+    # every provider call goes through the shared rate limiter, see deepagents/rate_limit.py
+    return create_governed_model(
+        chat_model, endpoint=node_config.get("base_url") or node_config.get("model_provider")
+    )
+
 def create_fully_inlined_schema(pydantic_model: type[BaseModel]) -> dict:
     """
     Generates a Pydantic schema and fully inlines all references to make it
@@ -18,6 +18,7 @@ from dotenv import load_dotenv
 from langchain_core.runnables import RunnableConfig
 from xlangguage_nodes.xlangguage_agent import xlangguage_agent
 from langgraph.checkpoint.memory import InMemorySaver
+from deepagents.stream_utils import init_stream_state, render_text_chunk
 
 load_dotenv()
 
@@ -97,7 +98,7 @@ class InterruptTestManager:
         print("🚀 开始正常执行测试...")
         self.log_execution('test_start', {'type': 'normal', 'input': user_input})
         
-        buffered_text = ""
+        text_state = init_stream_state()
         tool_call_chunks = {}
         printed_tool_calls = set()
         
@@ -118,15 +119,7 @@ class InterruptTestManager:
                     
                     # 处理助手文本内容
                     if hasattr(message_chunk, 'content') and message_chunk.content:
-                        current = message_chunk.content
-                        max_lcp = min(len(buffered_text), len(current))
-                        i = 0
-                        while i < max_lcp and buffered_text[i] == current[i]:
-                            i += 1
-                        delta = current[i:]
-                        if delta:
-                            print(delta, end="", flush=True)
-                        buffered_text = current
+                        render_text_chunk(message_chunk, text_state, lambda s: print(s, end="", flush=True))
                     
                     # 处理工具调用
                     addkw = getattr(message_chunk, 'additional_kwargs', {}) or {}
@@ -0,0 +1,73 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_openai import ChatOpenAI
+
+
+class StubLLM:
+    """OpenAI-compatible chat endpoint with injectable latency and failures."""
+
+    def __init__(self, reply: str, delay: float = 0.0, fail: bool = False):
+        self.reply, self.delay, self.fail = reply, delay, fail
+        self.calls = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                stub.calls += 1
+                time.sleep(stub.delay)
+                if stub.fail:
+                    self.send_response(500)
+                    self.send_header("Content-Type", "application/json")
+                    self.end_headers()
+                    self.wfile.write(b'{"error": {"message": "boom"}}')
+                    return
+                self.send_response(200)
+                if body.get("stream"):
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for i, piece in enumerate([stub.reply, ""]):
+                        chunk = {
+                            "id": "c", "object": "chat.completion.chunk", "created": 0, "model": "stub",
+                            "choices": [{"index": 0, "delta": {"content": piece} if piece else {},
+                                         "finish_reason": "stop" if i else None}],
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    return
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(json.dumps({
+                    "id": "c", "object": "chat.completion", "created": 0, "model": "stub",
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": stub.reply},
+                                 "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+                }).encode())
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def model(self):
+        return ChatOpenAI(model="stub", base_url=self.url, api_key="x", max_retries=0)
+
+
+@pytest.fixture
+def stubs():
+    started = []
+
+    def make(*args, **kwargs):
+        stub = StubLLM(*args, **kwargs)
+        started.append(stub)
+        return stub
+
+    yield make
+    for stub in started:
+        stub.server.shutdown()
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+
+import pytest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from deepagents.cache import (
+    CachedChatModel,
+    InMemoryResponseCache,
+    ResponseCache,
+    SQLiteResponseCache,
+    make_cache_key,
+)
+
+
+class _Provider(GenericFakeChatModel):
+    """Fake provider answering with the queued messages, counting calls (streaming included)."""
+
+    calls: int = 0
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+def _cached(replies, cache=None):
+    provider = _Provider(messages=iter(replies))
+    cache = cache if cache is not None else InMemoryResponseCache()
+    return CachedChatModel(inner=provider, response_cache=cache, only_deterministic=False, replay_chunk_size=4), provider
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def cache(request, tmp_path):
+    if request.param == "memory":
+        return InMemoryResponseCache()
+    return SQLiteResponseCache(str(tmp_path / "llm_cache.db"))
+
+
+def test_backends_are_abstract():
+    with pytest.raises(TypeError):
+        ResponseCache()
+
+
+def test_hit_and_miss(cache):
+    model, provider = _cached([AIMessage("first"), AIMessage("second")], cache)
+    assert model.invoke("雷达需求").content == "first"
+    replayed = model.invoke("雷达需求")
+    assert replayed.content == "first" and replayed.response_metadata["from_cache"]
+    assert model.invoke("系统架构").content == "second"
+    assert provider.calls == 2
+    assert cache.stats() == {"hits": 1, "misses": 2, "hit_rate": 1 / 3}
+
+
+def test_ttl_expiry(cache, monkeypatch):
+    import deepagents.cache as cache_module
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "time", lambda: now[0])
+    cache.ttl = 60
+    cache.set("k", {"v": 1})
+    now[0] += 59
+    assert cache.get("k") == {"v": 1}
+    now[0] += 2
+    assert cache.get("k") is None
+    # expired entries are dropped, not only hidden
+    now[0] = 1000.0
+    assert cache.get("k") is None
+
+
+def test_streamed_replay_matches_live_chunks(cache):
+    model, provider = _cached([AIMessage("流式输出的回答 streamed")], cache)
+
+    async def stream():
+        return [chunk async for chunk in model.astream("q")]
+
+    live = asyncio.run(stream())
+    replayed = asyncio.run(stream())
+    assert provider.calls == 1
+    assert all(isinstance(chunk, AIMessageChunk) for chunk in replayed)
+    assert len(replayed) > 1
+    assert "".join(chunk.content for chunk in replayed) == "".join(chunk.content for chunk in live)
+    assert any(chunk.response_metadata.get("from_cache") for chunk in replayed)
+
+
+def test_async_sqlite_cache_runs_off_the_event_loop(tmp_path):
+    cache = SQLiteResponseCache(str(tmp_path / "llm_cache.db"))
+    threads = []
+    original = cache._get
+
+    def tracked_get(key):
+        threads.append(threading.current_thread())
+        return original(key)
+
+    cache._get = tracked_get
+    model, _provider = _cached([AIMessage("answer")], cache)
+    asyncio.run(model.ainvoke("q"))
+    asyncio.run(model.ainvoke("q"))
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+
+
+def _tool_turn(call_id, result):
+    return [
+        HumanMessage("检索雷达需求"),
+        AIMessage("", tool_calls=[{"name": "cnki_search", "args": {"query": "雷达"}, "id": call_id}]),
+        ToolMessage(result, tool_call_id=call_id),
+    ]
+
+
+def test_tool_call_responses_stay_in_their_context(cache):
+    tool_call = AIMessage("", tool_calls=[{"name": "write_file", "args": {"path": "a.md"}, "id": "call_a"}])
+    model, provider = _cached([tool_call, AIMessage("other"), AIMessage("other tools")], cache)
+
+    first = model.invoke(_tool_turn("call_1", "论文 A"))
+    assert first.tool_calls[0]["name"] == "write_file"
+    # same conversation with other provider ids: served from the cache, as a new message
+    replayed = model.invoke(_tool_turn("call_2", "论文 A"))
+    assert replayed.tool_calls == first.tool_calls and replayed.id != first.id
+    # a different tool result is a different context
+    assert model.invoke(_tool_turn("call_1", "论文 B")).content == "other"
+    # and so is another set of bound tools
+    tools = [{"type": "function", "function": {"name": "ls", "parameters": {"type": "object", "properties": {}}}}]
+    assert model.bind(tools=tools).invoke(_tool_turn("call_1", "论文 A")).content == "other tools"
+    assert provider.calls == 3
+
+
+def test_cache_key_ignores_provider_ids_only():
+    params = {"model": "qwen-max", "temperature": 0}
+    key = make_cache_key(_tool_turn("call_1", "A"), params, None, {})
+    assert make_cache_key(_tool_turn("call_xyz", "A"), params, None, {}) == key
+    assert make_cache_key(_tool_turn("call_1", "A"), {**params, "temperature": 0.5}, None, {}) != key
+    assert make_cache_key(_tool_turn("call_1", "A"), params, ["\n"], {}) != key
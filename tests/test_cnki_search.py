@@ -0,0 +1,172 @@
+import asyncio
+import json
+import os
+import tempfile
+
+import httpx
+import pytest
+
+os.environ.setdefault("USER_DATA_DIR", tempfile.mkdtemp(prefix="cnki_test_"))
+
+from deepagents.cache import get_response_cache  # noqa: E402
+from xlangguage_nodes.tool import cnki_search as cnki  # noqa: E402
+
+
+class FakeGateway:
+    """CNKI gateway for httpx.MockTransport: JWT login plus the SSE chat endpoint."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.jwt_calls = 0
+        self.chat_calls = 0
+        self.fail_next = 0
+        self.revoked = set()
+        self.active = 0
+        self.max_active = 0
+        self.closed_streams = 0
+
+    def _parts(self, query):
+        parts = ["<think>", "thinking about ", query, "</think>", "\n\n", "answer for ", query]
+        if query.startswith("b"):
+            parts += ["\n\n", "shared background"]
+        return parts
+
+    def _route(self, request):
+        if request.url.path.endswith("/jwt"):
+            self.jwt_calls += 1
+            token = f"tok{self.jwt_calls}" + "x" * 20
+            return httpx.Response(200, json={"content": {"access_token": token, "expires_in": 7200}}), None
+        self.chat_calls += 1
+        if request.headers["Authorization"].split(" ")[-1] in self.revoked:
+            return httpx.Response(401), None
+        if self.fail_next:
+            self.fail_next -= 1
+            return httpx.Response(503), None
+        return None, json.loads(request.content)["messages"][0]["content"]
+
+    def handle(self, request):
+        response, query = self._route(request)
+        if response is not None:
+            return response
+        body = "".join(f"data:{json.dumps({'content': p})}\n\n" for p in self._parts(query)) + "data:[DONE]\n\n"
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=body.encode())
+
+    async def ahandle(self, request):
+        response, query = self._route(request)
+        if response is not None:
+            return response
+        gateway = self
+
+        async def stream():
+            gateway.active += 1
+            gateway.max_active = max(gateway.max_active, gateway.active)
+            try:
+                for part in self._parts(query):
+                    await asyncio.sleep(gateway.delay)
+                    yield f"data:{json.dumps({'content': part})}\n\n".encode()
+                yield b"data:[DONE]\n\n"
+            finally:
+                gateway.active -= 1
+                gateway.closed_streams += 1
+
+        return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, content=stream())
+
+
+@pytest.fixture
+def gateway(monkeypatch, tmp_path):
+    gateway = FakeGateway()
+    sync_client = httpx.Client(transport=httpx.MockTransport(gateway.handle))
+    async_clients = {}
+
+    def get_async_http_client():
+        loop = asyncio.get_running_loop()
+        if loop not in async_clients:
+            async_clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(gateway.ahandle))
+        return async_clients[loop]
+
+    monkeypatch.setattr(cnki, "get_http_client", lambda: sync_client)
+    monkeypatch.setattr(cnki, "get_async_http_client", get_async_http_client)
+    monkeypatch.setattr(cnki, "CNKI_RETRY_BACKOFF", 0.0)
+    monkeypatch.setattr(cnki, "token_manager", cnki.CNKITokenManager())
+    cache = get_response_cache({"backend": "memory", "name": f"cnki-{tmp_path.name}"})
+    monkeypatch.setattr(cnki, "answer_cache", cnki.CNKIAnswerCache(cache))
+    yield gateway
+    sync_client.close()
+
+
+def test_retries_503_before_any_content(gateway):
+    gateway.fail_next = 2
+    answer, error = cnki._search("雷达")
+    assert error is None and answer == "answer for 雷达"
+    assert gateway.chat_calls == 3
+
+    gateway.fail_next = cnki.CNKI_MAX_RETRIES + 1
+    assert asyncio.run(cnki._asearch("雷达")) == (None, "HTTP error: 503")
+
+
+def test_reauthenticates_once_on_401(gateway):
+    first = cnki.token_manager.get()
+    gateway.revoked.add(first)
+    answer, error = asyncio.run(cnki._asearch("雷达"))
+    assert error is None and answer == "answer for 雷达"
+    assert gateway.jwt_calls == 2
+    assert cnki.token_manager.get() != first
+
+
+def test_concurrent_token_refresh_is_single_flight(gateway):
+    async def run():
+        return await asyncio.gather(*(cnki.token_manager.aget() for _ in range(10)))
+
+    assert len(set(asyncio.run(run()))) == 1
+    assert gateway.jwt_calls == 1
+
+
+def test_identical_queries_share_one_request(gateway):
+    gateway.delay = 0.01
+
+    async def run():
+        return await asyncio.gather(*(cnki.answer_cache.asearch(q) for q in ["雷达需求", "雷达需求？", " 雷达需求 "]))
+
+    results = asyncio.run(run())
+    assert [answer for answer, _ in results] == ["answer for 雷达需求"] * 3
+    assert gateway.chat_calls == 1
+    assert cnki.answer_cache.stats()["coalesced"] == 2
+    # the answer is cached: neither the sync nor the async path asks the gateway again
+    assert cnki.answer_cache.search("雷达需求。") == ("answer for 雷达需求", None)
+    assert gateway.chat_calls == 1
+
+
+def test_cancelling_the_leader_releases_waiters(gateway):
+    gateway.delay = 0.05
+
+    async def run():
+        leader = asyncio.ensure_future(cnki.answer_cache.asearch("雷达"))
+        await asyncio.sleep(0.08)
+        waiter = asyncio.ensure_future(cnki.answer_cache.asearch("雷达"))
+        # let the waiter join the leader's request (the cache lookup runs in a thread)
+        while cnki.answer_cache.coalesced == 0:
+            await asyncio.sleep(0.005)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(run()) == (None, "Request failed: search cancelled")
+    assert cnki.answer_cache.stats()["inflight"] == 0
+    assert gateway.chat_calls == 1 and gateway.closed_streams == 1
+
+
+def test_batch_search_fans_out_and_dedupes(gateway, monkeypatch):
+    gateway.delay = 0.01
+    monkeypatch.setattr(cnki, "CNKI_BATCH_CONCURRENCY", 2)
+    call = {
+        "type": "tool_call", "id": "batch", "name": "cnki_batch_search",
+        "args": {"queries": ["b1", "b2", "B1？", "b3", ""]},
+    }
+    command = asyncio.run(cnki.cnki_batch_search.ainvoke(call))
+    assert gateway.chat_calls == 3
+    assert gateway.max_active == 2
+    assert sorted(command.update["files"]) == ["cnki_search_b1", "cnki_search_b2", "cnki_search_b3"]
+    text = command.update["messages"][0].content
+    assert text.count("shared background") == 1
+    assert text.index("[1] query: b1") < text.index("[2] query: b2") < text.index("[3] query: b3")
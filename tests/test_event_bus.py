@@ -0,0 +1,56 @@
+import asyncio
+
+from deepagents.event_bus import EventBus, coalesce_events
+
+
+def _usage(delta, **extra):
+    return {"type": "usage", "agent": None, "usage": {"scope": "main", "delta": delta, **extra}}
+
+
+def _files(added, updated, files):
+    return {"type": "file_delta", "agent": None, "added": added, "updated": updated, "files": files}
+
+
+def test_coalesce_sums_usage_deltas():
+    merged = coalesce_events(
+        _usage({"input_tokens": 10, "total_tokens": 15}, total={"total_tokens": 15}),
+        _usage({"input_tokens": 4, "output_tokens": 2, "total_tokens": 6}, total={"total_tokens": 21}),
+    )
+    assert merged["usage"]["delta"] == {"input_tokens": 14, "output_tokens": 2, "total_tokens": 21}
+    assert merged["usage"]["total"] == {"total_tokens": 21}
+
+
+def test_coalesce_keeps_usage_scopes_apart():
+    main = _usage({"total_tokens": 5})
+    subagent = {"type": "usage", "agent": None, "usage": {"scope": "subagent", "name": "a", "delta": {"total_tokens": 7}}}
+    assert coalesce_events(main, subagent) is None
+
+
+def test_coalesce_unions_file_paths():
+    merged = coalesce_events(_files(["a.md"], [], ["a.md"]), _files(["b.md"], ["a.md"], ["a.md", "b.md"]))
+    assert merged["added"] == ["a.md", "b.md"]
+    assert merged["updated"] == []
+    assert merged["files"] == ["a.md", "b.md"]
+
+    merged = coalesce_events(_files([], ["a.md"], ["a.md"]), _files([], ["b.md", "a.md"], ["a.md", "b.md"]))
+    assert merged["updated"] == ["a.md", "b.md"]
+
+
+def test_coalescing_sink_keeps_token_totals():
+    async def run():
+        bus = EventBus()
+        seen = []
+        release = asyncio.Event()
+
+        async def slow_sink(event):
+            await release.wait()
+            seen.append(event)
+
+        bus.add_sink(slow_sink, maxsize=1, policy="coalesce")
+        for _ in range(50):
+            await bus.publish(_usage({"total_tokens": 2}))
+        release.set()
+        await bus.close()
+        return sum(event["usage"]["delta"]["total_tokens"] for event in seen)
+
+    assert asyncio.run(run()) == 100
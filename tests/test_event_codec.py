@@ -0,0 +1,109 @@
+import dataclasses
+import json
+from datetime import datetime
+
+import pytest
+from langchain_core.messages import AIMessageChunk, ToolMessage
+
+from deepagents import event_codec
+from deepagents.event_codec import EventCodec, dumps, loads, project_event, project_message
+from deepagents.sse import serialize_stream_chunk
+
+RUN_ID = "run--b56ef970-8674-4a5d-b49b-cc5dbe69d3db"
+
+
+def _messages():
+    return [
+        AIMessageChunk(
+            content="电网安全系统需求",
+            id=RUN_ID,
+            response_metadata={"model_name": "qwen-max", "system_fingerprint": None, "service_tier": "default"},
+            additional_kwargs={"refusal": None},
+        ),
+        AIMessageChunk(
+            content="",
+            id=RUN_ID,
+            tool_call_chunks=[{"index": 0, "id": "call_1", "name": "task", "args": '{"description": "生成'}],
+        ),
+        AIMessageChunk(content="", id=RUN_ID, response_metadata={"finish_reason": "tool_calls", "logprobs": None}),
+        ToolMessage("Updated file /spec.md", tool_call_id="call_1", id="tool-1"),
+    ]
+
+
+def _full_payload(message):
+    """What the stream sent before projection: every field, through json.dumps(default=str)."""
+    additional_kwargs = dict(message.additional_kwargs or {})
+    if getattr(message, "tool_call_chunks", None):
+        additional_kwargs["tool_call_chunks"] = [dict(tc) for tc in message.tool_call_chunks]
+    if getattr(message, "tool_call_id", None):
+        additional_kwargs["tool_call_id"] = message.tool_call_id
+    payload = {
+        "id": message.id,
+        "content": message.content,
+        "type": {"AIMessageChunk": "ai"}.get(message.type, message.type),
+        "additional_kwargs": additional_kwargs,
+        "response_metadata": message.response_metadata or {},
+    }
+    return json.loads(json.dumps({"type": "message", "data": payload}, ensure_ascii=False, default=str))
+
+
+@pytest.mark.parametrize("message", _messages(), ids=["text", "tool_call_chunk", "finish", "tool_result"])
+def test_projected_message_matches_json_dumps_on_read_fields(message):
+    frame = EventCodec().sse_frame(7, *serialize_stream_chunk("messages", (message, {})))
+    head, event, data = frame.rstrip("\n").split("\n")
+    assert head == "id: 7" and event == "event: message"
+    projected = loads(data[len("data: "):])
+    full = _full_payload(message)
+
+    assert projected["type"] == "message"
+    for field in ("id", "content", "type"):
+        assert projected["data"][field] == full["data"][field]
+    # every field the frontend reads is kept with the same value; the rest is dropped
+    for section, fields in (
+        ("additional_kwargs", event_codec.MESSAGE_ADDITIONAL_KWARGS_FIELDS),
+        ("response_metadata", event_codec.MESSAGE_RESPONSE_METADATA_FIELDS),
+    ):
+        expected = {key: value for key, value in full["data"][section].items() if key in fields and value is not None}
+        if "tool_call_chunks" in expected:
+            expected["tool_call_chunks"] = [
+                {key: tc[key] for key in event_codec.TOOL_CALL_CHUNK_FIELDS} for tc in expected["tool_call_chunks"]
+            ]
+        assert projected["data"][section] == expected
+
+
+def test_typed_events_projected_on_declared_keys():
+    event = {"type": "text_delta", "agent": None, "message_id": RUN_ID, "text": "需求", "debug": object()}
+    assert project_event(event) == {"type": "text_delta", "agent": None, "message_id": RUN_ID, "text": "需求"}
+    # unknown types pass through untouched
+    assert project_event({"type": "other", "x": 1}) == {"type": "other", "x": 1}
+
+
+@dataclasses.dataclass
+class _Stray:
+    name: str
+
+
+def test_backend_output_matches_stdlib_json():
+    value = {
+        "text": "需求 \"quoted\" \n",
+        "numbers": [1, 2.5, -3, True, None],
+        "keys": {1: "one"},
+        "tuple": (1, "a"),
+        "when": datetime(2026, 1, 1, 8, 30),
+        "stray": _Stray("x"),
+        "message": _messages()[0],
+    }
+    reference = json.loads(json.dumps(value, ensure_ascii=False, default=event_codec._default))
+    assert loads(dumps(value)) == reference
+    assert reference["when"] == "2026-01-01 08:30:00" and reference["stray"] == "_Stray(name='x')"
+    assert reference["message"] == project_message(_messages()[0])
+
+
+def test_binary_frames_split_across_reads():
+    codec = EventCodec("json")
+    frames = [codec.binary_frame(i, "message", project_message(m)) for i, m in enumerate(_messages())]
+    stream = b"".join(frames)
+    decoded, remainder = codec.decode_binary_frames(stream[:-3])
+    assert len(decoded) == 3 and remainder == frames[-1][:-3]
+    decoded, remainder = codec.decode_binary_frames(remainder + stream[-3:])
+    assert remainder == b"" and decoded == [(3, "message", project_message(_messages()[3]))]
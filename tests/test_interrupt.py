@@ -0,0 +1,68 @@
+import time
+from typing import Annotated
+
+from langchain_core.messages import AIMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from langgraph.types import Command
+from typing_extensions import TypedDict
+
+from deepagents import interrupt as interrupt_module
+from deepagents.interrupt import approvals_reducer, clear_pending_approvals, create_interrupt_hook
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    approvals: Annotated[dict, approvals_reducer]
+
+
+_CONFIG = {"allow_accept": True, "allow_edit": True, "allow_respond": True, "allow_ignore": True}
+
+
+def _graph():
+    hook = create_interrupt_hook({"write_file": _CONFIG})
+    builder = StateGraph(State)
+    builder.add_node("hook", hook)
+    builder.add_edge(START, "hook")
+    builder.add_edge("hook", END)
+    return builder.compile(checkpointer=InMemorySaver())
+
+
+def _turn(call_id):
+    call = {"name": "write_file", "args": {"file_path": "a.md", "content": "x"}, "id": call_id}
+    return {"messages": [AIMessage("", tool_calls=[call], id=f"ai-{call_id}")]}
+
+
+def test_pending_interrupts_are_kept_per_thread():
+    graph = _graph()
+    t1, t2 = ({"configurable": {"thread_id": t}} for t in ("t1", "t2"))
+    graph.invoke(_turn("c1"), t1)
+    graph.invoke(_turn("c1"), t2)
+    assert set(interrupt_module._PENDING_SINCE) >= {"t1", "t2"}
+
+    time.sleep(0.05)
+    graph.invoke(Command(resume=[{"type": "accept", "args": None, "remember": True}]), t1)
+    assert "t1" not in interrupt_module._PENDING_SINCE
+    stats = graph.get_state(t1).values["approvals"]["stats"]
+    assert stats["interrupts"] == 1 and stats["human_wait_seconds"] >= 0.05
+
+    # the remembered decision avoids the next interrupt, saving about one average wait
+    graph.invoke(_turn("c2"), t1)
+    stats = graph.get_state(t1).values["approvals"]["stats"]
+    assert stats["interrupts_avoided"] == 1
+    assert stats["human_wait_removed_seconds"] == stats["human_wait_seconds"]
+
+    clear_pending_approvals("t2")
+    assert "t2" not in interrupt_module._PENDING_SINCE
+
+
+def test_unanswered_interrupts_expire(monkeypatch):
+    graph = _graph()
+    graph.invoke(_turn("c1"), {"configurable": {"thread_id": "abandoned"}})
+    assert "abandoned" in interrupt_module._PENDING_SINCE
+    monkeypatch.setattr(interrupt_module, "PENDING_APPROVAL_TTL", 0.0)
+    time.sleep(0.01)
+    graph.invoke(_turn("c1"), {"configurable": {"thread_id": "other"}})
+    assert "abandoned" not in interrupt_module._PENDING_SINCE
+    clear_pending_approvals("other")
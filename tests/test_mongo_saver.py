@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip("langgraph.checkpoint.mongodb")
+mongomock = pytest.importorskip("mongomock")
+import mongomock.gridfs  # noqa: E402
+from langgraph.checkpoint.base import empty_checkpoint  # noqa: E402
+
+from deepagents.mongo_saver import GridFSOffloadSerializer, OptimizedMongoDBSaver  # noqa: E402
+
+BIG = "需求文档 " * 200
+
+
+@pytest.fixture
+def saver():
+    mongomock.gridfs.enable_gridfs_integration()
+    return OptimizedMongoDBSaver(mongomock.MongoClient(), gridfs_threshold=512)
+
+
+def _config(thread_id, checkpoint_ns=""):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns}}
+
+
+def _put(saver, config, step, **values):
+    """Store one checkpoint after `config`; returns the config pointing at it.
+
+    (Checkpoints are written with `put` directly: mongomock cannot run the
+    `bulk_write` of `put_writes` with recent pymongo versions.)
+    """
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    checkpoint["channel_versions"] = {channel: step + 2 for channel in values}
+    return saver.put(config, checkpoint, {"source": "loop", "step": step}, checkpoint["channel_versions"])
+
+
+def _blobs(saver):
+    return saver.serde.files.count_documents({})
+
+
+def test_large_values_are_offloaded_once(saver):
+    config = _config("t")
+    for step in range(3):
+        config = _put(saver, config, step, messages=["q"] * (step + 1), files={"/spec.md": [BIG]})
+
+    # the unchanged files dict is stored once however many checkpoints reference it
+    assert _blobs(saver) == 1
+    for doc in saver.checkpoint_collection.find({}, {"checkpoint": 1, "type": 1}):
+        assert len(doc["checkpoint"]) < 512 and "|gridfs:" in doc["type"]
+    values = saver.get_tuple(_config("t")).checkpoint["channel_values"]
+    assert values == {"messages": ["q", "q", "q"], "files": {"/spec.md": [BIG]}}
+    # the parent checkpoint reads back through the same blob
+    history = list(saver.list(_config("t")))
+    assert len(history) == 3 and history[-1].checkpoint["channel_values"]["files"] == {"/spec.md": [BIG]}
+
+
+def test_large_pending_write_round_trips(saver):
+    serde = saver.serde
+    type_, data = serde.dumps_typed({"/spec.md": [BIG]})
+    assert data == b"" and "|gridfs-blob:" in type_
+    assert serde.loads_typed((type_, data)) == {"/spec.md": [BIG]}
+    # small values are left to the inner serializer
+    assert serde.dumps_typed("short") == serde.inner.dumps_typed("short")
+
+
+def test_get_channel_values_reads_only_requested_blobs(saver, monkeypatch):
+    _put(saver, _config("t"), 0, messages=["q1", "reply1"], files={"/spec.md": [BIG]})
+    fetched = []
+    original = GridFSOffloadSerializer._fetch
+    monkeypatch.setattr(
+        GridFSOffloadSerializer, "_fetch", lambda self, ref: fetched.append(ref) or original(self, ref)
+    )
+
+    assert saver.get_channel_values(_config("t"), ["messages"]) == {"messages": ["q1", "reply1"]}
+    assert fetched == []
+    assert saver.last_message("t") == "reply1"
+    assert saver.get_channel_values(_config("t"), ["files"]) == {"files": {"/spec.md": [BIG]}}
+    assert len(fetched) == 1
+    assert saver.get_channel_values(_config("missing"), ["messages"]) is None
+
+
+def test_list_threads_newest_first_and_paged(saver):
+    configs = {thread_id: _put(saver, _config(thread_id), 0, messages=["q"]) for thread_id in ("a", "b", "c")}
+    _put(saver, configs["a"], 1, messages=["q", "a"])
+    # subgraph checkpoints are not threads of their own
+    _put(saver, _config("b", "tools:1"), 0, messages=["q"])
+
+    threads = saver.list_threads()
+    assert [t["thread_id"] for t in threads] == ["a", "c", "b"]
+    assert threads[0]["checkpoints"] == 2 and threads[1]["checkpoints"] == 1
+    assert threads[0]["metadata"] == {"source": "loop", "step": 1}
+    assert threads[0]["checkpoint_id"] == saver.get_checkpoint_metadata(_config("a"))["checkpoint_id"]
+    assert saver.get_checkpoint_metadata(_config("a"))["parent_checkpoint_id"] == configs["a"]["configurable"]["checkpoint_id"]
+
+    page = saver.list_threads(limit=2)
+    assert [t["thread_id"] for t in page] == ["a", "c"]
+    rest = saver.list_threads(limit=2, before=page[-1]["checkpoint_id"])
+    assert [t["thread_id"] for t in rest] == ["b"]
+
+
+def test_gc_blobs_keeps_referenced_blobs(saver):
+    _put(saver, _config("keep"), 0, files={"/spec.md": [BIG]})
+    _put(saver, _config("drop"), 0, files={"/other.md": [BIG]})
+    assert _blobs(saver) == 2
+
+    saver.delete_thread("drop")
+    # too young to be collected: a writer may be about to reference it
+    assert saver.gc_blobs(min_age_seconds=3600)["blobs_deleted"] == 0
+    report = saver.gc_blobs(min_age_seconds=-1)
+    assert report["blobs_deleted"] == 1 and report["reclaimed_bytes"] > 0
+    assert _blobs(saver) == 1
+    assert saver.get_channel_values(_config("keep"), ["files"]) == {"files": {"/spec.md": [BIG]}}
+
+    # a collected blob is stored again when a new checkpoint needs it
+    _put(saver, _config("drop"), 0, files={"/other.md": [BIG]})
+    assert _blobs(saver) == 2
+    assert saver.get_channel_values(_config("drop"), ["files"]) == {"files": {"/other.md": [BIG]}}
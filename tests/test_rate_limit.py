@@ -0,0 +1,143 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from deepagents import rate_limit
+from deepagents.rate_limit import PRIORITIES, ModelCallGovernor, create_governed_model
+
+
+class Outline(BaseModel):
+    title: str
+    sections: int
+
+
+@pytest.fixture
+def governor(monkeypatch):
+    governor = ModelCallGovernor(max_in_flight=4)
+    monkeypatch.setattr(rate_limit, "_GOVERNOR", governor)
+    return governor
+
+
+def test_structured_output_goes_through_governor(stubs, governor):
+    stub = stubs('{"title": "需求文档", "sections": 3}')
+    model = create_governed_model(stub.model(), "stub")
+
+    assert model.with_structured_output(Outline).invoke("outline") == Outline(title="需求文档", sections=3)
+    raw = model.with_structured_output(Outline, include_raw=True).invoke("outline")
+    assert raw["parsed"] == Outline(title="需求文档", sections=3)
+    assert raw["parsing_error"] is None
+    assert stub.calls == 2
+    assert governor.metrics()["admitted"] == 2
+
+
+def test_bind_tools_keeps_wrapper(stubs, governor):
+    stub = stubs("done")
+    model = create_governed_model(stub.model(), "stub")
+
+    bound = model.bind_tools([Outline])
+    assert bound.bound is model
+    assert bound.kwargs["tools"][0]["function"]["name"] == "Outline"
+    assert bound.invoke("outline").content == "done"
+    assert governor.metrics()["admitted"] == 1
+
+
+def test_release_wakes_the_next_call_at_once():
+    governor = ModelCallGovernor(max_in_flight=1)
+
+    async def run():
+        first = await governor.aacquire("e", 1, 0)
+        waiter = asyncio.ensure_future(governor.aacquire("e", 1, 0))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        released = time.monotonic()
+        governor.release(first)
+        await waiter
+        return time.monotonic() - released
+
+    assert asyncio.run(run()) < 0.05
+    assert governor.metrics()["in_flight"] == {"e": 1}
+
+
+def test_release_from_another_thread_wakes_sync_and_async_callers():
+    governor = ModelCallGovernor(max_in_flight=1)
+    first = governor.acquire("e", 1, 0)
+    timer = threading.Timer(0.05, governor.release, args=(first,))
+    timer.start()
+    started = time.monotonic()
+    second = governor.acquire("e", 1, 0)
+    assert time.monotonic() - started < 0.15
+
+    async def run():
+        threading.Timer(0.05, governor.release, args=(second,)).start()
+        await governor.aacquire("e", 1, 0)
+
+    started = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - started < 0.15
+
+
+def test_interactive_calls_go_before_background():
+    governor = ModelCallGovernor(max_in_flight=1)
+    order = []
+
+    async def call(name, priority):
+        ticket = await governor.aacquire("e", 1, PRIORITIES[priority])
+        order.append(name)
+        await asyncio.sleep(0.01)
+        governor.release(ticket)
+
+    async def run():
+        holder = await governor.aacquire("e", 1, 0)
+        calls = [asyncio.ensure_future(call(f"background{i}", "background")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        calls += [asyncio.ensure_future(call(f"interactive{i}", "interactive")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        governor.release(holder)
+        await asyncio.gather(*calls)
+
+    asyncio.run(run())
+    assert order == ["interactive0", "interactive1", "background0", "background1"]
+    waits = governor.metrics()["queue_wait"]
+    assert waits["interactive"]["count"] == 3 and waits["background"]["count"] == 2
+
+
+def test_token_bucket_settles_actual_usage_on_release():
+    governor = ModelCallGovernor(tokens_per_minute=6000)  # 100 tokens/s, burst 6000
+    bucket = governor.token_bucket
+
+    ticket = governor.acquire("e", 1000, 0)
+    assert bucket.tokens == pytest.approx(5000, abs=5)
+    # the call used more than estimated: the debt is charged
+    governor.release(ticket, actual_tokens=4000)
+    assert bucket.tokens == pytest.approx(2000, abs=5)
+
+    ticket = governor.acquire("e", 1000, 0)
+    # and less: the difference is credited back
+    governor.release(ticket, actual_tokens=200)
+    assert bucket.tokens == pytest.approx(1800, abs=5)
+
+    # in debt, the next call waits for the exact refill time
+    ticket = governor.acquire("e", 1800, 0)
+    governor.release(ticket, actual_tokens=1810)
+    started = time.monotonic()
+    governor.release(governor.acquire("e", 10, 0))
+    assert 0.15 < time.monotonic() - started < 0.4
+
+
+def test_credit_wakes_a_call_waiting_on_the_bucket():
+    governor = ModelCallGovernor(tokens_per_minute=600)  # 10 tokens/s
+
+    async def run():
+        holder = await governor.aacquire("a", 600, 0)
+        waiter = asyncio.ensure_future(governor.aacquire("b", 100, 0))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        released = time.monotonic()
+        governor.release(holder, actual_tokens=100)
+        await waiter
+        return time.monotonic() - released
+
+    assert asyncio.run(run()) < 0.05
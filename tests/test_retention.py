@@ -0,0 +1,217 @@
+import asyncio
+import operator
+import time
+from typing import Annotated
+
+import mongomock
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, interrupt
+from typing_extensions import NotRequired, TypedDict
+
+from deepagents.retention import PRESERVED_WRITE_CHANNELS, MongoCheckpointPruner, SQLiteCheckpointPruner
+from deepagents.tool_journal import MongoToolJournal, SQLiteToolJournal
+
+
+class State(TypedDict):
+    log: Annotated[list, operator.add]
+    ask: NotRequired[bool]
+
+
+def _graph(checkpointer):
+    def step(state):
+        return {"log": [f"step{len(state['log'])}"]}
+
+    def ask(state):
+        if not state.get("ask"):
+            return {}
+        return {"log": [f"approved:{interrupt('approve?')}"], "ask": False}
+
+    builder = StateGraph(State)
+    builder.add_node("step", step)
+    builder.add_node("ask", ask)
+    builder.add_edge(START, "step")
+    builder.add_edge("step", "ask")
+    builder.add_edge("ask", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def _run(path, thread_id, *inputs):
+    """Run every input on `thread_id`; returns the final state values."""
+
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            graph = _graph(saver)
+            for input_ in inputs:
+                await graph.ainvoke(input_, _config(thread_id))
+            return (await graph.aget_state(_config(thread_id))).values
+
+    return asyncio.run(run())
+
+
+def _rows(pruner, thread_id):
+    return {row["id"]: row for row in pruner._checkpoints(thread_id)}
+
+
+def test_keep_last_keeps_newest_and_state(tmp_path):
+    path = str(tmp_path / "memory.db")
+    before = _run(path, "t", *[{"log": ["in"]}] * 4)
+
+    pruner = SQLiteCheckpointPruner(path)
+    ids = sorted(_rows(pruner, "t"))
+    report = pruner.apply({"*": {"keep_last": 2}})
+    assert report["checkpoints_kept"] == 2
+    assert report["checkpoints_deleted"] == len(ids) - 2
+    assert sorted(_rows(pruner, "t")) == ids[-2:]
+    # nothing dropped from a kept checkpoint: no orphan writes
+    assert {row["id"] for row in pruner._writes("t")} <= set(ids[-2:])
+    pruner.close()
+
+    assert _run(path, "t") == before
+
+
+def test_keep_terminal_keeps_the_end_of_every_run(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _run(path, "t", *[{"log": ["in"]}] * 3)
+
+    pruner = SQLiteCheckpointPruner(path)
+    rows = _rows(pruner, "t")
+    terminal = {row["parent"] for row in rows.values() if row["source"] == "input" and row["parent"]}
+    assert len(terminal) == 2
+    pruner.apply({"*": {"keep_last": 1, "keep_terminal": True}})
+    assert set(_rows(pruner, "t")) == terminal | {max(rows)}
+    pruner.close()
+
+
+def test_interrupted_thread_resumes_after_pruning(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _run(path, "t", {"log": ["in"]}, {"log": ["in"], "ask": True})
+
+    pruner = SQLiteCheckpointPruner(path)
+    report = pruner.apply({"*": {"keep_last": 1, "compact_writes": True}})
+    assert report["checkpoints_kept"] == 1
+    assert any(row["channel"] == "__interrupt__" for row in pruner._writes("t"))
+    pruner.close()
+
+    values = _run(path, "t", Command(resume="yes"))
+    assert values["log"][-1] == "approved:yes"
+
+
+def test_keep_interrupts_keeps_answered_interrupts(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _run(path, "t", {"log": ["in"], "ask": True}, Command(resume="yes"), {"log": ["in"]})
+
+    pruner = SQLiteCheckpointPruner(path)
+    interrupted = {row["id"] for row in pruner._writes("t") if row["channel"] == "__interrupt__"}
+    assert interrupted
+    plan = pruner.plan("t", {"keep_last": 1})
+    assert interrupted <= {id_ for _ns, id_ in plan["checkpoints"]}
+
+    pruner.apply({"*": {"keep_last": 1, "keep_interrupts": True}})
+    assert interrupted <= set(_rows(pruner, "t"))
+    assert interrupted <= {row["id"] for row in pruner._writes("t") if row["channel"] == "__interrupt__"}
+    pruner.close()
+
+
+def test_compact_writes_keeps_only_needed_writes(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _run(path, "t", {"log": ["in"], "ask": True}, Command(resume="yes"))
+
+    pruner = SQLiteCheckpointPruner(path)
+    newest = max(_rows(pruner, "t"))
+    checkpoints = len(_rows(pruner, "t"))
+    report = pruner.apply({"*": {"keep_last": 100, "compact_writes": True}})
+    assert report["checkpoints_deleted"] == 0 and report["writes_deleted"] > 0
+    assert len(_rows(pruner, "t")) == checkpoints
+    for row in pruner._writes("t"):
+        assert row["id"] == newest or row["channel"] in PRESERVED_WRITE_CHANNELS
+    pruner.close()
+
+
+def test_ttl_expires_whole_thread_with_journal(tmp_path):
+    path = str(tmp_path / "memory.db")
+    _run(path, "sub_agent_old", {"log": ["in"]})
+    _run(path, "main", {"log": ["in"]})
+    journal = SQLiteToolJournal(path)
+    journal.put("sub_agent_old", "call_1", "cnki_search", "papers")
+
+    policies = {"sub_agent_*": {"keep_last": 1, "ttl_seconds": 60}, "*": {"keep_last": 5}}
+    pruner = SQLiteCheckpointPruner(path)
+    dry = pruner.apply(policies, dry_run=True, now=time.time() + 120)
+    assert dry["threads_expired"] == 1 and set(pruner.threads()) == {"sub_agent_old", "main"}
+
+    report = pruner.apply(policies, now=time.time() + 120)
+    assert report["threads_expired"] == 1
+    assert pruner.threads() == ["main"]
+    assert journal.get("sub_agent_old", "call_1") is None
+    pruner.close()
+
+
+def test_journal_pruned_before_oldest_kept_checkpoint(tmp_path):
+    path = str(tmp_path / "memory.db")
+    journal = SQLiteToolJournal(path)
+    _run(path, "t", {"log": ["in"]})
+    journal.put("t", "old_call", "cnki_search", "old")
+    time.sleep(0.01)
+    _run(path, "t", {"log": ["in"]}, {"log": ["in"]})
+    journal.put("t", "recent_call", "cnki_search", "recent")
+
+    pruner = SQLiteCheckpointPruner(path)
+    report = pruner.apply({"*": {"keep_last": 2}})
+    pruner.close()
+    assert report["journal_entries_deleted"] == 1
+    assert journal.get("t", "old_call") is None
+    assert journal.get("t", "recent_call")[0] == "recent"
+
+
+def _mongo_thread(database, serde, thread_id, ids, interrupt_at=None):
+    """Checkpoints (and one write each) as langgraph-checkpoint-mongodb stores them."""
+    parent = None
+    for id_ in ids:
+        database["checkpoints"].insert_one({
+            "thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": id_, "parent_checkpoint_id": parent,
+            "type": "msgpack", "checkpoint": b"x" * 100,
+            "metadata": {"source": list(serde.dumps_typed("input" if parent is None else "loop"))},
+        })
+        channel = "__interrupt__" if id_ == interrupt_at else "log"
+        database["checkpoint_writes"].insert_one({
+            "thread_id": thread_id, "checkpoint_ns": "", "checkpoint_id": id_, "task_id": "task", "idx": 0,
+            "channel": channel, "type": "msgpack", "value": b"y",
+        })
+        parent = id_
+
+
+def test_mongo_pruner(monkeypatch):
+    serde = JsonPlusSerializer()
+    database = mongomock.MongoClient()["checkpointing_db"]
+    journal = MongoToolJournal(database["tool_journal"])
+    ids = [str(uuid6()) for _ in range(5)]
+    _mongo_thread(database, serde, "main", ids, interrupt_at=ids[1])
+    _mongo_thread(database, serde, "sub_agent_x", [str(uuid6()) for _ in range(2)])
+    journal.put("sub_agent_x", "call_1", "cnki_search", "papers")
+
+    pruner = MongoCheckpointPruner(
+        database["checkpoints"], database["checkpoint_writes"], serde=serde, batch_size=2, tool_journal=journal
+    )
+    # mongomock has no collStats
+    monkeypatch.setattr(pruner, "storage_bytes", lambda: 0)
+    assert _rows(pruner, "main")[ids[0]]["source"] == "input"
+
+    policies = {
+        "sub_agent_*": {"keep_last": 1, "ttl_seconds": 60},
+        "*": {"keep_last": 2, "keep_interrupts": True, "compact_writes": True},
+    }
+    report = pruner.apply(policies, now=time.time() + 120)
+    assert report["threads_expired"] == 1
+    assert sorted(pruner.threads()) == ["main"]
+    assert journal.get("sub_agent_x", "call_1") is None
+    assert set(_rows(pruner, "main")) == {ids[1], ids[3], ids[4]}
+    assert {(row["id"], row["channel"]) for row in pruner._writes("main")} == {
+        (ids[1], "__interrupt__"), (ids[4], "log")
+    }
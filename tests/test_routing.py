@@ -0,0 +1,49 @@
+import asyncio
+import time
+import uuid
+
+from deepagents.routing import create_routing_model, get_endpoint_health
+
+
+def _router(*stubs, **routing):
+    names = [f"stub-{uuid.uuid4().hex[:8]}" for _ in stubs]
+    return create_routing_model([s.model() for s in stubs], names, routing), names
+
+
+def test_fails_over_to_next_endpoint(stubs):
+    primary, backup = stubs("primary", fail=True), stubs("backup")
+    router, names = _router(primary, backup, failure_threshold=1)
+    assert router.invoke("hi").content == "backup"
+    assert get_endpoint_health(names[0]).state == "open"
+    # the open breaker keeps the primary out of the next call
+    assert asyncio.run(router.ainvoke("hi")).content == "backup"
+    assert primary.calls == 1
+
+
+def test_hedges_a_slow_primary(stubs):
+    primary, backup = stubs("primary", delay=1.0), stubs("backup")
+    router, names = _router(primary, backup, hedge=True, hedge_min_delay=0.05)
+    for _ in range(10):
+        get_endpoint_health(names[0]).record_success(0.05)
+
+    started = time.monotonic()
+    assert asyncio.run(router.ainvoke("hi")).content == "backup"
+    started_stream = time.monotonic()
+    text = "".join(chunk.content for chunk in router.stream("hi"))
+    assert text == "primary"  # sync streaming does not hedge
+    assert started_stream - started < 0.8
+
+
+def test_only_attempted_endpoints_take_the_probe(stubs):
+    primary, backup = stubs("primary"), stubs("backup")
+    router, names = _router(primary, backup, cooldown=0.01)
+    backup_health = get_endpoint_health(names[1])
+    backup_health.record_failure()
+    backup_health.state, backup_health.opened_at = "open", time.monotonic() - 1
+
+    assert router.invoke("hi").content == "primary"
+    assert asyncio.run(router.ainvoke("hi")).content == "primary"
+    # the backup was never called, so its half-open probe is still unused
+    assert backup_health.state == "open"
+    assert backup_health.acquire()
+    assert backup.calls == 0
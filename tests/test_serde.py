@@ -0,0 +1,134 @@
+import math
+from datetime import datetime, timezone
+
+import pytest
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, SystemMessage, ToolMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import END, START, StateGraph
+from langgraph.types import Command, Interrupt, Send, interrupt
+from typing_extensions import TypedDict
+
+from deepagents.serde import COMPACT_TYPE, CompactDeepAgentSerializer
+
+SPEC = "## 雷达系统需求\n" + "探测距离不小于 200 km。" * 50
+
+
+def _messages():
+    return [
+        SystemMessage("你是需求分析助手"),
+        HumanMessage("写一份雷达需求", id="h1"),
+        AIMessage(
+            "",
+            id="a1",
+            tool_calls=[{"name": "write_file", "args": {"file_path": "/spec.md", "content": SPEC}, "id": "call_1"}],
+            usage_metadata={"input_tokens": 1200, "output_tokens": 300, "total_tokens": 1500},
+            response_metadata={"finish_reason": "tool_calls", "model_name": "qwen-max"},
+        ),
+        ToolMessage("Updated file /spec.md", tool_call_id="call_1", name="write_file", id="t1"),
+        AIMessageChunk("完成", id="a2"),
+    ]
+
+
+def _state():
+    return {
+        "messages": _messages(),
+        "files": {"/spec.md": [SPEC, SPEC + "\n## 修订"], "/notes.md": ["短"]},
+        "todos": [
+            {"content": "写需求", "status": "completed"},
+            {"content": "评审", "status": "in_progress"},
+        ],
+        "usage": {
+            "total": {"input_tokens": 1200, "output_tokens": 300, "cost": 0.0125},
+            "by_subagent": {"research-agent": {"input_tokens": 10, "latency": 1.5}},
+        },
+    }
+
+
+@pytest.fixture(params=[None, "zlib"], ids=["plain", "zlib"])
+def serde(request):
+    return CompactDeepAgentSerializer(compression=request.param)
+
+
+def _round_trip(serde, value):
+    type_, data = serde.dumps_typed(value)
+    assert type_ == COMPACT_TYPE
+    return serde.loads_typed((type_, data))
+
+
+def test_deep_agent_state_round_trips(serde):
+    state = _state()
+    revived = _round_trip(serde, state)
+    assert revived == state
+    assert [type(message) for message in revived["messages"]] == [type(message) for message in state["messages"]]
+    assert revived["messages"][2].tool_calls == state["messages"][2].tool_calls
+    assert revived["messages"][2].usage_metadata == state["messages"][2].usage_metadata
+    assert revived["messages"][3].tool_call_id == "call_1"
+
+
+def test_repeated_strings_are_stored_once():
+    serde = CompactDeepAgentSerializer()
+    _type, data = serde.dumps_typed(_state())
+    # SPEC (tool call args and first file version) once, plus the revised version
+    assert data.count("探测距离不小于 200 km。".encode("utf-8")) == 2 * 50
+    default = JsonPlusSerializer().dumps_typed(_state())[1]
+    assert len(data) < len(default)
+
+
+def test_zlib_only_above_threshold():
+    serde = CompactDeepAgentSerializer(compression="zlib", compression_threshold=1024)
+    small = serde.dumps_typed({"todos": []})[1]
+    large = serde.dumps_typed(_state())[1]
+    assert small[4] == 0 and large[4] == 1
+    assert serde.loads_typed((COMPACT_TYPE, large)) == _state()
+    # a reader without compression configured still reads compressed payloads
+    assert CompactDeepAgentSerializer().loads_typed((COMPACT_TYPE, large)) == _state()
+
+
+def test_values_json_cannot_hold(serde):
+    when = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    value = {
+        "interrupts": (Interrupt(value="approve?", id="i1"),),
+        "sends": [Send("research-agent", {"description": "调研"})],
+        "when": when,
+        "tuple": (1, "a"),
+        "set": {1, 2},
+        "bytes": b"\x00\x01",
+        "keys": {1: "one"},
+        "floats": [0.1, float("inf"), float("-inf")],
+    }
+    revived = _round_trip(serde, value)
+    assert revived == value
+    nan = _round_trip(serde, {"usage": {"cost": float("nan")}})["usage"]["cost"]
+    assert isinstance(nan, float) and math.isnan(nan)
+
+
+def test_fallback_encodings_and_foreign_payloads():
+    serde = CompactDeepAgentSerializer()
+    default = JsonPlusSerializer()
+    assert serde.dumps_typed(None) == default.dumps_typed(None)
+    assert serde.dumps_typed(b"raw") == default.dumps_typed(b"raw")
+    # data written before the compact serde was configured keeps loading
+    assert serde.loads_typed(default.dumps_typed(_state())) == _state()
+    assert serde.loads_document(default.dumps_typed(_state())) is None
+
+
+class State(TypedDict):
+    answer: str
+
+
+def test_interrupted_graph_resumes(serde):
+    def ask(state):
+        return {"answer": interrupt({"question": "批准写入 /spec.md?"})}
+
+    builder = StateGraph(State)
+    builder.add_node("ask", ask)
+    builder.add_edge(START, "ask")
+    builder.add_edge("ask", END)
+    graph = builder.compile(checkpointer=InMemorySaver(serde=serde))
+    config = {"configurable": {"thread_id": "t"}}
+
+    paused = graph.invoke({"answer": ""}, config)
+    assert paused["__interrupt__"][0].value == {"question": "批准写入 /spec.md?"}
+    assert graph.get_state(config).interrupts[0].value == {"question": "批准写入 /spec.md?"}
+    assert graph.invoke(Command(resume="批准"), config) == {"answer": "批准"}
@@ -0,0 +1,175 @@
+import asyncio
+import operator
+import sqlite3
+from typing import Annotated
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from deepagents.sqlite_saver import TunedAsyncSqliteSaver
+
+
+class State(TypedDict):
+    log: Annotated[list, operator.add]
+
+
+def _graph(checkpointer):
+    builder = StateGraph(State)
+    builder.add_node("step", lambda state: {"log": [f"step{len(state['log'])}"]})
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _config(thread_id):
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+
+
+def _checkpoint(step):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"step": step}
+    return checkpoint
+
+
+async def _put(saver, config, step):
+    return await saver.aput(config, _checkpoint(step), {"source": "loop", "step": step}, {})
+
+
+def test_concurrent_writes_share_commits(tmp_path):
+    async def run():
+        saver = TunedAsyncSqliteSaver(str(tmp_path / "memory.db"), commit_interval=0.01)
+        configs = await asyncio.gather(*(_put(saver, _config(f"t{i}"), 0) for i in range(20)))
+        stats = saver.stats()
+        for i, config in enumerate(configs):
+            stored = await saver.aget_tuple(_config(f"t{i}"))
+            assert stored.config["configurable"]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+        await saver.aclose()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["batched_writes"] == 20 and stats["batches"] < 20 and stats["pending"] == 0
+
+
+def test_read_after_queued_write_sees_it(tmp_path):
+    async def run():
+        # a commit interval no test waits for: only flush-before-read commits
+        saver = TunedAsyncSqliteSaver(str(tmp_path / "memory.db"), commit_interval=30)
+        await saver.setup()
+        config = _config("t")
+        for step in range(5):
+            put = asyncio.ensure_future(_put(saver, config, step))
+            await asyncio.sleep(0)
+            assert not put.done() and saver.stats()["pending"] == 1
+            stored = await saver.aget_tuple(_config("t"))
+            config = await put
+            assert stored.checkpoint["channel_values"] == {"step": step}
+            assert stored.config["configurable"]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+        # another thread's read does not commit this thread's queued write
+        put = asyncio.ensure_future(_put(saver, config, 5))
+        await asyncio.sleep(0)
+        assert await saver.aget_tuple(_config("other")) is None
+        assert saver.stats()["pending"] == 1
+        history = [item async for item in saver.alist(_config("t"))]
+        assert (await put) and len(history) == 6
+        await saver.aclose()
+
+    asyncio.run(run())
+
+
+def test_concurrent_writes_and_reads_on_one_thread(tmp_path):
+    async def run():
+        saver = TunedAsyncSqliteSaver(str(tmp_path / "memory.db"), readers=2, commit_interval=0.001)
+        written = []
+
+        async def writer():
+            config = _config("t")
+            for step in range(30):
+                config = await _put(saver, config, step)
+                written.append(step)
+
+        async def reader():
+            seen = -1
+            while len(written) < 30:
+                floor = written[-1] if written else -1
+                stored = await saver.aget_tuple(_config("t"))
+                if stored is not None:
+                    step = stored.checkpoint["channel_values"]["step"]
+                    # never older than a write that returned before the read started
+                    assert step >= max(seen, floor)
+                    seen = step
+                await asyncio.sleep(0)
+
+        await asyncio.gather(writer(), reader(), reader())
+        await saver.aclose()
+
+    asyncio.run(run())
+
+
+def test_failed_write_only_fails_its_own_call(tmp_path):
+    async def run():
+        saver = TunedAsyncSqliteSaver(str(tmp_path / "memory.db"), commit_interval=0.01)
+        broken = _checkpoint(0)
+        broken["id"] = None  # violates NOT NULL
+        results = await asyncio.gather(
+            _put(saver, _config("a"), 0),
+            saver.aput(_config("b"), broken, {"source": "loop", "step": 0}, {}),
+            _put(saver, _config("c"), 0),
+            return_exceptions=True,
+        )
+        assert saver.stats()["batches"] == 1
+        assert isinstance(results[1], sqlite3.IntegrityError)
+        assert not isinstance(results[0], Exception) and not isinstance(results[2], Exception)
+        assert await saver.aget_tuple(_config("a")) is not None
+        assert await saver.aget_tuple(_config("b")) is None
+        assert await saver.aget_tuple(_config("c")) is not None
+        await saver.aclose()
+
+    asyncio.run(run())
+
+
+def test_aclose_commits_queued_writes(tmp_path):
+    path = str(tmp_path / "memory.db")
+
+    async def run():
+        saver = TunedAsyncSqliteSaver(path, commit_interval=30)
+        await saver.setup()
+        put = asyncio.ensure_future(_put(saver, _config("t"), 0))
+        await asyncio.sleep(0)
+        await saver.aclose()
+        config = await put
+        async with AsyncSqliteSaver.from_conn_string(path) as plain:
+            stored = await plain.aget_tuple(_config("t"))
+        assert stored.config["configurable"]["checkpoint_id"] == config["configurable"]["checkpoint_id"]
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("first", ["tuned", "plain"])
+def test_graph_state_readable_by_either_saver(tmp_path, first):
+    path = str(tmp_path / "memory.db")
+
+    async def invoke(kind):
+        if kind == "tuned":
+            saver = TunedAsyncSqliteSaver(path)
+            try:
+                graph = _graph(saver)
+                await graph.ainvoke({"log": ["in"]}, _config("t"))
+                return (await graph.aget_state(_config("t"))).values, [item async for item in saver.alist(_config("t"))]
+            finally:
+                await saver.aclose()
+        async with AsyncSqliteSaver.from_conn_string(path) as saver:
+            graph = _graph(saver)
+            await graph.ainvoke({"log": ["in"]}, _config("t"))
+            return (await graph.aget_state(_config("t"))).values, [item async for item in saver.alist(_config("t"))]
+
+    second = "plain" if first == "tuned" else "tuned"
+    asyncio.run(invoke(first))
+    values, history = asyncio.run(invoke(second))
+    assert values == {"log": ["in", "step1", "in", "step3"]}
+    assert len(history) == 6
+    assert [item.metadata["step"] for item in history] == [4, 3, 2, 1, 0, -1]
+    # pending writes of both savers read back the same way
+    assert history[-1].pending_writes and history[-1].pending_writes[0][1] == "log"
@@ -0,0 +1,156 @@
+import asyncio
+import os
+
+from deepagents.sse import SSEEventLog, SSERunRegistry
+
+
+class _Agent:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        for chunk in self.chunks:
+            yield "custom", chunk
+
+
+def test_spill_only_writes_evicted_events_in_batches(tmp_path):
+    async def run():
+        path = str(tmp_path / "t.jsonl")
+        log = SSEEventLog("t", maxlen=10, spill_path=path, spill_batch=4)
+        for i in range(12):
+            await log.append("custom", {"i": i})
+        # two events left the ring buffer, not yet a full batch
+        assert not os.path.exists(path)
+        assert [e[2]["i"] for e in log.events_after(0)] == list(range(12))
+        await log.close()
+        with open(path) as f:
+            assert len(f.readlines()) == 2
+
+    asyncio.run(run())
+
+
+def test_finished_logs_are_evicted(tmp_path):
+    async def run():
+        runs = SSERunRegistry(buffer_size=2, spill_dir=str(tmp_path), finished_ttl=0.05)
+        runs.start("t", _Agent([{"type": "x", "n": i} for i in range(5)]), {})
+        frames = [frame async for frame in runs.subscribe("t")]
+        assert frames[-1].startswith("id:") and "event: done" in frames[-1]
+        assert os.path.exists(runs.get_log("t").spill_path)
+
+        await asyncio.sleep(0.1)
+        assert runs.get_log("t") is None
+        assert os.listdir(tmp_path) == []
+
+    asyncio.run(run())
+
+
+def test_each_run_gets_its_own_spill_file(tmp_path):
+    async def run():
+        runs = SSERunRegistry(buffer_size=2, spill_dir=str(tmp_path))
+        (tmp_path / "t.1.jsonl").write_text("{}\n")  # left over by an earlier process
+        first = runs.start("t", _Agent([{"type": "x", "n": i} for i in range(5)]), {})
+        [frame async for frame in runs.subscribe("t")]
+        await runs._tasks["t"]
+        assert os.listdir(tmp_path) == [os.path.basename(first.spill_path)]
+
+        # a new run replaces the finished one's spill file instead of appending to it
+        second = runs.start("t", _Agent([{"type": "y", "n": i} for i in range(5)]), {})
+        frames = [frame async for frame in runs.subscribe("t", last_event_id=first.last_id)]
+        assert os.listdir(tmp_path) == [os.path.basename(second.spill_path)]
+        with open(second.spill_path) as f:
+            assert len(f.readlines()) == 4
+        assert len(frames) == 6 and '"x"' not in "".join(frames)
+
+    asyncio.run(run())
+
+
+def test_superseded_run_keeps_spill_while_observed(tmp_path):
+    async def run():
+        runs = SSERunRegistry(buffer_size=2, spill_dir=str(tmp_path), finished_ttl=0.05)
+        first = runs.start("t", _Agent([{"type": "x", "n": i} for i in range(5)]), {})
+        await asyncio.sleep(0)
+        reader = runs.subscribe("t", last_event_id=first.start_id)
+        await reader.__anext__()
+
+        second = runs.start("t", _Agent([{"type": "y", "n": 0}]), {})
+        # the slow reader still replays the whole first run from its spill file
+        frames = [frame async for frame in reader]
+        assert len(frames) == 5 and "event: done" in frames[-1] and '"y"' not in "".join(frames)
+        assert os.path.exists(first.spill_path)
+
+        await asyncio.sleep(0.15)
+        assert not os.path.exists(first.spill_path)
+        assert runs.get_log("t") is None and not os.path.exists(second.spill_path)
+
+    asyncio.run(run())
+
+
+class _GatedAgent:
+    """Streams a first part of a run, waits for `gate`, then streams the rest."""
+
+    def __init__(self, gate):
+        self.gate = gate
+
+    async def astream(self, inputs, config=None, stream_mode=None):
+        from langchain_core.messages import AIMessageChunk
+
+        yield "messages", (AIMessageChunk("雷达", id="m1"), {})
+        yield "updates", {"agent": {"todos": [{"content": "写需求", "status": "in_progress"}]}}
+        yield "custom", {"subagent": {"type": "start", "name": "research-agent", "description": "调研"}}
+        yield "messages", (AIMessageChunk("需求", id="m1"), {})
+        await self.gate.wait()
+        yield "custom", {"subagent": {"type": "stop", "name": "research-agent"}}
+        yield "messages", (AIMessageChunk("文档", id="m1"), {})
+
+
+def _parse(frame):
+    from deepagents.event_codec import loads
+
+    lines = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+    return int(lines["id"]), lines["event"], loads(lines["data"])["data"]
+
+
+def test_late_observer_gets_snapshot_then_live_tail():
+    async def run():
+        gate = asyncio.Event()
+        runs = SSERunRegistry()
+        log = runs.start("t", _GatedAgent(gate), {})
+        while log.snapshot.subagents == {}:
+            await asyncio.sleep(0.001)
+        await asyncio.sleep(0.01)  # the second text chunk is in too
+
+        observer = runs.subscribe("t", snapshot=True)
+        snapshot_id, event, snapshot = _parse(await observer.__anext__())
+        assert event == "snapshot" and snapshot_id == log.last_id
+        assert snapshot["text"] == "雷达需求" and snapshot["status"] == "running"
+        assert snapshot["todos"] == [{"content": "写需求", "status": "in_progress"}]
+        assert snapshot["subagents"] == [{"name": "research-agent", "description": "调研"}]
+        assert runs.observer_count("t") == 1
+
+        gate.set()
+        tail = [_parse(frame) async for frame in observer]
+        # only events after the snapshot, in order, none of them repeated
+        assert [event for _id, event, _data in tail] == ["subagent", "message", "done"]
+        ids = [event_id for event_id, _event, _data in tail]
+        assert ids[0] > snapshot_id and ids == sorted(set(ids))
+        text = snapshot["text"] + "".join(data["content"] for _id, event, data in tail if event == "message")
+        assert text == "雷达需求文档"
+
+        # a full replay of the same run agrees with snapshot + tail
+        replay = [_parse(frame) async for frame in runs.subscribe("t")]
+        assert "".join(data["content"] for _id, event, data in replay if event == "message") == text
+        assert runs.observer_count("t") == 0
+
+    asyncio.run(run())
+
+
+def test_lagging_observer_is_bridged_with_a_snapshot():
+    async def run():
+        runs = SSERunRegistry(observer_max_lag=3)
+        log = runs.start("t", _Agent([{"type": "x", "n": i} for i in range(10)]), {})
+        await runs._tasks["t"]
+        frames = [_parse(frame) async for frame in runs.subscribe("t", last_event_id=log.start_id, snapshot=True)]
+        assert [event for _id, event, _data in frames] == ["snapshot"]
+        assert frames[0][0] == log.last_id and frames[0][2]["status"] == "done"
+
+    asyncio.run(run())
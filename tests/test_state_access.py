@@ -0,0 +1,175 @@
+import asyncio
+from typing import Annotated
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from deepagents.serde import CompactDeepAgentSerializer
+from deepagents.state_access import CheckpointView, CompactView, ThreadStateReader, ValuesView
+from deepagents.tiered_saver import TieredCheckpointSaver
+
+SPEC = "## 雷达系统需求\n" + "探测距离不小于 200 km。" * 10
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+    files: dict
+    todos: list
+
+
+def _graph(checkpointer):
+    def write(state):
+        turn = len(state["messages"]) // 2
+        files = dict(state.get("files") or {})
+        files["/spec.md"] = files.get("/spec.md", []) + [f"{SPEC} v{turn}"]
+        return {
+            "messages": [AIMessage(f"answer {turn}")],
+            "files": files,
+            "todos": [{"content": "写需求", "status": "completed"}],
+        }
+
+    builder = StateGraph(State)
+    builder.add_node("write", write)
+    builder.add_edge(START, "write")
+    builder.add_edge("write", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+async def _turns(checkpointer, thread_id="t", turns=3):
+    graph = _graph(checkpointer)
+    config = {"configurable": {"thread_id": thread_id}}
+    for turn in range(turns):
+        await graph.ainvoke({"messages": [HumanMessage(f"question {turn}")]}, config)
+    return (await graph.aget_state(config)).values
+
+
+def _contents(messages):
+    return [message.content for message in messages]
+
+
+async def _read_all(reader, thread_id="t"):
+    return {
+        "tail": await reader.aget_messages(thread_id, limit=4),
+        "head": await reader.aget_messages(thread_id, limit=4, before=2),
+        "index": await reader.aget_files_index(thread_id),
+        "spec": await reader.aget_file_content(thread_id, "/spec.md"),
+        "missing": await reader.aget_file_content(thread_id, "/none.md"),
+        "todos": await reader.aget_todos(thread_id),
+    }
+
+
+def _check(result, values):
+    all_messages = _contents(values["messages"])
+    assert _contents(result["tail"]["messages"]) == all_messages[-4:]
+    assert result["tail"]["start"] == 2 and result["tail"]["total"] == 6 and result["tail"]["has_more"]
+    assert _contents(result["head"]["messages"]) == all_messages[:2]
+    assert result["head"]["start"] == 0 and not result["head"]["has_more"]
+    entries = values["files"]["/spec.md"]
+    assert result["index"] == {"/spec.md": {"entries": 3, "chars": sum(len(entry) for entry in entries)}}
+    assert result["spec"] == "\n".join(entries)
+    assert result["missing"] is None
+    assert result["todos"] == [{"content": "写需求", "status": "completed"}]
+
+
+def test_views_are_abstract():
+    with pytest.raises(TypeError):
+        CheckpointView("id")
+
+
+@pytest.mark.parametrize("serde", [CompactDeepAgentSerializer(), None], ids=["compact", "default"])
+def test_sqlite_pages_and_files(tmp_path, serde):
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(str(tmp_path / "memory.db")) as saver:
+            if serde is not None:
+                saver.serde = serde
+            values = await _turns(saver)
+            reader = ThreadStateReader(saver)
+            view = await reader.aload_view("t")
+            return values, view, await _read_all(reader)
+
+    values, view, result = asyncio.run(run())
+    # the compact serde is read without reviving the whole checkpoint
+    assert isinstance(view, CompactView if serde is not None else ValuesView)
+    _check(result, values)
+
+
+def test_paging_past_the_ends():
+    async def run():
+        saver = InMemorySaver()
+        await _turns(saver)
+        reader = ThreadStateReader(saver)
+        return (
+            await reader.aget_messages("t", limit=10),
+            await reader.aget_messages("t", limit=2, before=100),
+            await reader.aget_messages("t", limit=2, before=0),
+            await reader.aget_messages("missing"),
+        )
+
+    everything, clamped, empty, missing = asyncio.run(run())
+    assert len(everything["messages"]) == 6 and everything["start"] == 0 and not everything["has_more"]
+    assert _contents(clamped["messages"]) == ["question 2", "answer 2"]
+    assert empty["messages"] == [] and empty["start"] == 0
+    assert missing == {"messages": [], "start": 0, "total": 0, "has_more": False, "checkpoint_id": None}
+
+
+def test_fallback_for_any_checkpointer():
+    async def run():
+        saver = InMemorySaver()
+        values = await _turns(saver)
+        reader = ThreadStateReader(saver)
+        return values, await reader.aload_view("t"), await _read_all(reader)
+
+    values, view, result = asyncio.run(run())
+    assert isinstance(view, ValuesView)
+    _check(result, values)
+
+
+def test_older_checkpoint_by_id(tmp_path):
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(str(tmp_path / "memory.db")) as saver:
+            saver.serde = CompactDeepAgentSerializer()
+            await _turns(saver, turns=1)
+            first = (await saver.aget_tuple({"configurable": {"thread_id": "t"}})).config["configurable"]["checkpoint_id"]
+            await _turns(saver, turns=1)
+            reader = ThreadStateReader(saver)
+            return (
+                await reader.aget_messages("t", checkpoint_id=first),
+                await reader.aget_messages("t"),
+                await reader.aget_files_index("t", checkpoint_id=first),
+            )
+
+    old, latest, old_index = asyncio.run(run())
+    assert _contents(old["messages"]) == ["question 0", "answer 0"]
+    assert latest["total"] == 4
+    assert old_index["/spec.md"]["entries"] == 1
+
+
+def test_tiered_hot_tier_is_read_before_write_behind(tmp_path):
+    async def run():
+        async with AsyncSqliteSaver.from_conn_string(str(tmp_path / "memory.db")) as durable:
+            durable.serde = CompactDeepAgentSerializer()
+            # long lag: nothing reaches the durable saver while the test reads
+            tiered = TieredCheckpointSaver(durable, max_lag=30)
+            values = await _turns(tiered)
+            assert await durable.aget_tuple({"configurable": {"thread_id": "t"}}) is None
+            reader = ThreadStateReader(tiered)
+            hot_view = await reader.aload_view("t")
+            result = await _read_all(reader)
+            assert await reader.aload_view("t") is hot_view  # cached by checkpoint id
+
+            await tiered.aclose()
+            # once flushed and out of the hot tier the durable saver is read directly
+            tiered.hot.storage.clear()
+            durable_view = await ThreadStateReader(tiered).aload_view("t")
+            return values, hot_view, durable_view, result
+
+    values, hot_view, durable_view, result = asyncio.run(run())
+    assert isinstance(hot_view, ValuesView)
+    assert isinstance(durable_view, CompactView)
+    assert durable_view.checkpoint_id == hot_view.checkpoint_id
+    _check(result, values)
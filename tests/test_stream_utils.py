@@ -0,0 +1,47 @@
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from deepagents.stream_utils import init_stream_state, render_text_chunk
+
+
+def _render(pieces, state=None, message_id="m"):
+    state = state if state is not None else init_stream_state()
+    printed = []
+    for piece in pieces:
+        render_text_chunk(AIMessageChunk(content=piece, id=message_id), state, printed.append)
+    return "".join(printed)
+
+
+def test_cumulative_chunks_print_only_new_text():
+    assert _render(["好", "好的", "好的世界"]) == "好的世界"
+    assert _render(["Hello", "Hello, wor", "Hello, world", "Hello, world"]) == "Hello, world"
+
+
+def test_delta_chunks_print_as_is():
+    assert _render(["ab", "cd", "ef"]) == "abcdef"
+    assert _render(["好", "的", "世界"]) == "好的世界"
+    # once a chunk proved the stream is deltas, repeated text is kept
+    assert _render(["ab", "c", "abcx", "ab"]) == "abcabcxab"
+
+
+def test_empty_chunks_are_ignored():
+    assert _render(["好", "", "好的", "", "好的世界"]) == "好的世界"
+    assert _render(["ab", "", "cd"]) == "abcd"
+
+
+def test_fixed_mode_skips_detection():
+    # a delta that happens to repeat everything so far is only told apart when the mode is known
+    assert _render(["abcd", "abcdef"], init_stream_state(cumulative=False)) == "abcdabcdef"
+    assert _render(["ab", "ab", "abc"], init_stream_state(cumulative=True)) == "abc"
+
+
+def test_new_message_resets_detection():
+    state = init_stream_state()
+    assert _render(["ab", "cd"], state, message_id="m1") == "abcd"
+    assert _render(["好", "好的"], state, message_id="m2") == "好的"
+
+
+def test_whole_messages_diff_against_previous():
+    state, printed = init_stream_state(), []
+    for content in ["Hello", "Hello, world"]:
+        render_text_chunk(AIMessage(content=content, id="m"), state, printed.append)
+    assert "".join(printed) == "Hello, world"
@@ -0,0 +1,24 @@
+import asyncio
+
+from deepagents.event_bus import EventBus
+from deepagents.thread_store import ThreadStore
+
+
+def test_sink_keeps_every_counter_update(tmp_path):
+    store = ThreadStore(str(tmp_path / "threads.db"))
+    store.add_thread("t", "新对话")
+
+    async def run():
+        bus = EventBus()
+        bus.add_sink(store.sink("t"), name="threads", maxsize=4, policy="block")
+        for _ in range(20):
+            await bus.publish({"type": "usage", "agent": None, "usage": {"scope": "main", "delta": {"total_tokens": 3}}})
+            await bus.publish({"type": "message_end", "agent": None, "message_id": "m", "finish_reason": "stop"})
+        await bus.publish({"type": "message_end", "agent": "researcher", "message_id": "s", "finish_reason": "stop"})
+        await bus.close()
+
+    asyncio.run(run())
+    info = store.get_thread("t")
+    assert info["total_tokens"] == 60
+    assert info["message_count"] == 20
+    store.close()
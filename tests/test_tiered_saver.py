@@ -0,0 +1,138 @@
+import asyncio
+import time
+import operator
+from typing import Annotated
+
+from typing_extensions import TypedDict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from deepagents.tiered_saver import TieredCheckpointSaver
+
+
+class State(TypedDict):
+    log: Annotated[list, operator.add]
+    files: dict
+
+
+def _graph(checkpointer):
+    def step(state):
+        return {"log": [f"step{len(state['log'])}"], "files": {**state.get("files", {}), "a.md": "x"}}
+
+    builder = StateGraph(State)
+    builder.add_node("step", step)
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_restart_over_same_durable_keeps_state():
+    async def run():
+        durable = InMemorySaver()
+        config = {"configurable": {"thread_id": "t1"}}
+
+        first = TieredCheckpointSaver(durable, max_lag=0.01)
+        await _graph(first).ainvoke({"log": ["start"]}, config)
+        await first.aclose()
+
+        # a new process (or an idle eviction) warms the hot tier from durable
+        restarted = TieredCheckpointSaver(durable, max_lag=0.01)
+        graph = _graph(restarted)
+        expected = {"log": ["start", "step1"], "files": {"a.md": "x"}}
+        assert (await graph.aget_state(config)).values == expected
+        assert (await graph.aget_state(config)).values == expected
+
+        await graph.ainvoke({"log": ["again"]}, config)
+        assert (await graph.aget_state(config)).values["log"] == ["start", "step1", "again", "step3"]
+        await restarted.aclose()
+
+        assert (await _graph(durable).aget_state(config)).values["log"] == ["start", "step1", "again", "step3"]
+
+    asyncio.run(run())
+
+
+class _OffloadingSerde:
+    """Stands in for GridFSOffloadSerializer: counts the (remote) dumps."""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.dumps_calls = 0
+
+    def dumps_typed(self, obj):
+        self.dumps_calls += 1
+        return self.inner.dumps_typed(obj)
+
+    def loads_typed(self, data):
+        return self.inner.loads_typed(data)
+
+
+def test_hot_tier_does_not_use_offloading_serde():
+    async def run():
+        durable = InMemorySaver()
+        offloading = durable.serde = _OffloadingSerde(durable.serde)
+        saver = TieredCheckpointSaver(durable, max_lag=60)
+        assert saver.hot.serde is offloading.inner
+
+        config = {"configurable": {"thread_id": "t2"}}
+        await _graph(saver).ainvoke({"log": ["start"]}, config)
+        assert offloading.dumps_calls == 0
+        await saver.aclose()
+        assert offloading.dumps_calls > 0
+
+    asyncio.run(run())
+
+
+def _chat_graph(checkpointer):
+    from langchain_core.messages import AIMessage
+    from langgraph.graph import MessagesState
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("reply", lambda state: {"messages": [AIMessage("ok")]})
+    builder.add_edge(START, "reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def test_console_loop_flushes_write_behind_on_exit():
+    from deepagents.stream_utils import run_console
+
+    async def run():
+        durable = InMemorySaver()
+        saver = TieredCheckpointSaver(durable, max_lag=3600)
+        config = {"configurable": {"thread_id": "console"}}
+        answers = iter(["hello", "again", "exit"])
+
+        await run_console(_chat_graph(saver), config, checkpointer=saver,
+                          read_input=lambda prompt: next(answers), print_fn=lambda *args, **kwargs: None)
+
+        assert saver.pending == 0
+        messages = durable.get_tuple(config).checkpoint["channel_values"]["messages"]
+        assert [m.content for m in messages] == ["hello", "ok", "again", "ok"]
+
+    asyncio.run(run())
+
+
+def test_console_input_does_not_block_write_behind():
+    from deepagents.stream_utils import run_console
+
+    async def run():
+        durable = InMemorySaver()
+        saver = TieredCheckpointSaver(durable, max_lag=0.05)
+        config = {"configurable": {"thread_id": "typing"}}
+        seen_while_typing = []
+
+        def read_input(prompt):
+            if not seen_while_typing:
+                seen_while_typing.append(None)
+                return "hello"
+            # the user is still typing: the flusher runs in the meantime
+            time.sleep(0.5)
+            seen_while_typing.append(durable.get_tuple(config))
+            return "exit"
+
+        await run_console(_chat_graph(saver), config, checkpointer=saver,
+                          read_input=read_input, print_fn=lambda *args, **kwargs: None)
+        assert seen_while_typing[-1] is not None
+
+    asyncio.run(run())
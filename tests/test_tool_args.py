@@ -0,0 +1,17 @@
+import json
+
+from deepagents.tool_args import append_tool_call_piece, new_tool_call_buffer, tool_call_args
+
+
+def test_pieces_are_joined_once_and_restatements_dropped():
+    buf = new_tool_call_buffer()
+    text = json.dumps({"file_path": "/a.md", "content": "x" * 10000})
+    for i in range(0, len(text), 7):
+        append_tool_call_piece(buf, text[i:i + 7], "chunks")
+    assert len(buf["args"]) > 1000
+    assert tool_call_args(buf) == text
+    assert len(buf["args"]) == 1
+
+    # the complete arguments repeated in `tool_calls` add nothing new
+    assert append_tool_call_piece(buf, text, "tool_calls") == ""
+    assert tool_call_args(buf) == text
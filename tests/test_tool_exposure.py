@@ -0,0 +1,86 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langchain_core.tools import tool
+
+from deepagents.tool_exposure import ToolExposureCache, default_tool_exposure_policy
+from deepagents.tools import (
+    edit_file_with_commit_message, ls, read_file_content, read_file_content_and_history, write_file, write_todos,
+)
+
+
+@tool
+def task(description: str, subagent_type: str) -> str:
+    """Launch a subagent to handle a complex, multi-step task."""
+    return ""
+
+
+TOOLS = [write_todos, write_file, read_file_content, ls, read_file_content_and_history,
+         edit_file_with_commit_message, task]
+ALL = ["write_todos", "write_file", "read_file_content", "ls", "read_file_content_and_history",
+       "edit_file_with_commit_message", "task"]
+PLANNING = ["write_todos", "write_file", "ls", "task"]
+
+
+class _Model:
+    """Records every bind_tools call; the bound "model" is the schema list."""
+
+    def __init__(self):
+        self.binds = 0
+
+    def bind_tools(self, schemas):
+        self.binds += 1
+        return schemas
+
+
+def _cache(model=None):
+    return ToolExposureCache(model or _Model(), TOOLS, default_tool_exposure_policy, {"task": "Run a subagent."})
+
+
+def _exposed(cache, state):
+    schemas = cache.select_model(state)
+    return [schema["function"]["name"] for schema in schemas], {
+        schema["function"]["name"]: schema["function"]["description"] for schema in schemas
+    }
+
+
+def test_tools_per_turn_state():
+    cache = _cache()
+    names, descriptions = _exposed(cache, {"messages": [HumanMessage("写需求")]})
+    assert names == PLANNING
+    assert descriptions["task"].startswith("Launch a subagent")
+
+    # planned: concise descriptions, still no file readers
+    names, descriptions = _exposed(cache, {"todos": [{"content": "写", "status": "pending"}]})
+    assert names == PLANNING and descriptions["task"] == "Run a subagent."
+
+    # files exist: every tool
+    names, _ = _exposed(cache, {"files": {"/spec.md": ["# 需求"]}, "todos": [{"content": "写", "status": "pending"}]})
+    assert names == ALL
+
+
+def test_called_tools_stay_bound():
+    cache = _cache()
+    call = AIMessage("", tool_calls=[
+        {"name": "read_file_content", "args": {"file_path": "/spec.md"}, "id": "call_1"},
+        {"name": "write_file", "args": {"file_path": "/spec.md", "content": "x"}, "id": "call_2"},
+    ])
+    state = {
+        "messages": [HumanMessage("读一下"), call, ToolMessage("Error: File not found", tool_call_id="call_1")],
+    }
+    names, _ = _exposed(cache, state)
+    # the policy hides file readers without files, but this thread called one
+    assert names == ["write_todos", "write_file", "read_file_content", "ls", "task"]
+    # a call to a tool the agent does not have changes nothing
+    state["messages"].append(AIMessage("", tool_calls=[{"name": "unknown", "args": {}, "id": "call_3"}]))
+    assert _exposed(cache, state)[0] == names
+
+
+def test_bound_models_are_reused_per_exposure():
+    model = _Model()
+    cache = _cache(model)
+    for _ in range(3):
+        cache.select_model({})
+        cache.select_model({"files": {"/a.md": ["x"]}})
+    assert model.binds == 2
+    stats = {(len(row["tools"]), row["verbosity"]): row for row in cache.stats()}
+    assert stats[(4, "full")]["turns"] == 3 and stats[(7, "full")]["turns"] == 3
+    assert stats[(4, "full")]["schema_chars"] < stats[(7, "full")]["schema_chars"]
@@ -0,0 +1,115 @@
+import operator
+import sqlite3
+import time
+from types import SimpleNamespace
+from typing import Annotated
+
+import mongomock
+from langchain_core.messages import ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import TypedDict
+
+from deepagents.retention import MongoCheckpointPruner, SQLiteCheckpointPruner
+from deepagents.tool_journal import MongoToolJournal, SQLiteToolJournal
+
+
+class _OffloadingSerde:
+    def __init__(self, inner):
+        self.inner = inner
+
+
+def test_mongo_journal_lives_next_to_the_checkpoints():
+    database = mongomock.MongoClient()["checkpointing_db"]
+    saver = SimpleNamespace(checkpoint_collection=database["checkpoints"], serde=_OffloadingSerde(JsonPlusSerializer()))
+    journal = MongoToolJournal.from_saver(saver)
+    assert journal.collection.name == "tool_journal"
+    assert journal.serde is saver.serde.inner
+
+    message = ToolMessage("answer", tool_call_id="call_1")
+    journal.put("t", "call_1", "cnki_search", message, elapsed=2.5)
+    # another process (host) reading the same database replays the call
+    result, elapsed = MongoToolJournal(database["tool_journal"]).get("t", "call_1")
+    assert result == message and elapsed == 2.5
+
+    journal.put("t", "call_2", "cnki_search", message)
+    database["tool_journal"].update_one({"tool_call_id": "call_1"}, {"$set": {"created_at": 0.0}})
+    pruner = MongoCheckpointPruner(database["checkpoints"], database["checkpoint_writes"], tool_journal=journal)
+    assert pruner._prune_journal("t", time.time() - 60) == 1
+    assert journal.get("t", "call_1") is None and journal.get("t", "call_2") is not None
+    pruner._delete_thread("t")
+    assert journal.get("t", "call_2") is None
+
+
+class State(TypedDict):
+    log: Annotated[list, operator.add]
+
+
+def test_retention_prunes_journal_with_checkpoints(tmp_path):
+    path = str(tmp_path / "memory.db")
+    builder = StateGraph(State)
+    builder.add_node("step", lambda state: {"log": ["x"]})
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    with SqliteSaver.from_conn_string(path) as saver:
+        graph = builder.compile(checkpointer=saver)
+        config = {"configurable": {"thread_id": "t"}}
+        journal = SQLiteToolJournal(path)
+        journal.put("t", "old_call", "cnki_search", "old")
+        for _ in range(4):
+            graph.invoke({"log": ["in"]}, config)
+        journal.put("t", "recent_call", "cnki_search", "recent")
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE tool_journal SET created_at = 0 WHERE tool_call_id = 'old_call'")
+
+    pruner = SQLiteCheckpointPruner(path)
+    report = pruner.apply({"*": {"keep_last": 2}})
+    pruner.close()
+    assert report["checkpoints_deleted"] > 0
+    assert report["journal_entries_deleted"] == 1
+    assert journal.get("t", "old_call") is None
+    assert journal.get("t", "recent_call")[0] == "recent"
+
+
+def test_subagent_calls_replay_by_arguments():
+    from langchain_core.tools import InjectedToolCallId, tool
+
+    from deepagents.tool_journal import InMemoryToolJournal, journal_tools
+
+    runs = []
+
+    @tool
+    def cnki_search(query: str, tool_call_id: Annotated[str, InjectedToolCallId]) -> str:
+        """Search CNKI."""
+        runs.append(query)
+        return f"papers about {query}"
+
+    journal = InMemoryToolJournal()
+    main_tool = journal_tools([cnki_search], journal)[0]
+    sub_tool = journal_tools([main_tool], journal, key_by_args=True)[0]
+    assert sub_tool.tool is cnki_search
+
+    config = {"configurable": {"thread_id": "sub_agent_requirement_doc_agent_call_0"}}
+
+    def call(call_id, query):
+        return sub_tool.invoke(
+            {"type": "tool_call", "id": call_id, "name": "cnki_search", "args": {"query": query, "tool_call_id": call_id}},
+            config,
+        )
+
+    first = call("call_1", "电网安全")
+    # the resumed subagent model issues a new id for the same call
+    replayed = call("call_9", "电网安全")
+    assert replayed.content == first.content and runs == ["电网安全"]
+    assert replayed.tool_call_id == "call_9"
+    assert journal.hits == 1
+
+    call("call_10", "系统建模")
+    assert runs == ["电网安全", "系统建模"]
+    # the same arguments in another subagent thread run again
+    sub_tool.invoke(
+        {"type": "tool_call", "id": "call_1", "name": "cnki_search", "args": {"query": "电网安全", "tool_call_id": "call_1"}},
+        {"configurable": {"thread_id": "sub_agent_architecture_agent_call_3"}},
+    )
+    assert runs == ["电网安全", "系统建模", "电网安全"]
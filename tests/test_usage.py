@@ -0,0 +1,117 @@
+import asyncio
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+
+from deepagents import create_deep_agent, get_usage, usage
+from deepagents.usage import create_usage_hook
+
+
+def _reply(tokens, tool_calls=()):
+    return AIMessage(
+        content="ok",
+        tool_calls=list(tool_calls),
+        usage_metadata={"input_tokens": tokens, "output_tokens": 0, "total_tokens": tokens},
+    )
+
+
+def test_usage_events_carry_scope_and_name(monkeypatch):
+    events = []
+    monkeypatch.setattr(usage, "get_stream_writer", lambda: events.append)
+    call = {"name": "ls", "args": {}, "id": "call-1"}
+
+    create_usage_hook()({"messages": [_reply(10)]})
+    create_usage_hook({"max_total_tokens": 5}, scope="subagent", name="requirement_doc_agent")(
+        {"messages": [_reply(10, [call])]}
+    )
+
+    assert [event["usage"].get("scope") for event in events] == ["main", "subagent", "subagent"]
+    assert "name" not in events[0]["usage"]
+    assert all(event["usage"]["name"] == "requirement_doc_agent" for event in events[1:])
+    assert "budget_exceeded" in events[2]["usage"]
+
+
+class _Scripted(GenericFakeChatModel):
+    """Answers with the queued messages; tool binding is a no-op."""
+
+    calls: int = 0
+    disable_streaming: bool = True
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, *args, **kwargs):
+        self.calls += 1
+        return super()._generate(*args, **kwargs)
+
+
+def _task(call_id, description):
+    return {"name": "task", "args": {"description": description, "subagent_type": "research-agent"}, "id": call_id}
+
+
+def _agent(main_replies, sub_replies=(), budget=None, checkpointer=None):
+    main = _Scripted(messages=iter(main_replies))
+    sub = _Scripted(messages=iter(sub_replies))
+    agent = create_deep_agent(
+        [],
+        "你是需求分析助手",
+        model=main,
+        subagents=[{
+            "name": "research-agent", "description": "调研", "prompt": "调研",
+            "model": sub, "read_permissions": [], "write_permissions": [],
+        }],
+        checkpointer=checkpointer or InMemorySaver(),
+        usage_budget=budget,
+    )
+    return agent, main, sub
+
+
+def _ask(agent, text, thread_id="t"):
+    config = {"configurable": {"thread_id": thread_id}}
+    return asyncio.run(agent.ainvoke({"messages": [HumanMessage(text)]}, config)), config
+
+
+def test_subagent_usage_merges_by_tool_call():
+    agent, main, sub = _agent(
+        [_reply(100, [_task("call_a", "调研雷达"), _task("call_b", "调研电网")]), _reply(50)],
+        [_reply(30), _reply(40)],
+    )
+    _result, config = _ask(agent, "写需求")
+
+    totals = get_usage(agent, config)
+    assert main.calls == 2 and sub.calls == 2
+    assert totals["total"]["calls"] == 4 and totals["total"]["total_tokens"] == 220
+    by_subagent = totals["by_subagent"]
+    assert set(by_subagent) == {"call_a", "call_b"}
+    assert all(entry["name"] == "research-agent" and entry["calls"] == 1 for entry in by_subagent.values())
+    assert sorted(entry["total_tokens"] for entry in by_subagent.values()) == [30, 40]
+
+    # a later subagent call adds its own entry, earlier ones are kept
+    agent2, _main, _sub = _agent(
+        [_reply(10, [_task("call_c", "复核")]), _reply(10)], [_reply(5)], checkpointer=agent.checkpointer
+    )
+    _ask(agent2, "再调研")
+    assert set(get_usage(agent2, config)["by_subagent"]) == {"call_a", "call_b", "call_c"}
+
+
+def test_thread_at_its_budget_makes_no_more_calls():
+    agent, main, _sub = _agent([_reply(100), _reply(100), _reply(100)], budget={"max_total_tokens": 150})
+    _ask(agent, "第一问")
+    # under the limit before the call: it runs and crosses the limit
+    _ask(agent, "第二问")
+    result, config = _ask(agent, "第三问")
+    assert main.calls == 2
+    assert result["messages"][-1].content.startswith("Stopped: token budget of 150 reached")
+    assert get_usage(agent, config)["total"]["total_tokens"] == 200
+
+
+def test_subagent_usage_counts_before_the_next_main_call():
+    agent, main, sub = _agent(
+        [_reply(40, [_task("call_a", "调研")]), _reply(10)], [_reply(80)], budget={"max_total_tokens": 100}
+    )
+    result, config = _ask(agent, "写需求")
+    # the subagent pushed the thread over its budget: the main agent stops without calling the model
+    assert main.calls == 1 and sub.calls == 1
+    assert result["messages"][-1].content.startswith("Stopped: token budget of 100 reached")
+    assert get_usage(agent, config)["total"]["total_tokens"] == 120
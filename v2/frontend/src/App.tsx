@@ -244,6 +244,11 @@ function App() {
         () => {
           setIsStreaming(false);
           loadThreads();
+        },
+        () => {
+          // events were lost while disconnected: reload the thread, then follow the live tail
+          processor.reset();
+          loadThreadMessages(activeThreadId);
         }
       );
       
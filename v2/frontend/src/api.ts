@@ -64,90 +64,141 @@ export class ApiClient {
     message: string,
     onEvent: (data: any) => void,
     onError: (error: any) => void,
-    onComplete: () => void
+    onComplete: () => void,
+    onResync?: () => void
   ): Promise<() => void> {
-    try {
-      const response = await fetch(`${API_BASE}/chat/stream`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          thread_id: threadId,
-          message: message,
-        }),
+    // The run keeps executing on the server when the connection drops; we
+    // reconnect with Last-Event-ID and the server replays what we missed.
+    // When the missed events are gone the server sends `resync` instead and
+    // the caller reloads the thread before the live events continue.
+    const maxReconnects = 5;
+    let lastEventId: string | null = null;
+    let reconnects = 0;
+    let isReading = true;
+    let reader: ReadableStreamDefaultReader<Uint8Array> | undefined;
+
+    const open = () => {
+      if (lastEventId === null) {
+        return fetch(`${API_BASE}/chat/stream`, {
+          method: 'POST',
+          headers: {
+            'Content-Type': 'application/json',
+          },
+          body: JSON.stringify({
+            thread_id: threadId,
+            message: message,
+          }),
+        });
+      }
+      return fetch(`${API_BASE}/chat/stream/${threadId}`, {
+        headers: { 'Last-Event-ID': lastEventId },
       });
+    };
 
+    const connect = async () => {
+      const response = await open();
       if (!response.ok) {
         throw new Error(`HTTP ${response.status}: ${response.statusText}`);
       }
-
-      const reader = response.body?.getReader();
+      reader = response.body?.getReader();
       if (!reader) {
         throw new Error('No response body reader available');
       }
+    };
 
-      const decoder = new TextDecoder();
-      let buffer = '';
-      let isReading = true;
+    try {
+      await connect();
+    } catch (error) {
+      onError(error);
+      return () => {}; // No-op stop function
+    }
 
-      const readLoop = async () => {
-        while (isReading) {
-          try {
-            const { value, done } = await reader.read();
-            if (done) break;
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let finished = false;
+
+    const readLoop = async () => {
+      while (isReading && !finished) {
+        try {
+          const { value, done } = await reader!.read();
+          if (done) {
+            // a clean close before done/stop/error is still a dropped run
+            throw new Error('Stream closed before the run finished');
+          }
 
-            buffer += decoder.decode(value, { stream: true });
+          buffer += decoder.decode(value, { stream: true });
+          
+          // Process complete SSE events
+          let eventEnd;
+          while ((eventEnd = buffer.indexOf('\n\n')) !== -1) {
+            const eventData = buffer.slice(0, eventEnd);
+            buffer = buffer.slice(eventEnd + 2);
             
-            // Process complete SSE events
-            let eventEnd;
-            while ((eventEnd = buffer.indexOf('\n\n')) !== -1) {
-              const eventData = buffer.slice(0, eventEnd);
-              buffer = buffer.slice(eventEnd + 2);
-              
-              if (eventData.trim()) {
-                try {
-                  // Parse SSE format
-                  const lines = eventData.split('\n');
-                  let data = '';
-                  
-                  for (const line of lines) {
-                    if (line.startsWith('data:')) {
-                      data += line.slice(5).trim();
-                    }
+            if (eventData.trim()) {
+              try {
+                // Parse SSE format
+                const lines = eventData.split('\n');
+                let data = '';
+                
+                for (const line of lines) {
+                  if (line.startsWith('id:')) {
+                    lastEventId = line.slice(3).trim();
+                  } else if (line.startsWith('data:')) {
+                    data += line.slice(5).trim();
                   }
-                  
-                  if (data) {
-                    const parsedData = JSON.parse(data);
-                    onEvent(parsedData);
+                }
+                
+                if (data) {
+                  const parsedData = JSON.parse(data);
+                  if (parsedData.type === 'resync') {
+                    onResync?.();
+                    continue;
+                  }
+                  if (parsedData.type === 'done' || parsedData.type === 'stop' || parsedData.type === 'error') {
+                    finished = true;
                   }
-                } catch (parseError) {
-                  console.error('Failed to parse SSE event:', parseError);
+                  onEvent(parsedData);
                 }
+              } catch (parseError) {
+                console.error('Failed to parse SSE event:', parseError);
               }
             }
-          } catch (readError) {
-            if (isReading) {
-              onError(readError);
+          }
+        } catch (readError) {
+          if (!isReading) break;
+          let lastError: any = readError;
+          let connected = false;
+          buffer = '';
+          while (isReading && lastEventId !== null && reconnects < maxReconnects) {
+            reconnects += 1;
+            await new Promise((resolve) => setTimeout(resolve, 500 * reconnects));
+            if (!isReading) break;
+            try {
+              await connect();
+              connected = true;
+              // the budget is per outage, not per run
+              reconnects = 0;
+              break;
+            } catch (reconnectError) {
+              lastError = reconnectError;
             }
+          }
+          if (!connected) {
+            if (isReading) onError(lastError);
             break;
           }
         }
-        
-        onComplete();
-      };
-
-      readLoop();
+      }
+      
+      onComplete();
+    };
 
-      // Return stop function
-      return () => {
-        isReading = false;
-        reader.cancel();
-      };
+    readLoop();
 
-    } catch (error) {
-      onError(error);
-      return () => {}; // No-op stop function
-    }
+    // Return stop function
+    return () => {
+      isReading = false;
+      reader?.cancel();
+    };
   }
-}
\ No newline at end of file
+}
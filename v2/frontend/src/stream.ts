@@ -14,7 +14,11 @@ export interface StreamHandlers {
 
 export class StreamProcessor {
   private handlers: StreamHandlers;
-  private bufferedText = '';
+  // Text of the current assistant message, kept as parts and joined lazily
+  private textParts: string[] = [];
+  private messageId: string | null = null;
+  // Whether the provider resends the whole content with every chunk
+  private cumulative: boolean | null = null;
   private toolCallChunks: Record<number, { name: string | null; args: string; id?: string }> = {};
   private printedToolCalls = new Set<string>();
 
@@ -58,12 +62,10 @@ export class StreamProcessor {
     }
 
     // Handle text content delta for assistant messages
-    const content = message.content || '';
-    const delta = this.calculateDelta(this.bufferedText, content);
+    const delta = this.textDelta(message);
     if (delta) {
       this.handlers.onMessageDelta?.(delta);
     }
-    this.bufferedText = content;
 
     // Handle tool call chunks (流式输出)
     const addKw = message.additional_kwargs || {};
@@ -138,7 +140,45 @@ export class StreamProcessor {
     this.handlers.onSubAgentEvent?.(event);
   }
 
+  private bufferedText(): string {
+    if (this.textParts.length > 1) {
+      this.textParts = [this.textParts.join('')];
+    }
+    return this.textParts[0] || '';
+  }
+
+  private textDelta(message: StreamMessage): string {
+    const content = message.content || '';
+    const messageId = message.id ?? null;
+    if (messageId !== this.messageId) {
+      this.messageId = messageId;
+      this.textParts = [];
+      this.cumulative = null;
+    }
+    if (!content) {
+      return '';
+    }
+
+    // Message chunks carry true per-chunk deltas; only providers that resend
+    // the cumulative content need the longest-common-prefix fallback.
+    if (this.cumulative === null && this.textParts.length > 0) {
+      const first = this.textParts[0];
+      this.cumulative = first.length >= 4 && content.startsWith(first);
+    }
+    if (!this.cumulative) {
+      this.textParts.push(content);
+      return content;
+    }
+
+    const delta = this.calculateDelta(this.bufferedText(), content);
+    this.textParts = [content];
+    return delta;
+  }
+
   private calculateDelta(previous: string, current: string): string {
+    if (current.startsWith(previous)) {
+      return current.slice(previous.length);
+    }
     // Find longest common prefix
     const maxLength = Math.min(previous.length, current.length);
     let commonLength = 0;
@@ -151,7 +191,9 @@ export class StreamProcessor {
   }
 
   reset() {
-    this.bufferedText = '';
+    this.textParts = [];
+    this.messageId = null;
+    this.cumulative = null;
     this.toolCallChunks = {};
     this.printedToolCalls.clear();
   }
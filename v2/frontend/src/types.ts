@@ -43,6 +43,7 @@ export interface SubAgentMessage {
 }
 
 export interface StreamMessage {
+  id?: string; // Message id; chunks of one model response share it
   content: string;
   type: string;
   additional_kwargs: {
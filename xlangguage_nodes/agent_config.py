@@ -25,7 +25,7 @@ from xlangguage_nodes.system_agent.system_agent import (
     system_agent_description,
 )
 
-from xlangguage_nodes.tool.cnki_search import cnki_search
+from xlangguage_nodes.tool.cnki_search import cnki_search, cnki_batch_search
 
 
 xlangguage_agent_subagents = [
@@ -35,6 +35,7 @@ xlangguage_agent_subagents = [
         "prompt": requirement_doc_prompt,
         "tools": [
             "cnki_search",
+            "cnki_batch_search",
             "read_file_content_and_history",
             "write_file",
             "edit_file_with_commit_message",
@@ -128,5 +129,5 @@ xlangguage_agent_model_settings = {
 #     "api_key": os.environ["GOOGLE_API_KEY"],
 # }
 
-subagent_tools = [cnki_search]
+subagent_tools = [cnki_search, cnki_batch_search]
 
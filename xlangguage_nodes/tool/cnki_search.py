@@ -1,15 +1,24 @@
-import requests
-import httpx
+import asyncio
+import base64
+import concurrent.futures
+import hashlib
+import json
 import os
-from fastapi import FastAPI, Request, APIRouter
-from fastapi.responses import JSONResponse
-from langchain_core.tools import tool
-from typing import Annotated
-from langchain_core.tools import InjectedToolCallId
+import random
+import threading
+import time
+import unicodedata
+import weakref
+from typing import Annotated, Any, Dict, List, Optional, Tuple
+
+import httpx
+from langchain_core.tools import InjectedToolCallId, StructuredTool
 from langgraph.config import get_stream_writer
 from langgraph.types import Command
 from langchain_core.messages import ToolMessage
 
+from deepagents.cache import ResponseCache, get_response_cache
+
 
 # 接口地址 :https://gateway.cnki.net/openx/admin/login/jwt
 
@@ -19,34 +28,80 @@ from langchain_core.messages import ToolMessage
 
 # 接口描述: 客户端模式获取jwttoken
 
-# 应用名称	AppId	ApiKey	SecretKey	应用类型 	状态	审核状态	
-# test_bh	
+# 应用名称	AppId	ApiKey	SecretKey	应用类型 	状态	审核状态
+# test_bh
 
-AppID = "1752565762461"	
-ApiKey = "FVXKWxXJJeKAjoHh"	
+AppID = "1752565762461"
+ApiKey = "FVXKWxXJJeKAjoHh"
 SecretKey = "VRfHSGsDLlNWOUuWBVjz6Eg94J"
 grant_type = "client_credentials"
 
 UserID = "33dd6b23-df2e-49f1-829f-454cd6ba4205"
-URL = "https://gateway.cnki.net/openx/admin/login/jwt"
-Chat_URL = "https://gateway.cnki.net/openx/bigmodel/ai/qkwd/v1/chat"
+# CNKI_GATEWAY 可指向本地的模拟网关（测试用）
+CNKI_GATEWAY = os.environ.get("CNKI_GATEWAY", "https://gateway.cnki.net").rstrip("/")
+URL = f"{CNKI_GATEWAY}/openx/admin/login/jwt"
+Chat_URL = f"{CNKI_GATEWAY}/openx/bigmodel/ai/qkwd/v1/chat"
 
 USER_DATA_DIR = os.environ["USER_DATA_DIR"]
 os.makedirs(USER_DATA_DIR, exist_ok=True)
 
+# 连接池与超时：read 超时是两次 SSE 数据之间的最长间隔，而不是整个回答的时长
+CNKI_TIMEOUT = httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=10.0)
+CNKI_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+# 只在尚未收到任何回答内容时重试，避免重复消费已返回的流
+CNKI_MAX_RETRIES = int(os.environ.get("CNKI_MAX_RETRIES", "2"))
+CNKI_RETRY_BACKOFF = 0.5
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_client_lock = threading.Lock()
+_sync_client: Optional[httpx.Client] = None
+# httpx.AsyncClient 绑定创建它的事件循环，每个循环一个共享客户端
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+
+def get_http_client() -> httpx.Client:
+    """进程内共享的同步客户端（连接复用）"""
+    global _sync_client
+    with _client_lock:
+        if _sync_client is None or _sync_client.is_closed:
+            _sync_client = httpx.Client(timeout=CNKI_TIMEOUT, limits=CNKI_LIMITS)
+        return _sync_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """当前事件循环共享的异步客户端（连接复用）"""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = httpx.AsyncClient(timeout=CNKI_TIMEOUT, limits=CNKI_LIMITS)
+    return client
+
+
+async def aclose_http_clients():
+    """关闭当前事件循环的异步客户端（服务关闭时调用）"""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def _retry_delay(attempt: int) -> float:
+    # full jitter: 并发失败的请求不会同时重试
+    return random.uniform(0, CNKI_RETRY_BACKOFF * (2 ** attempt))
+
+
 def get_jwt_token():
     """获取JWT Token"""
     headers = {
         "Content-Type": "application/x-www-form-urlencoded"
     }
-    
+
     data = {
         "app_id": AppID,
         "client_id": ApiKey,
         "grant_type": grant_type
     }
 
-    response = requests.post(URL, headers=headers, data=data)
+    response = get_http_client().post(URL, headers=headers, data=data)
     if response.status_code == 200:
         # return response.json().get("content")
         return response.json()
@@ -57,61 +112,162 @@ async def get_jwt_token_async():
     headers = {
         "Content-Type": "application/x-www-form-urlencoded"
     }
-    
+
     data = {
         "app_id": AppID,
         "client_id": ApiKey,
         "grant_type": grant_type
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(URL, headers=headers, data=data)
-        if response.status_code == 200:
-            return response.json()
+    response = await get_async_http_client().post(URL, headers=headers, data=data)
+    if response.status_code == 200:
+        return response.json()
     return None
 
-# 使用异步版本获取token
-token = get_jwt_token()
+# CNKI token 的有效期未知时的默认值，以及提前刷新的时间
+CNKI_TOKEN_DEFAULT_TTL = 3600.0
+CNKI_TOKEN_REFRESH_MARGIN = 300.0
+# 获取失败后，在这段时间内不再重复请求网关
+CNKI_TOKEN_FAILURE_BACKOFF = 5.0
 
 
-# @app.route('/cnki_qa', methods=['POST'])
-# @router.post("/cnki_qa")
-@tool
-def cnki_search(
-    query: str,
-    tool_call_id: Annotated[str, InjectedToolCallId]):
-    """
-    this tool can search the cnki database for papers related to the query and summarize the papers to form an answer for the query.
-    you can use this tool to get more related information for you to do your job.
-    
-    - Arg:
-        - query: str
-            - 查询内容
+def _token_expiry(token_data: dict, now: float) -> float:
+    """token 的过期时间：优先 expires_in，其次 JWT 的 exp 声明"""
+    content = token_data.get("content") or {}
+    expires_in = content.get("expires_in")
+    if isinstance(expires_in, (int, float)) and expires_in > 0:
+        return now + expires_in
+    try:
+        payload = content["access_token"].split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        return float(claims["exp"])
+    except Exception:
+        return now + CNKI_TOKEN_DEFAULT_TTL
+
+
+class CNKITokenManager:
+    """按需获取、缓存并自动刷新 CNKI JWT
+
+    - 第一次调用 cnki_search 时才请求网关，不阻塞进程启动
+    - 临近过期（refresh_margin 内）时返回当前 token，并在后台刷新
+    - 并发的刷新只发一次请求（single-flight），同步与异步调用共享同一个结果
     """
-    if not query:
-        return f"Missing 'query' parameter"
 
-    print(f"收到查询请求: {query}")
+    def __init__(self, refresh_margin: float = CNKI_TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._access_token: Optional[str] = None
+        self._expires_at = 0.0
+        self._failed_at = 0.0
+        self._inflight: Optional[concurrent.futures.Future] = None
+        self.refreshes = 0
+
+    def _current(self, now: float) -> Tuple[Optional[str], bool]:
+        """(仍有效的 token, 是否需要刷新)"""
+        if self._access_token and now < self._expires_at:
+            return self._access_token, now >= self._expires_at - self.refresh_margin
+        return None, True
+
+    def _begin(self) -> Tuple[concurrent.futures.Future, bool]:
+        """(刷新结果, 是否由调用者负责刷新)"""
+        with self._lock:
+            if self._inflight is not None:
+                return self._inflight, False
+            self._inflight = concurrent.futures.Future()
+            return self._inflight, True
+
+    def _finish(self, future: concurrent.futures.Future, token_data) -> None:
+        now = time.time()
+        access_token = ((token_data or {}).get("content") or {}).get("access_token")
+        with self._lock:
+            if access_token:
+                self._access_token = access_token
+                self._expires_at = _token_expiry(token_data, now)
+                self.refreshes += 1
+            else:
+                self._failed_at = now
+            self._inflight = None
+        current, _ = self._current(now)
+        future.set_result(current)
+
+    def _backing_off(self, now: float) -> bool:
+        return now - self._failed_at < CNKI_TOKEN_FAILURE_BACKOFF
 
-    if not token:
-        return JSONResponse(
-            status_code=500,
-            content={"error": "Failed to retrieve JWT Token - token is None"}
-        )
-    
-    JWT = token.get("content", {}).get("access_token")
-    Authorization = f"Bearer {JWT}" if JWT else None
-    if not Authorization:
-        return f"Failed to retrieve JWT Token - no access_token"
-    
+    def _fetch(self, future: concurrent.futures.Future) -> None:
+        token_data = None
+        try:
+            token_data = get_jwt_token()
+        except Exception as e:
+            print(f"获取JWT Token失败: {e}")
+        finally:
+            self._finish(future, token_data)
+
+    async def _afetch(self, future: concurrent.futures.Future) -> None:
+        token_data = None
+        try:
+            token_data = await get_jwt_token_async()
+        except Exception as e:
+            print(f"获取JWT Token失败: {e}")
+        finally:
+            self._finish(future, token_data)
+
+    def get(self) -> Optional[str]:
+        """当前的 access_token；必要时阻塞刷新，获取失败返回 None"""
+        now = time.time()
+        current, stale = self._current(now)
+        if not stale or self._backing_off(now):
+            return current
+        future, owner = self._begin()
+        if owner:
+            if current is not None:
+                threading.Thread(target=self._fetch, args=(future,), daemon=True).start()
+                return current
+            self._fetch(future)
+        if current is not None:
+            return current
+        return future.result(timeout=CNKI_TIMEOUT.connect + CNKI_TIMEOUT.read)
+
+    async def aget(self) -> Optional[str]:
+        """get 的异步版本，刷新时不占用事件循环"""
+        now = time.time()
+        current, stale = self._current(now)
+        if not stale or self._backing_off(now):
+            return current
+        future, owner = self._begin()
+        if owner:
+            task = asyncio.ensure_future(self._afetch(future))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        if current is not None:
+            return current
+        # 调用者被取消时刷新仍会完成，其他等待者不受影响
+        return await asyncio.shield(asyncio.wrap_future(future))
+
+    def invalidate(self, access_token: Optional[str] = None) -> None:
+        """网关拒绝 token（401）后调用，下次获取时重新请求"""
+        with self._lock:
+            if access_token is None or access_token == self._access_token:
+                self._access_token = None
+                self._expires_at = 0.0
+
+
+_background_tasks: set = set()
+token_manager = CNKITokenManager()
+
+
+def _authorization(JWT: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """(Authorization 头, 错误信息)"""
+    if not JWT:
+        return None, "Failed to retrieve JWT Token - no access_token"
     print(f"成功获取JWT Token: {JWT[:20]}...")
+    return f"Bearer {JWT}", None
 
-    # Prepare request
+
+def _chat_request(query: str, authorization: str):
     headers = {
-        "Authorization": Authorization,
+        "Authorization": authorization,
         "Content-Type": "application/json"
     }
-    Chat_URL = "https://gateway.cnki.net/openx/bigmodel/ai/qkwd/v1/chat"
     payload = {
         "messages": [
             {
@@ -126,59 +282,535 @@ def cnki_search(
         "resultType": "NORMAL_CONTENT",
         "ifSse": True
     }
+    return headers, payload
 
-    import json
 
-    answer = ""
+def _sse_content(line: str) -> str:
+    """一行 SSE 数据中的回答片段"""
+    if not line or not line.startswith("data:"):
+        return ""
     try:
-        response = requests.post(Chat_URL, headers=headers, json=payload, stream=True)
-        if response.status_code == 200:
-            for line in response.iter_lines(decode_unicode=True):
-                if line and line.startswith("data:"):
-                    try:
-                        import json
-                        content_json = line[5:].strip()
-                        data_obj = json.loads(content_json)
-                        data_content = data_obj.get("content", "")
-                        answer += data_content
-                        # print(data_content, end="", flush=True)
-                    except Exception as e:
-                        print("\nerror:", e)
-            if answer:
-                print(f"answer: {answer}")
-                file_path = f"cnki_search_{query}"
-                # 获取</think>之后的回答作为answer_message
-                # 如果</think>不存在，则answer_message为answer原文
-                think_end = answer.find("</think>")
-                if think_end != -1:
-                    # 获取</think>之后的内容
-                    answer_message = answer[think_end + len("</think>") :]
-                else:
-                    answer_message = answer
-                answer_message = answer_message.lstrip("\n")
-                answer = answer_message
-                return Command(
-                            update={
-                                "files": {
-                                    file_path: answer
-                                },
-                                "messages": [
-                                    ToolMessage(
-                                        f"search answer: {answer_message}. \n Updated this search result in file: {file_path}",
-                                         tool_call_id=tool_call_id)
-                                ],
-                            }
-                        )
-            return f"No valid response content received, response is {response.text}"
-        else:
-            return f"HTTP error: {response.status_code}"
-    except httpx.TimeoutException:
-        return f"Request timeout"
+        return json.loads(line[5:].strip()).get("content", "") or ""
     except Exception as e:
-        return f"Request failed: {str(e)}"
+        print("\nerror:", e)
+        return ""
+
+
+def _partial_suffix(text: str, tag: str) -> int:
+    """text 末尾可能是 tag 开头部分的长度（标签被拆在两个 SSE 片段里）"""
+    for size in range(min(len(tag) - 1, len(text)), 0, -1):
+        if text.endswith(tag[:size]):
+            return size
+    return 0
+
+
+# (phase, text, reset)：phase 为 "thinking" 或 "answer"；reset 表示之前按回答推送的内容其实是推理，需要清空
+Progress = Tuple[str, str, bool]
+
+
+class ThinkSplitter:
+    """增量地把 CNKI 的流式回答分成 <think> 推理部分和正式回答
+
+    结果与对完整回答做 find("</think>") 相同：第一个 </think> 之前都是推理，
+    之后（去掉开头换行）是回答；没有 </think> 时整个回答都是正式回答。
+    每个片段到达后立即返回可以显示的部分，只有可能是标签开头的几个字符会暂时保留。
+    """
+
+    OPEN, CLOSE = "<think>", "</think>"
+
+    def __init__(self):
+        self._raw: List[str] = []
+        self._answer: List[str] = []
+        self._pending = ""
+        self._in_think: Optional[bool] = None  # None: 还不知道回答是否以 <think> 开头
+        self._closed = False
+        self._answer_started = False
+
+    def _emit(self, text: str, segments: List[Progress]) -> None:
+        if self._in_think:
+            if text:
+                segments.append(("thinking", text, False))
+            return
+        if not self._answer_started:
+            text = text.lstrip("\n")
+            self._answer_started = bool(text)
+        if text:
+            self._answer.append(text)
+            segments.append(("answer", text, False))
+
+    def feed(self, text: str) -> List[Progress]:
+        self._raw.append(text)
+        text = self._pending + text
+        self._pending = ""
+        segments: List[Progress] = []
+        if self._in_think is None:
+            head = text.lstrip()
+            if len(head) < len(self.OPEN) and self.OPEN.startswith(head):
+                self._pending = text
+                return segments
+            self._in_think = head.startswith(self.OPEN)
+            if self._in_think:
+                text = head[len(self.OPEN):]
+        if self._closed:
+            self._emit(text, segments)
+            return segments
+        end = text.find(self.CLOSE)
+        if end == -1:
+            keep = _partial_suffix(text, self.CLOSE)
+            self._emit(text[:len(text) - keep], segments)
+            self._pending = text[len(text) - keep:]
+            return segments
+        if self._in_think:
+            self._emit(text[:end], segments)
+        else:
+            # 没有 <think> 开头的推理：已推送的内容作废
+            self._answer.clear()
+            self._answer_started = False
+            segments.append(("answer", "", True))
+        self._in_think = False
+        self._closed = True
+        self._emit(text[end + len(self.CLOSE):], segments)
+        return segments
+
+    def finish(self) -> List[Progress]:
+        """流结束时输出保留的字符"""
+        segments: List[Progress] = []
+        pending, self._pending = self._pending, ""
+        if self._in_think is None:
+            self._in_think = False
+        self._emit(pending, segments)
+        return segments
+
+    @property
+    def answer(self) -> str:
+        if self._in_think and not self._closed:
+            # <think> 没有结束：与原来一样返回完整回答
+            return "".join(self._raw).lstrip("\n")
+        return "".join(self._answer)
+
+
+def _progress_writer(tool_call_id: str, name: str, label: Optional[str] = None):
+    """把回答片段作为 tool_progress 事件写入 custom 流；不在图中运行时返回 None"""
+    try:
+        writer = get_stream_writer()
+    except Exception:
+        return None
+
+    def write(progress: List[Progress]) -> None:
+        for phase, text, reset in progress:
+            writer({"tool_progress": {
+                "tool_call_id": tool_call_id, "name": name, "label": label,
+                "phase": phase, "text": text, "reset": reset,
+            }})
+
+    return write
+
+
+def _answer_command(query: str, answer_message: str, tool_call_id: str):
+    file_path = f"cnki_search_{query}"
+    return Command(
+                update={
+                    "files": {
+                        file_path: answer_message
+                    },
+                    "messages": [
+                        ToolMessage(
+                            f"search answer: {answer_message}. \n Updated this search result in file: {file_path}",
+                             tool_call_id=tool_call_id)
+                    ],
+                }
+            )
+
+
+def _search(query: str, on_progress=None) -> Tuple[Optional[str], Optional[str]]:
+    """请求 CNKI 问答接口，返回 (回答, 错误信息)"""
+    JWT = token_manager.get()
+    authorization, error = _authorization(JWT)
+    if error:
+        return None, error
+    headers, payload = _chat_request(query, authorization)
+    reauthorized = False
+
+    for attempt in range(CNKI_MAX_RETRIES + 1):
+        pieces, other_lines = [], []
+        splitter = ThinkSplitter()
+        try:
+            with get_http_client().stream("POST", Chat_URL, headers=headers, json=payload) as response:
+                if response.status_code in RETRY_STATUS and attempt < CNKI_MAX_RETRIES:
+                    time.sleep(_retry_delay(attempt))
+                    continue
+                if response.status_code == 401 and not reauthorized and attempt < CNKI_MAX_RETRIES:
+                    # token 被网关提前作废：重新获取后再试一次
+                    reauthorized = True
+                    token_manager.invalidate(JWT)
+                    JWT = token_manager.get()
+                    authorization, error = _authorization(JWT)
+                    if error:
+                        return None, error
+                    headers["Authorization"] = authorization
+                    continue
+                if response.status_code != 200:
+                    return None, f"HTTP error: {response.status_code}"
+                for line in response.iter_lines():
+                    content = _sse_content(line)
+                    if content:
+                        pieces.append(content)
+                        progress = splitter.feed(content)
+                        if progress and on_progress:
+                            on_progress(progress)
+                    elif line:
+                        other_lines.append(line)
+                if pieces:
+                    progress = splitter.finish()
+                    if progress and on_progress:
+                        on_progress(progress)
+                    print(f"answer: {splitter.answer}")
+                    return splitter.answer, None
+                response_text = "\n".join(other_lines)
+                return None, f"No valid response content received, response is {response_text}"
+        except httpx.TransportError as e:
+            if pieces or attempt >= CNKI_MAX_RETRIES:
+                return None, "Request timeout" if isinstance(e, httpx.TimeoutException) else f"Request failed: {str(e)}"
+            time.sleep(_retry_delay(attempt))
+        except Exception as e:
+            return None, f"Request failed: {str(e)}"
+
+
+async def _asearch(query: str, on_progress=None) -> Tuple[Optional[str], Optional[str]]:
+    """_search 的异步实现：共享连接池，取消时立即关闭连接"""
+    JWT = await token_manager.aget()
+    authorization, error = _authorization(JWT)
+    if error:
+        return None, error
+    headers, payload = _chat_request(query, authorization)
+    reauthorized = False
+
+    for attempt in range(CNKI_MAX_RETRIES + 1):
+        pieces, other_lines = [], []
+        splitter = ThinkSplitter()
+        try:
+            async with get_async_http_client().stream("POST", Chat_URL, headers=headers, json=payload) as response:
+                if response.status_code in RETRY_STATUS and attempt < CNKI_MAX_RETRIES:
+                    await asyncio.sleep(_retry_delay(attempt))
+                    continue
+                if response.status_code == 401 and not reauthorized and attempt < CNKI_MAX_RETRIES:
+                    # token 被网关提前作废：重新获取后再试一次
+                    reauthorized = True
+                    token_manager.invalidate(JWT)
+                    JWT = await token_manager.aget()
+                    authorization, error = _authorization(JWT)
+                    if error:
+                        return None, error
+                    headers["Authorization"] = authorization
+                    continue
+                if response.status_code != 200:
+                    return None, f"HTTP error: {response.status_code}"
+                async for line in response.aiter_lines():
+                    content = _sse_content(line)
+                    if content:
+                        pieces.append(content)
+                        progress = splitter.feed(content)
+                        if progress and on_progress:
+                            on_progress(progress)
+                    elif line:
+                        other_lines.append(line)
+                if pieces:
+                    progress = splitter.finish()
+                    if progress and on_progress:
+                        on_progress(progress)
+                    print(f"answer: {splitter.answer}")
+                    return splitter.answer, None
+                response_text = "\n".join(other_lines)
+                return None, f"No valid response content received, response is {response_text}"
+        except httpx.TransportError as e:
+            if pieces or attempt >= CNKI_MAX_RETRIES:
+                return None, "Request timeout" if isinstance(e, httpx.TimeoutException) else f"Request failed: {str(e)}"
+            await asyncio.sleep(_retry_delay(attempt))
+        except Exception as e:
+            # asyncio.CancelledError 不是 Exception，取消会直接向上传播
+            return None, f"Request failed: {str(e)}"
+
+
+# ==============================================================================
+# 回答缓存
+# ==============================================================================
+
+# 同一领域的问题（雷达、电网需求等）会在不同线程中反复查询，缓存到磁盘并设置过期时间
+CNKI_CACHE_PATH = os.environ.get("CNKI_CACHE_PATH", os.path.join(USER_DATA_DIR, "cnki_cache.db"))
+CNKI_CACHE_TTL = float(os.environ.get("CNKI_CACHE_TTL", str(7 * 86400)))
+CNKI_CACHE_MAX_ENTRIES = 10000
+
+_TRAILING_PUNCTUATION = "?？。.!！~～ "
+
+
+def normalize_query(query: str) -> str:
+    """缓存使用的查询文本：全半角统一、合并空白、忽略大小写与句末标点"""
+    text = unicodedata.normalize("NFKC", query)
+    text = " ".join(text.split()).lower()
+    return text.rstrip(_TRAILING_PUNCTUATION)
+
+
+def cnki_cache_key(query: str) -> str:
+    # 回答取决于所用的模型与知识库，两者变化时缓存自然失效
+    raw = json.dumps(
+        {"query": normalize_query(query), "model": "r_cnki_deepseek_r1", "source": "xaiFullLibraryQA"},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return "cnki:" + hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CNKIAnswerCache:
+    """cnki_search 前面的缓存：磁盘持久化 + 相同查询合并（single-flight）
+
+    只缓存成功的回答；正在进行中的相同查询等待同一次请求的结果，
+    同步与异步调用共享同一份进行中的请求。
+    """
+
+    def __init__(self, cache: Optional[ResponseCache] = None):
+        self.cache = cache if cache is not None else get_response_cache({
+            "backend": "sqlite",
+            "path": CNKI_CACHE_PATH,
+            "ttl": CNKI_CACHE_TTL,
+            "max_entries": CNKI_CACHE_MAX_ENTRIES,
+        })
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, concurrent.futures.Future] = {}
+        self.coalesced = 0
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self.cache.get(key)
+        return entry["answer"] if entry else None
+
+    def _begin(self, key: str) -> Tuple[concurrent.futures.Future, bool]:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._inflight[key] = concurrent.futures.Future()
+            return future, True
+
+    def _entry(self, query: str, result) -> Optional[Dict[str, Any]]:
+        answer, _error = result
+        return {"query": query, "answer": answer, "created_at": time.time()} if answer else None
+
+    def _finish(self, key: str, future: concurrent.futures.Future, result) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(result)
+
+    def search(self, query: str, on_progress=None) -> Tuple[Optional[str], Optional[str]]:
+        key = cnki_cache_key(query)
+        answer = self._lookup(key)
+        if answer is not None:
+            print(f"命中缓存: {query}")
+            return answer, None
+        future, owner = self._begin(key)
+        if owner:
+            result: Tuple[Optional[str], Optional[str]] = (None, "Request failed: search aborted")
+            try:
+                result = _search(query, on_progress)
+                entry = self._entry(query, result)
+                if entry:
+                    self.cache.set(key, entry)
+            finally:
+                self._finish(key, future, result)
+        return future.result()
+
+    async def asearch(self, query: str, on_progress=None) -> Tuple[Optional[str], Optional[str]]:
+        key = cnki_cache_key(query)
+        entry = await self.cache.aget(key)
+        answer = entry["answer"] if entry else None
+        if answer is not None:
+            print(f"命中缓存: {query}")
+            return answer, None
+        future, owner = self._begin(key)
+        if owner:
+            result: Tuple[Optional[str], Optional[str]] = (None, "Request failed: search cancelled")
+            try:
+                result = await _asearch(query, on_progress)
+                entry = self._entry(query, result)
+                if entry:
+                    # sqlite 写入放到线程里，不阻塞事件循环
+                    await self.cache.aset(key, entry)
+            finally:
+                # 发起者被取消时，等待同一查询的其他调用者得到错误信息而不是一直等待
+                self._finish(key, future, result)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            inflight = len(self._inflight)
+        return {**self.cache.stats(), "coalesced": self.coalesced, "inflight": inflight}
+
+
+answer_cache = CNKIAnswerCache()
+
+
+def get_cnki_cache_stats() -> Dict[str, Any]:
+    """缓存命中率、合并的请求数与进行中的请求数"""
+    return answer_cache.stats()
+
+
+def _cnki_search(
+    query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId]):
+    """
+    this tool can search the cnki database for papers related to the query and summarize the papers to form an answer for the query.
+    you can use this tool to get more related information for you to do your job.
+
+    - Arg:
+        - query: str
+            - 查询内容
+    """
+    if not query:
+        return f"Missing 'query' parameter"
+
+    print(f"收到查询请求: {query}")
+
+    answer_message, error = answer_cache.search(query, _progress_writer(tool_call_id, "cnki_search"))
+    if error:
+        return error
+    return _answer_command(query, answer_message, tool_call_id)
+
+
+async def _acnki_search(
+    query: str,
+    tool_call_id: Annotated[str, InjectedToolCallId]):
+    """cnki_search 的异步实现"""
+    if not query:
+        return f"Missing 'query' parameter"
+
+    print(f"收到查询请求: {query}")
+
+    answer_message, error = await answer_cache.asearch(query, _progress_writer(tool_call_id, "cnki_search"))
+    if error:
+        return error
+    return _answer_command(query, answer_message, tool_call_id)
+
+
+# ==============================================================================
+# 批量检索
+# ==============================================================================
+
+CNKI_BATCH_CONCURRENCY = int(os.environ.get("CNKI_BATCH_CONCURRENCY", "4"))
+CNKI_BATCH_MAX_QUERIES = 8
+
+
+def _unique_queries(queries: List[str]) -> List[str]:
+    """去掉空查询和归一化后重复的查询，保持原有顺序"""
+    seen, unique = set(), []
+    for query in queries:
+        key = normalize_query(query or "")
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(query.strip())
+    return unique[:CNKI_BATCH_MAX_QUERIES]
+
+
+def _dedupe_answers(results: List[Tuple[str, Optional[str], Optional[str]]]) -> List[Optional[str]]:
+    """各查询回答中已在前面出现过的段落只保留一次，返回给模型的文本"""
+    seen = set()
+    texts: List[Optional[str]] = []
+    for query, answer, error in results:
+        if error:
+            texts.append(None)
+            continue
+        kept = []
+        for paragraph in answer.split("\n\n"):
+            key = " ".join(paragraph.split())
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            kept.append(paragraph)
+        texts.append("\n\n".join(kept) if kept else "(same content as the answers above)")
+    return texts
+
+
+def _batch_command(results: List[Tuple[str, Optional[str], Optional[str]]], tool_call_id: str):
+    files = {f"cnki_search_{query}": answer for query, answer, error in results if answer}
+    if not files:
+        return "\n".join(f"{query}: {error}" for query, _, error in results)
+    sections = []
+    for i, ((query, _, error), text) in enumerate(zip(results, _dedupe_answers(results)), 1):
+        if text is None:
+            sections.append(f"[{i}] query: {query}\nsearch failed: {error}")
+        else:
+            sections.append(
+                f"[{i}] query: {query}\nsearch answer: {text}\n Updated this search result in file: cnki_search_{query}"
+            )
+    return Command(
+                update={
+                    "files": files,
+                    "messages": [
+                        ToolMessage("\n\n".join(sections), tool_call_id=tool_call_id)
+                    ],
+                }
+            )
+
+
+def _cnki_batch_search(
+    queries: List[str],
+    tool_call_id: Annotated[str, InjectedToolCallId]):
+    """
+    search the cnki database for several related queries at once (e.g. different aspects or refinements of the same requirement).
+    the queries run concurrently; each answer is written to its own file and all answers come back in one message.
+    prefer this tool over several cnki_search calls when you already know the queries you need.
+
+    - Arg:
+        - queries: list[str]
+            - 查询内容列表（最多 8 个）
+    """
+    queries = _unique_queries(queries or [])
+    if not queries:
+        return f"Missing 'queries' parameter"
+
+    print(f"收到批量查询请求: {queries}")
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(CNKI_BATCH_CONCURRENCY, len(queries))) as executor:
+        # 流写入器只能在工具所在线程中获取
+        writers = [_progress_writer(tool_call_id, "cnki_batch_search", query) for query in queries]
+        answers = list(executor.map(answer_cache.search, queries, writers))
+    return _batch_command([(query, *answer) for query, answer in zip(queries, answers)], tool_call_id)
+
+
+async def _acnki_batch_search(
+    queries: List[str],
+    tool_call_id: Annotated[str, InjectedToolCallId]):
+    """cnki_batch_search 的异步实现"""
+    queries = _unique_queries(queries or [])
+    if not queries:
+        return f"Missing 'queries' parameter"
+
+    print(f"收到批量查询请求: {queries}")
+
+    semaphore = asyncio.Semaphore(CNKI_BATCH_CONCURRENCY)
+
+    async def search(query: str):
+        async with semaphore:
+            return await answer_cache.asearch(query, _progress_writer(tool_call_id, "cnki_batch_search", query))
+
+    answers = await asyncio.gather(*(search(query) for query in queries))
+    return _batch_command([(query, *answer) for query, answer in zip(queries, answers)], tool_call_id)
+
+
+# @app.route('/cnki_qa', methods=['POST'])
+# @router.post("/cnki_qa")
+cnki_search = StructuredTool.from_function(
+    func=_cnki_search,
+    coroutine=_acnki_search,
+    name="cnki_search",
+    description=_cnki_search.__doc__,
+)
+
+cnki_batch_search = StructuredTool.from_function(
+    func=_cnki_batch_search,
+    coroutine=_acnki_batch_search,
+    name="cnki_batch_search",
+    description=_cnki_batch_search.__doc__,
+)
 
 
-import json
 import datetime
 def save_response_to_file(response, \
     filename=os.path.join(USER_DATA_DIR, f"response_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.json")):
@@ -187,5 +819,5 @@ def save_response_to_file(response, \
         json.dump(response, f, ensure_ascii=False, indent=4)
 
 if __name__ == "__main__":
-    result = cnki_search("什么是人工智能？")
-    print(result)
\ No newline at end of file
+    result = cnki_search.invoke({"type": "tool_call", "id": "cnki_main", "name": "cnki_search", "args": {"query": "什么是人工智能？"}})
+    print(result)